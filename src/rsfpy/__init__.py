@@ -19,9 +19,9 @@
   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
 """
 
-from .io import read_rsf, write_rsf
+from .io import read_rsf, write_rsf, iter_rsf, read_many, rechunk, RsfWriter, RsfOutput, read_rsf_async, write_rsf_async
 from .array import Rsfdata, Rsfarray
 from .fft import fft, ifft
 from .version import *
 
-__all__ = ["read_rsf", "write_rsf", "Rsfdata", "Rsfarray"]
+__all__ = ["read_rsf", "write_rsf", "iter_rsf", "read_many", "rechunk", "RsfWriter", "RsfOutput", "read_rsf_async", "write_rsf_async", "Rsfdata", "Rsfarray"]
@@ -21,11 +21,14 @@
 
 
 import numpy as np
-import io, warnings
+import io, warnings, collections
 from typing import Optional, Union
 from .utils import _str_match_re, flow
-from .io import read_rsf, write_rsf
+from .io import read_rsf, write_rsf, read_rsf_async, write_rsf_async, _header_bytes, RsfOutput, \
+    ASYNC_WORKERS, _window_coords, _window_params, _window_slices, _window_header
 from .plot import grey, wiggle, grey3
+from .clip import percentile_clip
+from .pipeline import _run as _run_pipeline
 from .fft import fft, ifft
 
 defaults = {
@@ -40,16 +43,57 @@ defaults = {
     "d9": 1, "o9": 0.,
 }
 
+
+class _Meta:
+    """
+    Header of an Rsfdata, shared by reference with its views.
+    Views only take a reference when they are created; the first access to
+    the header of any array holding a shared _Meta copies it, and n# are
+    derived from the array shape at that time.
+    """
+    __slots__ = ("header", "shape", "shared")
+
+    def __init__(self, header, shape=None):
+        self.header = header
+        # shape n# were last synced for
+        self.shape = shape
+        self.shared = False
+
+
+def _squeeze_header(header, shape, axis=None):
+    """
+    Shift the axis keys of header for np.squeeze(arr, axis) of an array of
+    shape. A trace with all trailing axes of length 1 keeps its keys.
+    """
+    if axis is not None:
+        axes = (axis,) if isinstance(axis, int) else axis
+    elif len(shape) > 1 and all(s == 1 for s in shape[1:]):
+        axes = ()
+    else:
+        axes = tuple(i for i, s in enumerate(shape) if s == 1)
+    for iax in sorted(axes, reverse=True):
+        for idim in range(iax + 1, len(shape)):
+            for key in ('d', 'o', 'label', 'unit'):
+                header[f'{key}{idim}'] = header.get(f'{key}{idim+1}', defaults.get(f'{key}{idim+1}', None))
+
+
+def _defers(x):
+    """Whether x overrides ufuncs itself (other than ndarray and Rsfdata)."""
+    override = getattr(type(x), "__array_ufunc__", None)
+    return override is not None and override is not np.ndarray.__array_ufunc__ \
+        and not isinstance(x, Rsfdata)
+
+
 class Rsfdata(np.ndarray):
 
     # Default properties:
-    header = {}
+    _meta = None
     history = ""
 
     # Higher priority
     __array_priority__ = 10.0
 
-    def __new__(cls, input_array: Optional[Union[str, io.IOBase, np.ndarray, list, tuple]] = None, header: Optional[dict] = None, history: str = ""):
+    def __new__(cls, input_array: Optional[Union[str, io.IOBase, np.ndarray, list, tuple]] = None, header: Optional[dict] = None, history: str = "", mmap: bool = False, **window):
         """
          Ndarray wrapper for *Madagascar* RSF (regularly sampled format) data.
          RSF data format: https://www.ahay.org/wiki/Guide_to_RSF_file_format
@@ -62,6 +106,12 @@ class Rsfdata(np.ndarray):
              Header information to associate with the data.
          history : str, optional
              History information to associate with the data.
+         mmap : bool or str, optional
+             Memory-map the binary data when reading from a file (default is False):
+             read-only with True, copy-on-write (writable in memory) with "c".
+         n#, f#, j#, min#, max# : optional
+             Window to read from a file, as in window(squeeze=False).
+             Only the requested hyperslab is read from disk.
         """
         # Check header and history format
         if header is None:
@@ -84,7 +134,7 @@ class Rsfdata(np.ndarray):
 
         # Case 2: String -> file path or file-like object
         if isinstance(input_array, str) or isinstance(input_array, io.IOBase):
-            obj = read_rsf(input_array)
+            obj = read_rsf(input_array, mmap=mmap, **window)
             if isinstance(obj, list) and len(obj) == 3:
                 obj = Rsfdata(*obj)
                 obj.header.update(header)
@@ -120,22 +170,101 @@ class Rsfdata(np.ndarray):
 
 
     def __array_finalize__(self, obj):
-        """Ensure attributes are preserved in new views/slices."""
+        """Share the header with new views/slices (copied on first access)."""
         if obj is None:
             return
-        self.header = getattr(obj, 'header', {})
+        meta = getattr(obj, '_meta', None)
+        if meta is not None:
+            meta.shared = True
+            self._meta = meta
         self.history = getattr(obj, 'history', "")
-        # Update n#
-        self.update()
+
+    @property
+    def header(self) -> dict:
+        """
+        Header dict of this array, with n# matching its shape.
+        """
+        meta = self._meta
+        if meta is None:
+            meta = self._meta = _Meta({})
+        elif meta.shared:
+            meta = self._meta = _Meta(dict(meta.header), meta.shape)
+        if meta.shape != self.shape:
+            self._sync(meta.header)
+            meta.shape = self.shape
+        return meta.header
+
+    @header.setter
+    def header(self, header: dict):
+        self._meta = _Meta(dict(header))
+
+    def _sync(self, header):
+        """Set n# from the shape, and default d# where they are zero."""
+        for idim in range(9):
+            n_key = f"n{idim + 1}"
+            if idim < self.ndim:
+                header[n_key] = self.shape[idim]
+                d_key = f"d{idim + 1}"
+                if float(header.get(d_key, defaults.get(d_key, 4.e-3))) == 0.:
+                    header[d_key] = defaults.get(d_key, 4.e-3)
+            else:
+                header.pop(n_key, None)
+
+    def _get(self, key, default):
+        """Header value without copying a shared header."""
+        meta = self._meta
+        return default if meta is None else meta.header.get(key, default)
     
+    def __array_ufunc__(self, ufunc, method, *inputs, out=None, **kwargs):
+        """
+        Apply ufuncs to the underlying ndarrays, writing into out= (and in
+        place for a *= 2) without temporaries. New results share the header
+        of the first Rsfdata input; out= arrays keep their own.
+        """
+        meta = None
+        history = ""
+        args = []
+        for x in inputs:
+            if isinstance(x, Rsfdata):
+                if meta is None:
+                    meta, history = x._meta, x.history
+                x = x.view(np.ndarray)
+            elif not isinstance(x, (np.ndarray, int, float, complex)) and _defers(x):
+                return NotImplemented
+            args.append(x)
+        if out is not None:
+            if any(_defers(x) for x in out):
+                return NotImplemented
+            kwargs["out"] = tuple(x.view(np.ndarray) if isinstance(x, Rsfdata) else x for x in out)
+
+        results = getattr(ufunc, method)(*args, **kwargs)
+        if method == "at":
+            return None
+        if ufunc.nout == 1 or method != "__call__":
+            results = (results,)
+
+        wrapped = []
+        for i, res in enumerate(results):
+            if out is not None and i < len(out) and out[i] is not None:
+                res = out[i]
+            elif isinstance(res, (np.ndarray, np.generic)):
+                # reductions to a scalar stay 0-d Rsfdata, as with ndarray subclasses
+                res = np.asarray(res).view(Rsfdata)
+                if meta is not None:
+                    meta.shared = True
+                    res._meta = meta
+                res.history = history
+            wrapped.append(res)
+        return wrapped[0] if len(wrapped) == 1 else tuple(wrapped)
+
     def __array_function__(self, func, types, args, kwargs):
         if not any(issubclass(t, Rsfdata) for t in types):
             return NotImplemented
 
         header_all = {}
         def collect(obj):
-            if isinstance(obj, Rsfdata):
-                header_all.update(obj.header)
+            if isinstance(obj, Rsfdata) and obj._meta is not None:
+                header_all.update(obj._meta.header)
             elif isinstance(obj, (list, tuple)):
                 for x in obj:
                     collect(x)
@@ -150,23 +279,7 @@ class Rsfdata(np.ndarray):
         ]
 
         if func is np.squeeze:
-            arr = base_args[0]
-            if len(base_args) > 1:
-                sq_axis = base_args[1]
-                if isinstance(sq_axis, int):
-                    sq_axis = (sq_axis,)
-            elif arr.ndim > 1 and all(s==1 for s in arr.shape[1:]):
-                sq_axis = []
-            else:
-                sq_axis = tuple(i for i, s in enumerate(arr.shape) if s == 1)
-
-            for iax in sorted(sq_axis, reverse=True):
-                for idim in range(iax+1, arr.ndim):
-                    for key in ('d', 'o', 'label', 'unit'):
-                        header_all[f'{key}{idim}'] = header_all.get(
-                            f'{key}{idim+1}', defaults.get(f'{key}{idim+1}', None)
-                        )
-            
+            _squeeze_header(header_all, base_args[0].shape, base_args[1] if len(base_args) > 1 else None)
             res = np.squeeze(*base_args, **kwargs)
 
         else:
@@ -180,7 +293,7 @@ class Rsfdata(np.ndarray):
        
 
 
-    def read(self, file: Optional[Union[str, io.IOBase]]):
+    def read(self, file: Optional[Union[str, io.IOBase]], mmap: bool = False):
         """
         Read RSF data from a file or file-like object.
         This will override the existing data and header information in the array.
@@ -190,6 +303,9 @@ class Rsfdata(np.ndarray):
         ----------
         file : str or file-like object
             The RSF file to read.
+        mmap : bool or str
+            Memory-map the binary data instead of reading it (default is False),
+            read-only or, with "c", copy-on-write.
 
         Returns
         -------
@@ -197,7 +313,7 @@ class Rsfdata(np.ndarray):
             A rsf data object (self) containing the read data and header information.
             Always returned as a valid object. Though the content may be None.
         """
-        result = read_rsf(file)
+        result = read_rsf(file, mmap=mmap)
         if isinstance(result, list) and len(result) == 3:
             self = Rsfdata(*result)
 
@@ -220,6 +336,10 @@ class Rsfdata(np.ndarray):
             ascii: plain text
         fmt : str, optional
             The data format for ascii (default is "%f").
+        keep_precision : bool, optional
+            Store float64, int64 and complex128 data as double, long and
+            complexdouble instead of 4-byte types (default is False). Data
+            read from such files keeps its type anyway.
         """
         self.update(kargs.get('header', {}))
         history = self.history + '\n' + kargs.get('history', '')
@@ -227,6 +347,224 @@ class Rsfdata(np.ndarray):
         kargs.pop('history', None)
         write_rsf(self, file, self.header, history, **kargs)
 
+    @classmethod
+    async def aread(cls, file: Union[str, io.IOBase], **kargs):
+        """
+        Read RSF data without blocking the event loop.
+
+        Parameters
+        ----------
+        file : str or file-like object
+            The RSF file to read.
+        **kargs
+            Passed to read_rsf_async (mmap, n#/f#/j# windows, executor).
+
+        Returns
+        -------
+        Rsfdata
+            The read data; empty if reading failed.
+        """
+        result = await read_rsf_async(file, **kargs)
+        if isinstance(result, list) and len(result) == 3:
+            return cls(*result)
+        warnings.warn(f"Failed to read RSF file: {file}")
+        return cls()
+
+    async def awrite(self, file: str | io.IOBase, **kargs):
+        """
+        Write RSF data without blocking the event loop.
+        Takes the same parameters as write(), plus an optional executor.
+        The array must not be modified until the write has finished.
+        """
+        self.update(kargs.get('header', {}))
+        history = self.history + '\n' + kargs.get('history', '')
+        kargs.pop('header', None)
+        kargs.pop('history', None)
+        await write_rsf_async(self, file, header=self.header, history=history, **kargs)
+
+    def to_shared(self, name: Optional[str] = None, pool=None, file: Optional[str] = None):
+        """
+        Copy the data into a shared memory segment that other processes on
+        this node can attach without pickling.
+
+        Parameters
+        ----------
+        name : str, optional
+            Segment name (default is a random name).
+        pool : rsfpy.shared.SharedPool, optional
+            Take the segment from a pool of reusable segments.
+        file : str, optional
+            Also write an RSF header file with in="shm://<name>", readable
+            with read_rsf / Rsfdata as usual.
+
+        Returns
+        -------
+        Rsfdata
+            The shared data; header["in"] is "shm://<name>". The segment
+            stays attachable after this array is gone, until release_shared()
+            (or the exit of this process) unlinks it or returns it to pool.
+        """
+        from .shared import to_shared
+        self.update()
+        obj = Rsfdata(*to_shared(self, self.header, self.history, name=name, pool=pool))
+        if file is not None:
+            with open(file, 'wb') as fp:
+                fp.write(_header_bytes(obj.header, obj.history, splitter=False))
+        return obj
+
+    @classmethod
+    def from_shared(cls, name: str):
+        """
+        Attach shared data written by to_shared in this or another process.
+
+        Parameters
+        ----------
+        name : str
+            Segment name, with or without the "shm://" prefix.
+
+        Returns
+        -------
+        Rsfdata
+            Data viewing the segment; writes are seen by all processes.
+        """
+        from .shared import from_shared
+        return cls(*from_shared(name))
+
+    def release_shared(self):
+        """
+        Release the shared memory segment of data from to_shared or
+        from_shared, in this or another process: new attaches fail, while
+        arrays already viewing it (this one included) stay valid.
+        """
+        from .shared import release_shared
+        release_shared(self.header["in"])
+
+    def lazy(self):
+        """
+        Defer arithmetic on the data: operations on the returned
+        rsfpy.lazy.LazyArray build an expression, evaluated block by block
+        into a single output by compute(), or into a file by to_rsf().
+
+        Returns
+        -------
+        LazyArray
+            Leaf expression holding this array (not copied).
+        """
+        from .lazy import lazy
+        return lazy(self)
+
+    def map_blocks(self, func, axis: int = -1, chunk: int = 1, workers: Optional[int] = None,
+                   out: Optional[str] = None, processes: bool = False, **kargs):
+        """
+        Apply func to slabs along an axis in a pool of workers, writing the
+        results into one preallocated output (in memory, or an RSF file for
+        data larger than memory, e.g. memory-mapped input).
+
+        Parameters
+        ----------
+        func : callable
+            Called with each slab as an Rsfdata (header o# of the axis set
+            to the slab start) and returning an array of the same extent
+            along axis; the other axes may change, alike for all slabs.
+        axis : int
+            Axis to split (default is -1, e.g. gathers of a 3-D cube).
+        chunk : int
+            Number of samples along axis per slab (default is 1).
+        workers : int, optional
+            Number of workers (default is ASYNC_WORKERS).
+        out : str, optional
+            Write the result to this RSF file (with RsfOutput) instead of
+            returning it in memory.
+        processes : bool
+            Use processes instead of threads, for functions that hold the
+            GIL; func must then be picklable (a module-level function).
+        **kargs
+            header, history, out binary path (as "datafile") and form of
+            the output file.
+
+        Returns
+        -------
+        Rsfdata or None
+            The result, or None when written to out.
+        """
+        from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+        ndim = self.ndim
+        if not -ndim <= axis < ndim:
+            raise ValueError(f"axis {axis} is out of bounds for {ndim}-d data")
+        axis %= ndim
+        chunk = max(1, int(chunk))
+        nslab = self.shape[axis]
+        header = dict(self.header)
+        o, d = self.o(axis), self.d(axis)
+        data = self.view(np.ndarray)
+
+        def job(start):
+            index = (slice(None),) * axis + (slice(start, min(start + chunk, nslab)),)
+            slab_header = dict(header)
+            slab_header[f"o{axis + 1}"] = o + start * d
+            return data[index], slab_header
+
+        # the first slab fixes the output shape, dtype and header
+        first = _map_block(func, *job(0), self.history, axis, 0, None)
+        shape = list(first.shape)
+        shape[axis] = nslab
+        outheader = dict(getattr(first, 'header', header))
+        outheader.update(kargs.get("header", {}))
+        outheader.update({f"o{axis + 1}": o, f"d{axis + 1}": d})
+        if out is not None:
+            dest = RsfOutput(out, n=shape, header=outheader, history=self.history + kargs.get("history", ""),
+                             out=kargs.get("datafile"), form=kargs.get("form", "native"), dtype=first.dtype)
+        else:
+            dest = np.empty(shape, dtype=first.dtype, order='F')
+        # slabs across the output file go through one map of it, opened
+        # here (and once in each worker process), not one map per slab
+        store = dest.memmap() if out is not None and axis != ndim - 1 else dest
+        _store_block(store, first, axis, 0)
+
+        workers = max(1, workers or ASYNC_WORKERS)
+        pool = ProcessPoolExecutor(max_workers=workers) if processes else \
+            ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rsfpy-map")
+        # workers write into the output themselves, except processes into
+        # memory, whose results are stored here in order
+        target = None if processes and out is None else dest if processes else store
+        pending = collections.deque()
+        try:
+            for start in range(chunk, nslab, chunk):
+                pending.append((start, pool.submit(_map_block, func, *job(start), self.history,
+                                                   axis, start, target)))
+                while len(pending) > 2 * workers:
+                    _finish_block(store, target, axis, *pending.popleft())
+            while pending:
+                _finish_block(store, target, axis, *pending.popleft())
+        finally:
+            for _, future in pending:
+                future.cancel()
+            pool.shutdown(wait=True)
+            if store is not dest:
+                store.flush()
+                del store
+
+        if out is not None:
+            dest.finish(mark=axis != ndim - 1)
+            return None
+        return Rsfdata(dest, header=outheader, history=self.history)
+
+    def to_segy(self, file, headers=None, **kwargs):
+        """
+        Write the data as a SEG-Y file, with traces along the first axis.
+
+        Parameters
+        ----------
+        file : str or file-like object
+            The output SEG-Y file.
+        headers : ndarray, optional
+            Structured array of trace headers, e.g. from rsfpy.segy.read_segy.
+        **kwargs
+            text, binary, format and endian, as in rsfpy.segy.write_segy.
+        """
+        from .segy import write_segy
+        write_segy(self, file, headers=headers, **kwargs)
+
     def update(self, new_header: dict={}):
         """
         Update the header information.
@@ -237,17 +575,10 @@ class Rsfdata(np.ndarray):
         new_header : dict
             The new header information to update.
         """
-        self.header.update(new_header)
+        header = self.header
+        header.update(new_header)
         # Update n#
-        for idim in range(9):
-            n_key = f"n{idim + 1}"
-            if idim < self.ndim:
-                self.header.update({n_key: self.shape[idim]})
-                if self.d(idim) == 0.:
-                    dkey = f"d{idim + 1}"
-                    self.header.update({dkey: defaults.get(dkey, 4.e-3)})
-            else:
-                self.header.pop(n_key, None)
+        self._sync(header)
 
     
     def sfput(self, header_str: str = '', **kargs):
@@ -271,33 +602,33 @@ class Rsfdata(np.ndarray):
                     o_key: self.o(idim)
                 })
 
-    def flow(self, cmd: str, rsfarray=True, verb: bool = False):
+    def flow(self, cmd: Union[str, list], rsfarray=True, verb: bool = False, memmap: bool = False):
         """
         Apply RSF flow command to the data.
+        The data is streamed to the command from its own buffer and the
+        output is read straight into the result (see rsfpy.pipeline).
 
         Parameters
         ----------
-        cmd : str
-            The RSF command to apply.
+        cmd : str or list
+            The RSF command to apply: stages separated by "|", or a list of
+            stages (command strings or argument lists).
         rsfarray : bool
             Whether to return the output as an Rsfdata object (default is True).
             If False, return a BytesIO object containing the raw output data.
         verb : bool
             Whether to print verbose output (default is False).
+        memmap : bool
+            Read the output into a memmap of a scratch file under DATAPATH
+            instead of memory (default is False).
         """
-        inp = io.BytesIO()
-        self.write(inp)
-        inp.seek(0)
-        out = flow(cmd, source=inp, verb=verb)
-        out.seek(0)
-        if rsfarray: 
-            rout =  Rsfdata(out)
-            if rout.size == 0:
-                warnings.warn("No RSF data read from flow output, use BytesIo instead.")
-                out.seek(0)
-                return out
-            return rout
-        else: return out
+        if not rsfarray:
+            return flow(cmd, source=self, verb=verb)
+        arr, header, header_text = _run_pipeline(cmd, self, memmap=memmap, verb=verb)
+        if arr is None:
+            warnings.warn("No RSF data read from flow output, use BytesIo instead.")
+            return io.BytesIO(header_text)
+        return Rsfdata(arr, header=header, history=header_text)
 
 
 
@@ -339,7 +670,7 @@ class Rsfdata(np.ndarray):
         """
         if isinstance(axis, (list, tuple, np.ndarray)):
             axis = axis[:len(axis)] if len(axis) < self.ndim else axis[:self.ndim]
-            return [self.header.get(f"n{ax+1}", 1 if self.data else 0) for ax in axis]
+            return [self.n(ax) for ax in axis]
         # return self.header.get(f"n{axis+1}", 1 if self.data else 0)
         return (self.shape[axis] if axis < self.ndim else 1) if self.size > 0 else 0
 
@@ -359,8 +690,10 @@ class Rsfdata(np.ndarray):
         """
         if isinstance(axis, (list, tuple, np.ndarray)):
             axis = axis[:len(axis)] if len(axis) < self.ndim else axis[:self.ndim]
-            return [float(self.header.get(f"d{ax+1}", defaults.get(f"d{ax+1}", 4.e-3))) for ax in axis]
-        return float(self.header.get(f"d{axis+1}", defaults.get(f"d{axis+1}", 4.e-3)))
+            return [self.d(ax) for ax in axis]
+        default = defaults.get(f"d{axis+1}", 4.e-3)
+        d = float(self._get(f"d{axis+1}", default))
+        return float(default) if d == 0. and axis < self.ndim else d
 
     def o(self, axis: Optional[Union[int, list, tuple, np.ndarray]] = 0) -> Union[float, tuple]:
         """
@@ -378,8 +711,8 @@ class Rsfdata(np.ndarray):
         """
         if isinstance(axis, (list, tuple, np.ndarray)):
             axis = axis[:len(axis)] if len(axis) < self.ndim else axis[:self.ndim]
-            return [self.header.get(f"o{ax+1}", defaults.get(f"o{ax+1}", 0.0)) for ax in axis]
-        return float(self.header.get(f"o{axis+1}", defaults.get(f"o{axis+1}", 0.0)))
+            return [self._get(f"o{ax+1}", defaults.get(f"o{ax+1}", 0.0)) for ax in axis]
+        return float(self._get(f"o{axis+1}", defaults.get(f"o{axis+1}", 0.0)))
 
     def label(self, axis: Optional[Union[int, list, tuple, np.ndarray]] = 0) -> Union[str, tuple]:
         """
@@ -397,8 +730,8 @@ class Rsfdata(np.ndarray):
         """
         if isinstance(axis, (list, tuple, np.ndarray)):
             axis = axis[:len(axis)] if len(axis) < self.ndim else axis[:self.ndim]
-            return [self.header.get(f"label{ax+1}", defaults.get(f"label{ax+1}", "")) for ax in axis]
-        return self.header.get(f"label{axis+1}", defaults.get(f"label{axis+1}", ""))
+            return [self._get(f"label{ax+1}", defaults.get(f"label{ax+1}", "")) for ax in axis]
+        return self._get(f"label{axis+1}", defaults.get(f"label{axis+1}", ""))
 
     def unit(self, axis: Optional[Union[int, list, tuple, np.ndarray]] = 0) -> Union[str, tuple]:
         """
@@ -416,8 +749,8 @@ class Rsfdata(np.ndarray):
         """
         if isinstance(axis, (list, tuple, np.ndarray)):
             axis = axis[:len(axis)] if len(axis) < self.ndim else axis[:self.ndim]
-            return [self.header.get(f"unit{ax+1}", defaults.get(f"unit{ax+1}", "")) for ax in axis]
-        return self.header.get(f"unit{axis+1}", defaults.get(f"unit{axis+1}", ""))
+            return [self._get(f"unit{ax+1}", defaults.get(f"unit{ax+1}", "")) for ax in axis]
+        return self._get(f"unit{axis+1}", defaults.get(f"unit{axis+1}", ""))
 
     def label_unit(self, axis: Optional[Union[int, list, tuple, np.ndarray]] = 0) -> Union[str, tuple]:
         """
@@ -488,20 +821,26 @@ class Rsfdata(np.ndarray):
     
     def window(self, cmd=None, squeeze=True, copy=False, **kwargs):
         """
-        Apply simple windowing with only n#, j#, f# parameters.
+        Apply simple windowing with n#, j#, f# or min#, max# parameters.
+        All axes are windowed by one strided slice.
 
         Parameters
         ----------
         cmd : str or None
-            Command-line style, e.g. 'n1=100 j1=2'.
+            Command-line style, e.g. 'n1=100 j1=2' or 'min1=0.5 max1=1.5'.
         squeeze : bool
             Whether to squeeze the output array.
+        copy : bool
+            Return a copy instead of a view of the data.
         n# : int
             Number of samples along axis #.
         j# : int
             Jump factor along axis #.
         f# : int
             First sample along axis #.
+        min#, max# : float
+            Coordinate bounds along axis #, resolved by o# and d# as in
+            sfwindow (instead of f# and n#).
 
         Returns
         -------
@@ -523,45 +862,23 @@ class Rsfdata(np.ndarray):
             raw_params = _parse_cmd_string(cmd)
         else:
             raw_params = dict(kwargs)
-
-        nd = self.ndim
-        params = {f'n{i+1}': None for i in range(nd)}
-        params.update({f'f{i+1}': None for i in range(nd)})
-        params.update({f'j{i+1}': None for i in range(nd)})
-
-        for k, v in raw_params.items():
-            if k in params:
-                params[k] = v
-
-        new_meta = self.header.copy()
-        new_data = self.view()
-        new_data.header = self.header.copy()
-        for ax in range(nd):
-            n = params[f'n{ax+1}'] if params[f'n{ax+1}'] is not None else self.n(ax)
-            j = params[f'j{ax+1}'] if params[f'j{ax+1}'] is not None else 1
-            f = params[f'f{ax+1}'] if params[f'f{ax+1}'] is not None else 0
-            if n < 0: n = self.n(ax)
-            if f < 0: f += self.n(ax)
-            if f >= self.n(ax): f= self.n(ax) - 1
-            slices = np.arange(f, f + n * j, j, dtype=int)
-            slices = slices[np.where((slices >= 0) & (slices < self.n(ax)))]
-            if not copy:
-                istart = slices[0]
-                istep = slices[1] - slices[0] if len(slices) > 1 else 1
-                iend = slices[-1] + istep
-                slicer = [slice(None)] * new_data.ndim
-                slicer[ax] = slice(istart, iend, istep)
-                new_data = new_data[tuple(slicer)]
-            else:
-                new_data = np.take(new_data, slices, axis=ax)
-
-            new_meta[f'n{ax+1}'] = len(slices)
-            new_meta[f'o{ax+1}'] = f * self.d(ax) + self.o(ax)
-            new_meta[f'd{ax+1}'] = (self.d(ax) * j)
-
-        new_data.header = new_meta
-        if squeeze: new_data = np.squeeze(new_data)
-        new_data.update()
+        window = {k: v for k, v in raw_params.items()
+                  if k[:-1] in ("n", "f", "j", "min", "max") and k[-1:].isdigit() and v is not None}
+
+        # n# are set from the shape when the header is first read
+        new_meta = dict(self._meta.header) if self._meta is not None else {}
+        params = _window_params(self.shape, _window_coords(new_meta, window))
+        data = self.view(np.ndarray)[_window_slices(params)]
+        if copy:
+            data = data.copy(order='K')
+        _window_header(new_meta, params)
+        if squeeze:
+            _squeeze_header(new_meta, data.shape)
+            data = data.squeeze()
+
+        new_data = data.view(Rsfdata)
+        new_data._meta = _Meta(new_meta)
+        new_data.history = self.history
         return new_data
 
     def flip(self, axis: int = 0):
@@ -584,7 +901,7 @@ class Rsfdata(np.ndarray):
 
         return new_data
 
-    def pclip(self, perc: float=99.)-> Optional[Union[int, float]]:
+    def pclip(self, perc: float=99., mode: str="exact", cache: Optional[dict]=None)-> Optional[Union[int, float]]:
         """
         Caculate the percentile clipping values.
 
@@ -592,6 +909,13 @@ class Rsfdata(np.ndarray):
         ----------
         perc : float
             The percentile value to clip the data.
+        mode : str
+            "exact", "hist" (streamed histogram) or "sample" (strided
+            subset), see rsfpy.clip.
+        cache : dict, optional
+            Caller-owned memo of clip values, reused while the data does
+            not change (clear it after writing). Read-only data is
+            memoized anyway.
 
         Returns
         -------
@@ -602,8 +926,9 @@ class Rsfdata(np.ndarray):
             return None
         if not 0 <= perc <= 100:
             warnings.warn("Clip percentile must be between 0 and 100. Use default pclip=99.")
+            perc = 99.
         # Compute the clipping values
-        clip = np.percentile(self, perc)
+        clip = percentile_clip(self, perc, mode=mode, absolute=False, cache=cache)
         return clip
     
     # Plot 
@@ -649,6 +974,49 @@ for idim in range(9):
 setattr(Rsfdata, f'clip', property(lambda self: self.pclip()))
 
 
+def _map_block(func, block, header, history, axis, start, dest):
+    """
+    Run func on one map_blocks slab and store the result in dest
+    (returned instead if dest is None).
+    """
+    result = func(Rsfdata(block, header=header, history=history))
+    result = result if isinstance(result, np.ndarray) else np.asarray(result)
+    if result.ndim != block.ndim or result.shape[axis] != block.shape[axis]:
+        raise ValueError(f"map_blocks function returned shape {result.shape} "
+                         f"for a slab of shape {block.shape}")
+    if dest is None:
+        return result
+    _store_block(dest, result, axis, start)
+    return None
+
+
+# maps of map_blocks outputs opened by worker processes, (path, offset) -> memmap
+_output_maps = {}
+
+
+def _store_block(dest, result, axis, start):
+    count = result.shape[axis]
+    if isinstance(dest, RsfOutput):
+        if axis == len(dest.shape) - 1:
+            dest.write_slab(slice(start, start + count), result)
+            return
+        key = (dest.path, dest.offset)
+        if key not in _output_maps:
+            _output_maps[key] = dest.memmap()
+        dest = _output_maps[key]
+    index = (slice(None),) * axis + (slice(start, start + count),)
+    if dest[index].shape != result.shape:
+        raise ValueError(f"map_blocks function returned shape {result.shape}, "
+                         f"expected {dest[index].shape}")
+    dest[index] = result
+
+
+def _finish_block(dest, target, axis, start, future):
+    result = future.result()
+    if target is None:
+        _store_block(dest, result, axis, start)
+
+
 class Rsfarray(np.ndarray):
     """
     Deprecated alias for Rsfdata.
@@ -0,0 +1,239 @@
+"""
+  RsfPy - Python tools for Madagascar RSF data file reading/writing and scientific array handling.
+
+  Copyright (C) 2025 Jilin University
+
+  This program is free software; you can redistribute it and/or modify
+  it under the terms of the GNU General Public License as published by
+  the Free Software Foundation; either version 2 of the License, or
+  (at your option) any later version.
+
+  This program is distributed in the hope that it will be useful,
+  but WITHOUT ANY WARRANTY; without even the implied warranty of
+  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+  GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with this program; if not, write to the Free Software
+  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+"""
+
+# Percentile clip values for display gain (pclip=).
+#
+# np.percentile partially sorts a float64 copy of the whole array, the
+# slowest step of plotting a large cube. percentile_clip has three modes:
+#   exact   np.partition of a float32 copy; np.percentile up to float32
+#           rounding, in half the memory.
+#   hist    streams PCLIP_BLOCKSIZE-element chunks: one pass for the range,
+#           one histogram of PCLIP_BINS bins, and one more histogram of the
+#           bin holding the percentile. The result is within
+#           (max - min) / PCLIP_BINS**2 of the values at the two ranks
+#           around the percentile; memory is one chunk.
+#   sample  exact percentile of about PCLIP_SAMPLES values taken at a fixed
+#           stride (chosen prime to n1, so all samples of a trace are hit).
+# Non-finite values are ignored. Results are memoized only for memory that
+# cannot be written (read_rsf(mmap=True) maps, frombuffer arrays ...):
+# writes to an array can come through any view, put, flat or the buffer
+# itself, and none of them can be seen here. To reuse values of writable arrays, pass a dict
+# as cache= and drop it after changing the data.
+
+import math, weakref
+
+import numpy as np
+
+from .lazy import _blocks
+
+
+__all__ = ["PCLIP_MODES", "PCLIP_BINS", "PCLIP_SAMPLES", "PCLIP_BLOCKSIZE",
+           "percentile_clip"]
+
+PCLIP_MODES = ("exact", "hist", "sample")
+PCLIP_BINS = 1 << 12
+PCLIP_SAMPLES = 1 << 20
+PCLIP_BLOCKSIZE = 1 << 20
+
+# id(read-only memory owner) -> (finalizer, {view and parameters: clip})
+_cache = {}
+
+
+def percentile_clip(arr, perc=99., mode="exact", absolute=True, bias=0., cache=None):
+    """
+    Percentile of |arr - bias| (of arr - bias if not absolute), as used for
+    pclip= display clipping.
+
+    Parameters
+    ----------
+    arr : array_like
+        Input data (Rsfdata, ndarray or memmap).
+    perc : float
+        Percentile between 0 and 100 (default is 99).
+    mode : str
+        "exact", "hist" or "sample" (default is "exact"), see PCLIP_MODES.
+    absolute : bool
+        Take the percentile of absolute values (default is True).
+    bias : float
+        Value subtracted before taking absolute values (default is 0).
+    cache : dict, optional
+        Memo of clip values owned by the caller, for writable arrays whose
+        data does not change between calls; clear it after writing.
+
+    Returns
+    -------
+    float or None
+        The clip value, None if arr has no finite values.
+    """
+    if mode not in PCLIP_MODES:
+        raise ValueError(f"Unknown pclip mode {mode!r}, expected one of {', '.join(PCLIP_MODES)}")
+    arr = np.asanyarray(arr)
+    perc = min(100., max(0., float(perc)))
+    memo = cache if cache is not None else _memo(arr)
+    if memo is not None:
+        key = (arr.__array_interface__["data"][0], arr.shape, arr.strides, arr.dtype.str,
+               perc, mode, bool(absolute), float(bias))
+        if key in memo:
+            return memo[key]
+
+    data = np.asarray(arr)
+    if data.flags.c_contiguous and not data.flags.f_contiguous:
+        # percentiles do not depend on the order; walk the memory in order
+        data = data.T
+    if mode == "exact":
+        clip = _select(_values(data, absolute, bias), perc)
+    elif mode == "sample":
+        clip = _select(_values(_sample(data), absolute, bias), perc)
+    else:
+        clip = _histogram(data, perc, absolute, bias)
+
+    if memo is not None:
+        memo[key] = clip
+    return clip
+
+
+def _owner(arr):
+    """
+    The ndarray at the bottom of the chain of views of arr.
+    """
+    while isinstance(arr.base, np.ndarray):
+        arr = arr.base
+    return arr
+
+
+def _memo(arr):
+    """
+    Memo dict of the memory of arr, None if it can be written.
+    """
+    owner = _owner(arr)
+    if arr.flags.writeable or owner.flags.writeable:
+        return None
+    entry = _cache.get(id(owner))
+    if entry is None:
+        try:
+            finalizer = weakref.finalize(owner, _cache.pop, id(owner), None)
+        except TypeError:
+            return None
+        finalizer.atexit = False
+        entry = _cache[id(owner)] = (finalizer, {})
+    return entry[1]
+
+
+def _values(data, absolute, bias):
+    """
+    Finite values of (|data - bias| or data - bias) as a new flat float32 array.
+    """
+    buf = np.empty(data.shape, dtype=np.float32, order='F')
+    src = data
+    if bias:
+        if np.iscomplexobj(data):
+            src = data - bias
+        else:
+            np.subtract(data, bias, out=buf, casting='unsafe')
+            src = buf
+    if absolute:
+        np.absolute(src, out=buf, casting='unsafe')
+    elif src is not buf:
+        buf[...] = src
+    buf = buf.reshape(-1, order='F')
+    if buf.size and not (np.isfinite(buf.min()) and np.isfinite(buf.max())):
+        buf = buf[np.isfinite(buf)]
+    return buf
+
+
+def _select(values, perc):
+    """
+    Percentile of values (reordered in place), interpolated linearly between
+    the closest ranks as np.percentile does.
+    """
+    if values.size == 0:
+        return None
+    pos = perc / 100. * (values.size - 1)
+    lo = int(pos)
+    hi = min(lo + 1, values.size - 1)
+    # one selection; partitioning for two ranks at once is many times slower
+    values.partition(hi)
+    high = float(values[hi])
+    low = float(values[:hi].max()) if hi != lo else high
+    return low + (pos - lo) * (high - low)
+
+
+def _sample(data):
+    """
+    About PCLIP_SAMPLES elements of data (in memory order) at a fixed stride.
+    """
+    step = max(1, data.size // PCLIP_SAMPLES)
+    if step == 1:
+        return data
+    n1 = data.shape[0]
+    while math.gcd(step, n1) != 1:
+        step += 1
+    if data.flags.f_contiguous:
+        return data.reshape(-1, order='F')[::step]
+    parts, pos = [], 0
+    for block in _blocks(data.shape, PCLIP_BLOCKSIZE):
+        flat = data[block].reshape(-1, order='F')
+        parts.append(flat[(-pos) % step::step])
+        pos += flat.size
+    return np.concatenate(parts)
+
+
+def _histogram(data, perc, absolute, bias):
+    """
+    Percentile from a histogram over the range of the values, refined once
+    within the bin holding it.
+    """
+    def chunks():
+        for block in _blocks(data.shape, PCLIP_BLOCKSIZE):
+            yield _values(data[block], absolute, bias)
+
+    count, lo, hi = 0, np.inf, -np.inf
+    for values in chunks():
+        if values.size:
+            count += values.size
+            lo, hi = min(lo, float(values.min())), max(hi, float(values.max()))
+    if count == 0:
+        return None
+    rank = perc / 100. * (count - 1)
+
+    top = hi
+    for refine in (False, True):
+        if hi <= lo:
+            return lo
+        scale = PCLIP_BINS / (hi - lo)
+        counts = np.zeros(PCLIP_BINS, dtype=np.int64)
+        below = 0
+        for values in chunks():
+            if refine:
+                below += np.count_nonzero(values < lo)
+                values = values[(values >= lo) & ((values < hi) | (values == top))]
+            np.subtract(values, lo, out=values)
+            np.multiply(values, scale, out=values)
+            index = values.astype(np.intp)
+            np.minimum(index, PCLIP_BINS - 1, out=index)
+            counts += np.bincount(index, minlength=PCLIP_BINS)
+        cum = np.cumsum(counts) + below
+        k = min(int(np.searchsorted(cum, rank, side='right')), PCLIP_BINS - 1)
+        start = int(cum[k] - counts[k])
+        width = (hi - lo) / PCLIP_BINS
+        lo, hi = lo + k * width, lo + (k + 1) * width
+    # spread the values of the last bin evenly over it
+    return lo + width * min(1., (rank - start + 0.5) / max(int(counts[k]), 1))
+
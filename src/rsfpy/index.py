@@ -0,0 +1,215 @@
+"""
+  RsfPy - Python tools for Madagascar RSF data file reading/writing and scientific array handling.
+
+  Copyright (C) 2025 Jilin University
+
+  This program is free software; you can redistribute it and/or modify
+  it under the terms of the GNU General Public License as published by
+  the Free Software Foundation; either version 2 of the License, or
+  (at your option) any later version.
+
+  This program is distributed in the hope that it will be useful,
+  but WITHOUT ANY WARRANTY; without even the implied warranty of
+  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+  GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with this program; if not, write to the Free Software
+  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+"""
+
+# Header-only index of the RSF files below a directory.
+#
+# Only headers are parsed; binaries are just stat'ed, so a project with tens of
+# thousands of datasets can be listed and checked quickly. Each entry records
+# shape, data_format, the resolved in= path and the binary size against the
+# expected n1*n2*...*esize. Entries are kept in a JSON lines file and reused
+# on rescan while the header and binary mtime/size are unchanged.
+
+import os, json, fnmatch
+
+import numpy as np
+
+from .io import _read_header, _data_layout, _compression, _chunk_shape, _part_path, _resolve_in
+
+
+__all__ = ["INDEX_NAME", "scan", "index_file", "load_index", "save_index", "problems"]
+
+INDEX_NAME = ".rsfindex.jsonl"
+
+
+def scan(root='.', index=None, pattern="*.rsf", save=True):
+    """
+    Index all RSF headers below root.
+
+    Parameters
+    ----------
+    root : str
+        Top of the directory tree to walk.
+    index : str, optional
+        Index file (default is INDEX_NAME in root). Entries whose header and
+        binary are unchanged are taken from it instead of being re-parsed.
+    pattern : str
+        Glob pattern for header file names (default is "*.rsf").
+    save : bool
+        Write the updated index back (default is True).
+
+    Returns
+    -------
+    list of dict
+        One entry per header, sorted by path (relative to root).
+    """
+    if index is None:
+        index = os.path.join(root, INDEX_NAME)
+    cached = load_index(index)
+
+    entries = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(fnmatch.filter(filenames, pattern)):
+            path = os.path.join(dirpath, name)
+            rel = os.path.relpath(path, root)
+            entry = cached.get(rel)
+            if entry is None or not _is_current(entry, path):
+                entry = index_file(path)
+                entry["path"] = rel
+            entries.append(entry)
+
+    if save:
+        save_index(entries, index)
+    return entries
+
+
+def index_file(path):
+    """
+    Build the index entry of one RSF header without reading its data.
+
+    Returns
+    -------
+    dict
+        path, mtime, size, in, shape, data_format, esize, data_compression,
+        offset, binary_size, binary_mtime, expected_size, status and error.
+        expected_size is None (no size check) for ascii and compressed data.
+        status is one of "ok", "invalid" (unreadable header), "missing"
+        (no binary), "short" or "long" (binary size differs from expected),
+        or "partial" (an RsfOutput not finished yet).
+    """
+    st = os.stat(path)
+    entry = {"path": path, "mtime": st.st_mtime_ns, "size": st.st_size,
+             "in": None, "shape": None, "data_format": None, "esize": None,
+             "data_compression": None, "offset": 0, "binary_size": None, "binary_mtime": None,
+             "expected_size": None, "status": "ok", "error": ""}
+    try:
+        with open(path, 'rb') as fp:
+            header, _, data_fp = _read_header(fp)
+            if header.get("in") == "stdin":
+                entry["offset"] = data_fp.tell()
+        shape, fmt_A, fmt_B, dtype = _data_layout(header)
+        compression = _compression(header, header["in"] if header["in"] != "stdin" else None)
+        chunks = _chunk_shape(header, shape, fmt_A)
+    except Exception as e:
+        entry.update(status="invalid", error=str(e))
+        return entry
+
+    entry.update({"in": _binary_path(path, header), "shape": shape,
+                  "data_format": f"{fmt_A}_{fmt_B}",
+                  "esize": int(header.get("esize", dtype.itemsize)),
+                  "data_compression": compression})
+    if fmt_A != "ascii" and compression is None:
+        if chunks is not None:
+            # edge bricks are padded
+            shape = [-(-n // c) * c for n, c in zip(shape, chunks)]
+        entry["expected_size"] = int(np.prod(shape, dtype=np.int64)) * dtype.itemsize
+    _check_binary(entry)
+    return entry
+
+
+def load_index(index):
+    """
+    Read an index file into a dict of entries keyed by path.
+    A missing or unreadable index gives an empty dict.
+    """
+    entries = {}
+    try:
+        with open(index, 'r') as fp:
+            for line in fp:
+                if line.strip():
+                    entry = json.loads(line)
+                    entries[entry["path"]] = entry
+    except (OSError, ValueError, KeyError):
+        return {}
+    return entries
+
+
+def save_index(entries, index):
+    """
+    Write entries to an index file, replacing it atomically.
+    """
+    tmp = f"{index}.{os.getpid()}.tmp"
+    with open(tmp, 'w') as fp:
+        for entry in entries:
+            fp.write(json.dumps(entry, separators=(",", ":")) + "\n")
+    os.replace(tmp, index)
+
+
+def problems(entries):
+    """
+    Return the entries whose status is not "ok".
+    """
+    return [entry for entry in entries if entry["status"] != "ok"]
+
+
+def _binary_path(path, header):
+    """
+    Resolve in= of the header at path as read_rsf does: relative binaries
+    are opened from the current directory, as by Madagascar programs.
+    """
+    if header["in"] == "stdin":
+        return path
+    _resolve_in(header, path)
+    return header["in"]
+
+
+def _check_binary(entry):
+    """
+    Stat the binary of entry and set binary_size, binary_mtime and status.
+    """
+    try:
+        st = os.stat(entry["in"])
+    except OSError:
+        entry.update(binary_size=None, binary_mtime=None, status="missing",
+                     error=f"Data file not accessible: {entry['in']}")
+        return
+    size = st.st_size - entry["offset"]
+    entry.update(binary_size=size, binary_mtime=st.st_mtime_ns, status="ok", error="")
+    expected = entry["expected_size"]
+    if expected is not None and size != expected:
+        entry["status"] = "short" if size < expected else "long"
+        entry["error"] = f"Binary has {size} bytes, expected {expected}"
+    elif os.path.exists(_part_path(entry["in"])):
+        entry["status"] = "partial"
+        entry["error"] = "Slabs still being written (RsfOutput not finished)"
+
+
+def _is_current(entry, path):
+    """
+    Whether a cached entry still describes the header at path and its binary.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    if (st.st_mtime_ns, st.st_size) != (entry.get("mtime"), entry.get("size")):
+        return False
+    if entry.get("status") == "invalid":
+        return True
+    if entry.get("status") == "partial":
+        return False
+    if entry.get("binary_mtime") is None:
+        return not os.path.exists(entry["in"])
+    try:
+        st = os.stat(entry["in"])
+    except OSError:
+        return False
+    return (st.st_mtime_ns, st.st_size - entry["offset"]) == \
+        (entry["binary_mtime"], entry["binary_size"])
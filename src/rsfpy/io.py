@@ -1,11 +1,30 @@
 import numpy as np
-import warnings, re, os, io, datetime, socket
-from .utils import _check_input_source, _str_match_re, _get_datapath
+import warnings, re, os, io, datetime, socket, itertools, threading, asyncio, collections
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+try:
+    import lzma
+except ImportError:
+    lzma = None
+from .utils import _check_input_source, _get_datapath, _URL_SCHEMES
 from .version import __version__
 
 RSFHSPLITER = b"\x0c\x0c\x04"
+HEADER_BLOCKSIZE = 1 << 16
+DATA_BLOCKSIZE = 1 << 24
+ASCII_BLOCKSIZE = 1 << 16
+COALESCE_GAP = 1 << 18
+COMPRESS_BLOCKSIZE = 1 << 20
+PREFETCH_BYTES = 1 << 28
+# whitespace-free runs, where double-quoted parts may contain whitespace
+_HEADER_TOKEN = re.compile(r'(?:[^\s"]+|"[^"]*"|")+')
+_HEADER_INT_KEYS = {"esize", "compression_block"} | {f"{k}{i}" for k in ("n", "chunk") for i in range(1, 10)}
+_HEADER_FLOAT_KEYS = {f"{k}{i}" for k in "od" for i in range(1, 10)}
+# imaginary unit of ascii complex samples, e.g. 1.5-2i
+_ASCII_IMAG = re.compile(rb"i(?=\s|$)")
+_COMPRESSION_SUFFIX = {".gz": "gzip", ".zz": "zlib", ".xz": "lzma"}
 
-def read_rsf(file, order='F'):
+def read_rsf(file, order='F', mmap=False, **window):
     """
     Read RSF file and return (data, header) or None.
 
@@ -13,6 +32,23 @@ def read_rsf(file, order='F'):
     ----------
     file : str or file-like object
         The RSF file to read.
+    mmap : bool or str
+        Memory-map the binary data instead of reading it into memory
+        (default is False). True (or "r") maps it read-only; "c" maps it
+        copy-on-write, so that it can be written in memory without
+        changing the file. Only native/xdr data stored in a regular file
+        can be mapped; other sources fall back to a normal read.
+        Data in shared memory (in="shm://name") is always viewed, not copied.
+    n# : int, optional
+        Number of samples along axis # to read.
+    f# : int, optional
+        First sample along axis # to read.
+    j# : int, optional
+        Jump factor along axis #.
+    min#, max# : float, optional
+        Coordinate bounds along axis #, instead of f# and n#.
+        As in Rsfdata.window(squeeze=False), but only the requested
+        hyperslab is read from native/xdr binary files.
 
     Returns
     -------
@@ -21,6 +57,12 @@ def read_rsf(file, order='F'):
     order : str
         The order in which to read the data (default is 'F' for Fortran-style).
     """
+    if mmap not in (False, True, "r", "c"):
+        raise ValueError(f"Invalid mmap mode: {mmap!r}, expected a bool, 'r' or 'c'")
+    for key in window:
+        if not ((len(key) == 2 and key[0] in "nfj" or len(key) == 4 and key[:3] in ("min", "max"))
+                and key[-1] in "123456789"):
+            raise TypeError(f"read_rsf() got an unexpected keyword argument '{key}'")
     try:
         close_after = isinstance(file, str)
 
@@ -28,122 +70,1330 @@ def read_rsf(file, order='F'):
         if file_fp is None:
             return None
 
-        header = {}
-        data = None
-
-        # Read header
-        buf = bytearray()
-        while True:
-            chunk = file_fp.read(1)
-            if not chunk:
-                break
-            buf.extend(chunk)
-            if buf.endswith(RSFHSPLITER):
-                break
-
-        header_text = buf.rstrip(RSFHSPLITER).decode("utf-8", errors="ignore")
-        
-        header = _str_match_re(header_text)
-
-        # Format conversion
-        for k, v in list(header.items()):
-            if re.fullmatch(r"n[1-9]", k) or k == "esize":
-                try:
-                    header[k] = int(v)
-                except ValueError:
-                    pass
-            elif re.fullmatch(r"[od][1-9]", k):
-                try:
-                    header[k] = float(v)
-                except ValueError:
-                    pass
-
-        # data source
-        in_val = header.get("in", None)
-        if in_val is None:
-            warnings.warn("'in' key not found in RSF header")
+        header, header_text, data_fp = _read_header(file_fp)
+        _resolve_in(header, file)
+        try:
+            shape, fmt_A, fmt_B, dtype = _data_layout(header)
+        except ValueError as e:
+            warnings.warn(str(e))
             return None
+        params = _window_params(shape, _window_coords(header, window)) if window else None
+        chunks = _chunk_shape(header, shape, fmt_A)
 
-        if in_val == "stdin":
-            data_file = file_fp
+        # data source
+        in_val = header["in"]
+        if in_val.startswith("shm://"):
+            data_file = None
+        elif in_val == "stdin":
+            data_file = _decompressed(data_fp, header)
         else:
             data_file = _check_input_source(in_val, 'rb')
             if data_file is None:
                 warnings.warn(f"Data file not accessible: {in_val}")
                 return None
+            data_file = _decompressed(data_file, header, in_val)
+
+        windowed = mapped = False
+        if data_file is None:
+            from .shared import attach_shared
+            raw = attach_shared(in_val)[0]
+            arr = raw[:int(np.prod(shape, dtype=np.int64)) * dtype.itemsize].view(dtype)
+            mapped = True
+        elif fmt_A == "ascii":
+            arr = _read_ascii(data_file, dtype, int(np.prod(shape, dtype=np.int64)))
+        elif chunks is not None and order == 'F':
+            arr = _read_bricks(data_file, dtype, shape, chunks, params)
+            windowed = True
+        elif chunks is not None:
+            arr = _read_bricks(data_file, dtype, shape, chunks).reshape(-1, order='F')
+        elif params is not None and order == 'F' and not mmap:
+            arr = _read_window(data_file, dtype, shape, params)
+            windowed = True
+        else:
+            arr = _memmap_data(data_file, dtype, shape, order, 'c' if mmap == "c" else 'r') \
+                if mmap else None
+            mapped = arr is not None
+            if arr is None:
+                # writable, so that results can be computed in place
+                arr = np.empty(int(np.prod(shape, dtype=np.int64)), dtype=dtype)
+                if _readinto_full(data_file, arr) < arr.nbytes:
+                    raise ValueError("Unexpected end of RSF data")
+        if not mapped:
+            # only mapped xdr data stays big-endian
+            arr = _native(arr)
+
+        if not windowed:
+            arr = arr.reshape(shape, order=order)
+            if params is not None:
+                arr = arr[_window_slices(params)]
+        if params is not None:
+            _window_header(header, params)
+
+        if data_file is not None and in_val != "stdin":
+            data_file.close()
+        if close_after:
+            file_fp.close()
+
+        return [arr, header, header_text]
+
+    except Exception as e:
+        warnings.warn(f"Error reading RSF: {e}")
+        return None
+
+
+def iter_rsf(file, axis=-1, chunk=1, prefetch=0, max_bytes=None):
+    """
+    Iterate over RSF data in slabs along the slowest axis.
+    Only one slab is read at a time (or prefetch slabs ahead), so
+    arbitrarily large files (including in="stdin" pipes) can be processed
+    in bounded memory.
+
+    Parameters
+    ----------
+    file : str or file-like object
+        The RSF file to read.
+    axis : int
+        The axis to iterate along. Only the slowest (last) axis is
+        supported, since its hyperplanes are contiguous on disk.
+    chunk : int
+        Number of hyperplanes per slab (default is 1). The last slab
+        may be shorter.
+    prefetch : int
+        Number of slabs read ahead on a background thread (default is 0,
+        no read-ahead), see Prefetcher. Regular files are also advised
+        to the kernel as read sequentially.
+    max_bytes : int, optional
+        Byte budget of the slabs read ahead (default is PREFETCH_BYTES).
+
+    Yields
+    ------
+    Rsfdata
+        Slabs with n#, o# of the iterated axis updated accordingly.
+    """
+    slabs = _iter_slabs(file, axis, chunk, advise=prefetch > 0)
+    if prefetch > 0:
+        slabs = Prefetcher(slabs, depth=prefetch, max_bytes=max_bytes)
+    return slabs
+
+
+def _iter_slabs(file, axis, chunk, advise=False):
+    """
+    The slabs of iter_rsf; with advise, sequential access and the next
+    slab are announced to the kernel with posix_fadvise.
+    """
+    from .array import Rsfdata
 
-        # shape
-        shape = []
-        for i in range(1, 10):
-            key = f"n{i}"
-            if key in header:
-                shape.append(int(header[key]))
+    close_after = isinstance(file, str)
+    file_fp = _check_input_source(file, 'rb')
+    if file_fp is None:
+        raise ValueError(f"Cannot open file: {file}")
+    data_file = file_fp
+    try:
+        header, header_text, data_fp = _read_header(file_fp)
+        _resolve_in(header, file)
+        shape, fmt_A, fmt_B, dtype = _data_layout(header)
+        ndim = len(shape)
+        if axis < 0:
+            axis += ndim
+        if axis != ndim - 1:
+            raise ValueError(f"Slabs are only supported along the slowest axis ({ndim - 1}), got {axis}")
+        if fmt_A == "ascii":
+            raise ValueError("Slab reading does not support ascii data")
+        chunk = max(1, int(chunk))
+        if header["in"] == "stdin":
+            data_file = _decompressed(data_fp, header)
+        else:
+            data_file = _check_input_source(header["in"], 'rb')
+            if data_file is None:
+                raise ValueError(f"Data file not accessible: {header['in']}")
+            data_file = _decompressed(data_file, header, header["in"])
+
+        plane = shape[:-1]
+        nplane = int(np.prod(plane, dtype=np.int64))
+        n = shape[-1]
+        o = float(header.get(f"o{ndim}", 0.))
+        d = float(header.get(f"d{ndim}", 1.))
+        chunks = _chunk_shape(header, shape, fmt_A)
+        reader = _RangeReader(data_file) if chunks is not None else None
+        # only regular files are advised; pipes (stdin) are just read ahead
+        advise = advise and reader is None and not isinstance(data_file, _BlockReader) \
+            and _seekable(data_file)
+        if advise:
+            base = data_file.tell()
+            _fadvise(data_file, base, 0, "POSIX_FADV_SEQUENTIAL")
+        for first in range(0, n, chunk):
+            count = min(chunk, n - first)
+            if reader is not None:
+                params = [(0, 1, size) for size in plane] + [(first, 1, count)]
+                arr = _read_bricks(reader, dtype, shape, chunks, params)
             else:
+                if advise and first + count < n:
+                    nbytes = nplane * dtype.itemsize
+                    _fadvise(data_file, base + (first + count) * nbytes,
+                             min(chunk, n - first - count) * nbytes, "POSIX_FADV_WILLNEED")
+                arr = np.empty(nplane * count, dtype=dtype)
+                nread = _readinto_full(data_file, arr)
+                if nread < arr.nbytes:
+                    warnings.warn(f"Unexpected end of RSF data at n{ndim}={first}")
+                    return
+            arr = _native(arr)
+            slab_header = dict(header)
+            slab_header[f"n{ndim}"] = count
+            slab_header[f"o{ndim}"] = o + first * d
+            yield Rsfdata(arr.reshape(plane + [count], order='F'),
+                          header=slab_header, history=header_text)
+    finally:
+        if data_file is not file_fp:
+            data_file.close()
+        if close_after:
+            file_fp.close()
+
+
+class Prefetcher:
+    """
+    Iterate over an iterable on a background thread, keeping up to depth
+    items (arrays of at most about max_bytes in total) ready ahead of the
+    consumer, so that reading the next slabs overlaps with processing.
+    Exceptions raised by the iterable are raised by next() in order.
+
+    Usage:
+      > with Prefetcher(iter_rsf("big.rsf", chunk=16), depth=4) as slabs:\n
+      >     for slab in slabs:\n
+      >         process(slab)\n
+
+    Parameters
+    ----------
+    iterable : iterable
+        Items to prefetch, typically slabs from iter_rsf.
+    depth : int
+        Maximum number of items read ahead (default is 2).
+    max_bytes : int, optional
+        Byte budget of the items read ahead (default is PREFETCH_BYTES).
+        An item larger than the budget is still read, one at a time.
+    """
+
+    def __init__(self, iterable, depth=2, max_bytes=None):
+        self._queue = _PrefetchQueue(max(1, int(depth)),
+                                     PREFETCH_BYTES if max_bytes is None else max_bytes)
+        # the thread only holds the queue, so an abandoned Prefetcher is collected and closed
+        threading.Thread(target=_prefetch_worker, args=(self._queue, iter(iterable)),
+                         name="rsfpy-prefetch", daemon=True).start()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self._queue.get()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def __del__(self):
+        self.close()
+
+    def close(self):
+        """
+        Stop reading ahead. The iterable is closed by the background thread.
+        """
+        self._queue.close()
+
+
+class _PrefetchQueue:
+    """
+    Items handed from the prefetch thread to the consumer, bounded by
+    count and bytes.
+    """
+    _DONE = object()
+
+    def __init__(self, depth, max_bytes):
+        self.depth = depth
+        self.max_bytes = max_bytes
+        self.items = collections.deque()
+        self.pending = 0
+        self.nbytes = 0
+        self.stopped = False
+        self.cond = threading.Condition()
+
+    def wait_room(self):
+        with self.cond:
+            self.cond.wait_for(lambda: self.stopped or self.pending < self.depth)
+            return not self.stopped
+
+    def put(self, item):
+        size = getattr(item, "nbytes", 0)
+        with self.cond:
+            self.cond.wait_for(lambda: self.stopped or self.pending == 0
+                               or self.nbytes + size <= self.max_bytes)
+            if self.stopped:
+                return False
+            self.items.append((item, size, None))
+            self.pending += 1
+            self.nbytes += size
+            self.cond.notify_all()
+            return True
+
+    def finish(self, error=None):
+        with self.cond:
+            if not self.stopped:
+                self.items.append((self._DONE, 0, error))
+            self.cond.notify_all()
+
+    def get(self):
+        with self.cond:
+            self.cond.wait_for(lambda: self.items)
+            item, size, error = self.items.popleft()
+            if item is self._DONE:
+                self.items.appendleft((item, 0, None))
+                if error is not None:
+                    raise error
+                raise StopIteration
+            self.pending -= 1
+            self.nbytes -= size
+            self.cond.notify_all()
+            return item
+
+    def close(self):
+        with self.cond:
+            if not self.stopped:
+                self.stopped = True
+                self.items.clear()
+                self.items.append((self._DONE, 0, None))
+            self.cond.notify_all()
+
+
+def _prefetch_worker(queue, iterator):
+    error = None
+    try:
+        while queue.wait_room():
+            try:
+                item = next(iterator)
+            except StopIteration:
                 break
-        if not shape:
-            warnings.warn("No n# keys found for shape")
-            return None
+            if not queue.put(item):
+                break
+    except BaseException as e:
+        error = e
+    finally:
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            close()
+        queue.finish(error)
 
-        # data_format
-        fmt = header.get("data_format", None)
-        if fmt is None:
-            warnings.warn("'data_format' key not found")
-            return None
-        try:
-            fmt_A, fmt_B = fmt.split("_", 1)
-        except ValueError:
-            warnings.warn(f"Invalid data_format: {fmt}")
-            return None
 
-        if fmt_A not in ("native", "ascii", "xdr"):
-            warnings.warn(f"Unsupported format type: {fmt_A}")
-            return None
-        if fmt_B not in ("int", "float", "complex", "uchar"):
-            warnings.warn(f"Unsupported data type: {fmt_B}")
-            return None
+def _fadvise(fp, offset, length, advice):
+    """
+    Pass an access pattern hint for a regular file to the kernel, where
+    posix_fadvise is available.
+    """
+    advice = getattr(os, advice, None)
+    if advice is None or not hasattr(os, "posix_fadvise"):
+        return
+    try:
+        os.posix_fadvise(fp.fileno(), offset, length, advice)
+    except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+        pass
+
+
+def read_many(paths, axis=-1, workers=None):
+    """
+    Read several RSF files with identical layout and stack them along a
+    new axis, as np.stack would, but without holding both the inputs and
+    the stacked copy: the output is allocated once and each file is read
+    straight into its slice by a pool of threads.
+
+    Parameters
+    ----------
+    paths : sequence of str or file-like objects
+        The RSF files to read. All must share n#, o#, d# and data_format.
+    axis : int
+        Position of the new axis in the result (default is -1, the slowest
+        axis, for which every file fills a contiguous block).
+    workers : int, optional
+        Number of reader threads (default is ASYNC_WORKERS).
+
+    Returns
+    -------
+    Rsfdata
+        The stacked data, with the header of the first file and the axis
+        keys after the new axis shifted by one.
+    """
+    from .array import Rsfdata
 
-        dtype_map = {
-            "int": np.int32,
-            "float": np.float32,
-            "complex": np.complex64,
-            "uchar": np.uint8
-        }
-        dtype = dtype_map[fmt_B]
+    paths = list(paths)
+    if not paths:
+        raise ValueError("No RSF files to read")
+    workers = max(1, min(len(paths), workers or ASYNC_WORKERS))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rsfpy-io") as pool:
+        probes = list(pool.map(_stack_probe, paths))
+
+        header0, history, layout0, _, _ = probes[0]
+        shape, fmt_A, fmt_B, dtype = layout0
+        ndim = len(shape)
+        keys = [f"{k}{i + 1}" for k in "od" for i in range(ndim)]
+        for path, (header, _, layout, _, _) in zip(paths[1:], probes[1:]):
+            if layout[:3] != layout0[:3] or any(
+                    header.get(k) != header0.get(k) for k in keys):
+                raise ValueError(f"Incompatible RSF header: {path}")
+
+        if not -ndim - 1 <= axis <= ndim:
+            raise ValueError(f"axis {axis} is out of bounds for stacking {ndim}-d data")
+        if axis < 0:
+            axis += ndim + 1
+        out = np.empty(shape[:axis] + [len(paths)] + shape[axis:],
+                       dtype=dtype.newbyteorder("="), order='F')
+        index = (slice(None),) * axis
+        jobs = [pool.submit(_stack_fill, path, probe, out[index + (i,)])
+                for i, (path, probe) in enumerate(zip(paths, probes))]
+        for job in jobs:
+            job.result()
+
+    header = {k: v for k, v in header0.items()
+              if not any(k.startswith(p) and k[len(p):].isdigit()
+                         for p in ("n", "o", "d", "label", "unit"))}
+    for idim in range(ndim):
+        new_idim = idim + 1 if idim < axis else idim + 2
+        for ktype in ("o", "d", "label", "unit"):
+            if f"{ktype}{idim + 1}" in header0:
+                header[f"{ktype}{new_idim}"] = header0[f"{ktype}{idim + 1}"]
+    header.update({f"o{axis + 1}": 0., f"d{axis + 1}": 1.})
+    return Rsfdata(out, header=header, history=history)
+
+
+def _stack_probe(file):
+    """
+    Read the header of one read_many input.
+    Returns (header, history, layout, data_fp, offset); file paths are closed
+    again and reopened later, so thousands of inputs do not exhaust descriptors.
+    """
+    close_after = isinstance(file, str)
+    file_fp = _check_input_source(file, 'rb')
+    if file_fp is None:
+        raise ValueError(f"Cannot open file: {file}")
+    try:
+        header, header_text, data_fp = _read_header(file_fp)
+        _resolve_in(header, file)
+        layout = _data_layout(header)
+        offset = data_fp.tell() if close_after else None
+    finally:
+        if close_after:
+            file_fp.close()
+    return header, header_text, layout, None if close_after else data_fp, offset
 
+
+def _stack_fill(file, probe, dest):
+    """
+    Read the data of one read_many input into dest.
+    """
+    header, _, (shape, fmt_A, _, dtype), data_fp, offset = probe
+    if header["in"] != "stdin":
+        data_file = _check_input_source(header["in"], 'rb')
+    elif data_fp is None:
+        data_file = _check_input_source(file, 'rb')
+        if data_file is not None:
+            data_file.seek(offset)
+    else:
+        data_file = data_fp
+    if data_file is None:
+        raise ValueError(f"Data file not accessible: {header['in']}")
+    raw_file = data_file
+    data_file = _decompressed(data_file, header,
+                              header["in"] if header["in"] != "stdin" else None)
+    try:
+        count = int(np.prod(shape, dtype=np.int64))
+        chunks = _chunk_shape(header, shape, fmt_A)
+        if chunks is not None:
+            dest[...] = _read_bricks(data_file, dtype, shape, chunks)
+            return
         if fmt_A == "ascii":
-            ascii_text = data_file.read().decode("utf-8", errors="ignore").strip()
-            parts = ascii_text.split()
-            if fmt_B == "complex":
-                def parse_complex(s):
-                    s = s.replace("i", "j")
-                    return complex(s)
-                arr = np.array([parse_complex(p) for p in parts], dtype=dtype)
-            else:
-                arr = np.array([float(p) for p in parts], dtype=dtype)
+            arr = _read_ascii(data_file, dtype, count)
+            if arr.size < count:
+                raise ValueError(f"Unexpected end of RSF data: {file}")
+            dest[...] = arr.reshape(shape, order='F')
+            return
+        buf = dest if dest.flags.f_contiguous else np.empty(shape, dtype=dtype, order='F')
+        if _readinto_full(data_file, buf) < buf.nbytes:
+            raise ValueError(f"Unexpected end of RSF data: {file}")
+        if buf is not dest:
+            dest[...] = buf
+        elif not dtype.isnative:
+            dest.byteswap(inplace=True)
+    finally:
+        if raw_file is not data_fp:
+            raw_file.close()
+
+
+def _read_header(file_fp, blocksize=HEADER_BLOCKSIZE):
+    """
+    Read the RSF header from file_fp in blocks of blocksize bytes.
+    Returns (header, header_text, data_fp), where data_fp is positioned
+    at the first data byte: file_fp itself if it is seekable, otherwise a
+    reader that replays the bytes read past the separator.
+    """
+    read = getattr(file_fp, 'read1', file_fp.read)
+    buf = bytearray()
+    idx = -1
+    while True:
+        block = read(blocksize)
+        if not block:
+            break
+        start = max(0, len(buf) - len(RSFHSPLITER) + 1)
+        buf.extend(block)
+        idx = buf.find(RSFHSPLITER, start)
+        if idx >= 0:
+            break
+
+    if idx >= 0:
+        overflow = bytes(buf[idx + len(RSFHSPLITER):])
+        del buf[idx:]
+    else:
+        overflow = b""
+    data_fp = file_fp
+    if overflow:
+        try:
+            file_fp.seek(-len(overflow), io.SEEK_CUR)
+        except (AttributeError, OSError, ValueError):
+            data_fp = _PrefixedReader(overflow, file_fp)
+
+    header_text = buf.decode("utf-8", errors="ignore")
+    return _parse_header(header_text), header_text, data_fp
+
+
+def _resolve_in(header, file):
+    """
+    Point in= of a header read from a URL to the binary on the same server.
+    """
+    in_val = header.get("in")
+    if isinstance(file, str) and file.startswith(_URL_SCHEMES) and isinstance(in_val, str) \
+            and in_val != "stdin" and not in_val.startswith("shm://"):
+        from .remote import data_url
+        header["in"] = data_url(file, in_val)
+
+
+def _parse_header(header_text):
+    """
+    Parse key=value pairs of an RSF header in one pass, converting
+    n#/esize to int and o#/d# to float. Later keys override earlier ones.
+    """
+    header = {}
+    for token in _HEADER_TOKEN.findall(header_text):
+        k, sep, v = token.partition("=")
+        if not sep:
+            continue
+        if v and v[0] in "\"'" and v.endswith(v[0]):
+            v = v[1:-1]
+        if k in _HEADER_INT_KEYS:
+            try:
+                v = int(v)
+            except ValueError:
+                pass
+        elif k in _HEADER_FLOAT_KEYS:
+            try:
+                v = float(v)
+            except ValueError:
+                pass
+        header[k] = v
+    return header
+
+
+class _PrefixedReader(io.RawIOBase):
+    """
+    Read-only stream returning prefix bytes before the rest of fp.
+    Closing it leaves fp open.
+    """
+    def __init__(self, prefix, fp):
+        self._prefix = memoryview(prefix)
+        self._fp = fp
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        b = memoryview(b).cast('B')
+        if self._prefix:
+            n = min(len(b), len(self._prefix))
+            b[:n] = self._prefix[:n]
+            self._prefix = self._prefix[n:]
+            return n
+        if hasattr(self._fp, 'readinto'):
+            return self._fp.readinto(b)
+        data = self._fp.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+    def readall(self):
+        head = bytes(self._prefix)
+        self._prefix = memoryview(b"")
+        return head + self._fp.read()
+
+
+def _data_layout(header):
+    """
+    Resolve shape, format type, data type and numpy dtype from a header.
+    Raise ValueError if the header does not describe readable data.
+    """
+    if header.get("in", None) is None:
+        raise ValueError("'in' key not found in RSF header")
+
+    # shape
+    shape = []
+    for i in range(1, 10):
+        key = f"n{i}"
+        if key in header:
+            shape.append(int(header[key]))
         else:
-            arr = np.frombuffer(data_file.read(), dtype=dtype)
-            if fmt_A == "xdr":
-                swapped = arr.byteswap()
-                if hasattr(swapped, 'newbyteorder'):
-                    arr = swapped.newbyteorder()
-                else: arr = arr.view(swapped.dtype.newbyteorder())
+            break
+    if not shape:
+        raise ValueError("No n# keys found for shape")
 
-        arr = arr.reshape(shape, order=order)
+    # data_format
+    fmt = header.get("data_format", None)
+    if fmt is None:
+        raise ValueError("'data_format' key not found")
+    try:
+        fmt_A, fmt_B = fmt.split("_", 1)
+    except ValueError:
+        raise ValueError(f"Invalid data_format: {fmt}")
 
-        if in_val != "stdin":
-            data_file.close()
-        if close_after:
+    if fmt_A not in ("native", "ascii", "xdr"):
+        raise ValueError(f"Unsupported format type: {fmt_A}")
+    dtype_map = {
+        "int": np.int32,
+        "float": np.float32,
+        "complex": np.complex64,
+        "uchar": np.uint8,
+        "short": np.int16,
+        "long": np.int64,
+        "double": np.float64,
+        "complexdouble": np.complex128
+    }
+    if fmt_B not in dtype_map:
+        raise ValueError(f"Unsupported data type: {fmt_B}")
+    dtype = np.dtype(dtype_map[fmt_B])
+    if fmt_A == "xdr":
+        dtype = dtype.newbyteorder(">")
+    return shape, fmt_A, fmt_B, dtype
+
+
+def _window_coords(header, window):
+    """
+    Resolve min#/max# coordinate bounds of a window into f#/n# by o# and d#,
+    as sfwindow does. Bounds outside the axis are clamped to it.
+    """
+    if not any(key[:3] in ("min", "max") for key in window):
+        return window
+    from .array import defaults
+
+    window = dict(window)
+    for ax in range(9):
+        low = window.pop(f"min{ax+1}", None)
+        high = window.pop(f"max{ax+1}", None)
+        if low is None and high is None:
+            continue
+        o = float(header.get(f"o{ax+1}", defaults.get(f"o{ax+1}", 0.)))
+        d = float(header.get(f"d{ax+1}", defaults.get(f"d{ax+1}", 4.e-3)))
+        if low is not None:
+            window[f"f{ax+1}"] = max(0, int((0.5 + (float(low) - o) / d) // 1))
+        if high is not None:
+            f = int(window.get(f"f{ax+1}") or 0)
+            j = int(window.get(f"j{ax+1}") or 1)
+            window[f"n{ax+1}"] = max(1, int((1.5 + (float(high) - (o + f * d)) / (j * d)) // 1))
+    return window
+
+
+def _window_params(shape, window):
+    """
+    Resolve n#/f#/j# window parameters into (first, jump, count) per axis,
+    following the rules of Rsfdata.window.
+    """
+    params = []
+    for ax, size in enumerate(shape):
+        n = window.get(f"n{ax+1}")
+        j = window.get(f"j{ax+1}")
+        f = window.get(f"f{ax+1}")
+        n = size if n is None else int(n)
+        j = 1 if j is None else int(j)
+        f = 0 if f is None else int(f)
+        if n < 0: n = size
+        if f < 0: f += size
+        if f >= size: f = size - 1
+        # samples f, f+j, ... f+(n-1)*j within [0, size)
+        count = 0
+        if j > 0:
+            first = f if f >= 0 else f + (j - 1 - f) // j * j
+            count = max(0, -(-(min(f + n * j, size) - first) // j))
+        params.append((first, j, count) if count else (0, j, 0))
+    return params
+
+
+def _window_slices(params):
+    return tuple(slice(f, f + (n - 1) * j + 1, j) if n else slice(0, 0)
+                 for f, j, n in params)
+
+
+def _window_header(header, params):
+    """
+    Update n#, o#, d# of a header for a window, like Rsfdata.window.
+    """
+    for ax, (f, j, n) in enumerate(params):
+        o, d = header.get(f"o{ax+1}"), header.get(f"d{ax+1}")
+        if o is None or d is None:
+            from .array import defaults
+            o = defaults.get(f"o{ax+1}", 0.) if o is None else o
+            d = defaults.get(f"d{ax+1}", 4.e-3) if d is None else d
+        o, d = float(o), float(d)
+        header[f"n{ax+1}"] = n
+        header[f"o{ax+1}"] = f * d + o
+        header[f"d{ax+1}"] = d * j
+
+
+def _read_window(data_file, dtype, shape, params):
+    """
+    Read a hyperslab of Fortran-ordered binary data.
+    Runs along the fastest axes are coalesced while the gaps between them
+    are at most COALESCE_GAP bytes, and reads are capped at about
+    DATA_BLOCKSIZE bytes, so the I/O stays proportional to the hyperslab.
+    """
+    ndim = len(shape)
+    itemsize = dtype.itemsize
+    counts = [n for _, _, n in params]
+    out = np.empty(counts, dtype=dtype, order='F')
+    if out.size == 0:
+        return out
+    strides = [itemsize * int(np.prod(shape[:ax], dtype=np.int64)) for ax in range(ndim)]
+    steps = [j * stride for (_, j, _), stride in zip(params, strides)]
+    base = sum(f * stride for (f, _, _), stride in zip(params, strides))
+
+    # merge axes from the fastest one; unit is the byte span of one read
+    unit = itemsize
+    level, group = ndim, 1
+    for ax in range(ndim):
+        n = counts[ax]
+        if n > 1 and steps[ax] - unit > COALESCE_GAP:
+            level = ax
+            break
+        span = (n - 1) * steps[ax] + unit
+        if n > 1 and span > DATA_BLOCKSIZE:
+            level, group = ax, max(1, (DATA_BLOCKSIZE - unit) // steps[ax] + 1)
+            break
+        unit = span
+
+    reader = _RangeReader(data_file)
+    if level == ndim:
+        buf = reader.read_at(base, unit)
+        out[...] = np.ndarray(counts, dtype=dtype, buffer=buf, strides=steps)
+        return out
+
+    outer_axes = range(level + 1, ndim)
+    # slowest axis outermost, so offsets are read in ascending order
+    for outer in itertools.product(*(range(counts[ax]) for ax in reversed(outer_axes))):
+        outer = outer[::-1]
+        offset = base + sum(i * steps[ax] for i, ax in zip(outer, outer_axes))
+        for first in range(0, counts[level], group):
+            m = min(group, counts[level] - first)
+            buf = reader.read_at(offset + first * steps[level], (m - 1) * steps[level] + unit)
+            out[(slice(None),) * level + (slice(first, first + m),) + outer] = np.ndarray(
+                counts[:level] + [m], dtype=dtype, buffer=buf, strides=steps[:level + 1])
+    return out
+
+
+def _chunk_shape(header, shape, fmt_A="native"):
+    """
+    Brick shape from the chunk# keys of a header, or None for the plain
+    Fortran-order layout. Axes without chunk# (or with chunk#=0) are not
+    split; a single brick is the plain layout.
+    """
+    chunks = [int(header.get(f"chunk{ax + 1}", 0)) for ax in range(len(shape))]
+    if any(c < 0 for c in chunks):
+        raise ValueError(f"Invalid chunk sizes: {chunks}")
+    chunks = [c if 0 < c < n else n for c, n in zip(chunks, shape)]
+    if chunks == list(shape):
+        return None
+    if fmt_A == "ascii":
+        raise ValueError("Chunked layout requires native or xdr data")
+    return chunks
+
+
+def _chunk_plan(params, chunks):
+    """
+    For each axis, the bricks touched by a window as (brick, out slice,
+    slice within the brick).
+    """
+    plan = []
+    for (first, jump, count), c in zip(params, chunks):
+        index = first + jump * np.arange(count)
+        bricks, starts = np.unique(index // c, return_index=True)
+        ends = np.append(starts[1:], count)
+        plan.append([(int(b), slice(int(s0), int(s1)),
+                      slice(int(index[s0] - b * c), int(index[s1 - 1] - b * c) + 1, jump))
+                     for b, s0, s1 in zip(bricks, starts, ends)])
+    return plan
+
+
+def _read_bricks(data_file, dtype, shape, chunks, params=None):
+    """
+    Read a hyperslab of brick-ordered binary data: bricks of shape chunks
+    (edge bricks padded) in Fortran order of the brick grid, each brick in
+    Fortran order. Only the bricks touched by the window are read, and
+    consecutive bricks along the first axis are read at once.
+    data_file may also be a _RangeReader shared by successive calls.
+    """
+    if params is None:
+        params = [(0, 1, n) for n in shape]
+    out = np.empty([n for _, _, n in params], dtype=dtype, order='F')
+    if out.size == 0:
+        return out
+    grid = [-(-n // c) for n, c in zip(shape, chunks)]
+    strides = [int(np.prod(grid[:ax], dtype=np.int64)) for ax in range(len(grid))]
+    nbrick = int(np.prod(chunks, dtype=np.int64))
+    brick_bytes = nbrick * dtype.itemsize
+    run = max(1, DATA_BLOCKSIZE // brick_bytes)
+    plan = _chunk_plan(params, chunks)
+
+    reader = data_file if isinstance(data_file, _RangeReader) else _RangeReader(data_file)
+    # slowest axis outermost, so offsets are read in ascending order
+    for outer in itertools.product(*reversed(plan[1:])):
+        outer = outer[::-1]
+        base = sum(b * stride for (b, _, _), stride in zip(outer, strides[1:]))
+        out_outer = tuple(o for _, o, _ in outer)
+        in_outer = tuple(i for _, _, i in outer)
+        first_axis = plan[0]
+        k = 0
+        while k < len(first_axis):
+            # consecutive bricks along the first axis are contiguous
+            m = 1
+            while (k + m < len(first_axis) and m < run
+                   and first_axis[k + m][0] == first_axis[k][0] + m):
+                m += 1
+            buf = reader.read_at((base + first_axis[k][0]) * brick_bytes, m * brick_bytes)
+            bricks = buf.view(dtype)
+            for i in range(m):
+                b, out_first, in_first = first_axis[k + i]
+                brick = bricks[i * nbrick:(i + 1) * nbrick].reshape(chunks, order='F')
+                out[(out_first,) + out_outer] = brick[(in_first,) + in_outer]
+            k += m
+    return out
+
+
+def _write_bricks(out_fp, arr, chunks, storage):
+    """
+    Write arr as bricks of shape chunks, in the layout read by _read_bricks.
+    """
+    arr = np.asarray(arr)
+    shape = arr.shape
+    grid = [-(-n // c) for n, c in zip(shape, chunks)]
+    brick = np.empty(chunks, dtype=storage, order='F')
+    view = memoryview(brick.reshape(-1, order='F').view(np.uint8))
+    for index in itertools.product(*(range(g) for g in reversed(grid))):
+        index = index[::-1]
+        src = tuple(slice(b * c, min((b + 1) * c, n)) for b, c, n in zip(index, chunks, shape))
+        dst = tuple(slice(0, s.stop - s.start) for s in src)
+        if any(s.stop - s.start < c for s, c in zip(src, chunks)):
+            brick[...] = 0
+        brick[dst] = arr[src]
+        out_fp.write(view)
+
+
+def _normalize_chunks(chunks, shape):
+    """
+    Validate a brick shape for write_rsf/rechunk: missing axes are not
+    split, and bricks are not larger than the data. A single brick is the
+    plain layout (None).
+    """
+    if chunks is None:
+        return None
+    chunks = [int(c) for c in chunks]
+    if len(chunks) > len(shape) or any(c <= 0 for c in chunks):
+        raise ValueError(f"Invalid chunk sizes {chunks} for shape {list(shape)}")
+    chunks += list(shape[len(chunks):])
+    chunks = [min(c, n) for c, n in zip(chunks, shape)]
+    return None if chunks == list(shape) else chunks
+
+
+def _strip_layout(outheader, history=""):
+    """
+    Drop the keys describing how the binary of a read file was stored
+    (chunking, compression), so they are not carried over to new output.
+    Keys set in history are reset instead, since header keys are inherited.
+    """
+    for key in ("data_compression", "compression_block"):
+        outheader.pop(key, None)
+    if "data_compression=" in history:
+        outheader["data_compression"] = "none"
+    for ax in range(9):
+        key = f"chunk{ax + 1}"
+        outheader.pop(key, None)
+        if f"{key}=" in history:
+            outheader[key] = 0
+
+
+def rechunk(file, out_file, chunks=None, out=None, blocksize=DATA_BLOCKSIZE):
+    """
+    Convert an RSF file between the plain Fortran-order layout and the
+    chunked (bricked) layout, streaming layers along the slowest axis.
+
+    Parameters
+    ----------
+    file : str
+        The input RSF file (plain or chunked).
+    out_file : str
+        The output RSF header file.
+    chunks : sequence of int, optional
+        Brick shape of the output (default is None, the plain layout).
+    out : str, optional
+        Data bytes output file, as in write_rsf.
+    blocksize : int
+        Approximate bytes per layer read at a time, for plain output.
+    """
+    with open(file, 'rb') as fp:
+        header, history, _ = _read_header(fp)
+    shape, fmt_A, _, dtype = _data_layout(header)
+    form = "xdr" if fmt_A == "xdr" else "native"
+    ndim = len(shape)
+    chunks = _normalize_chunks(chunks, shape)
+    if chunks is not None:
+        step = chunks[-1]
+    else:
+        plane = int(np.prod(shape[:-1], dtype=np.int64)) * dtype.itemsize
+        step = max(1, blocksize // max(plane, 1))
+
+    outheader = {k: v for k, v in header.items() if not (k[:1] == 'n' and k[1:].isdigit())}
+    _strip_layout(outheader, history)
+    outheader.pop("in", None)
+    outheader.pop("esize", None)
+    file_fp, out_fp, close_file, close_out = _open_output(out_file, out, outheader)
+    try:
+        dtype_name, storage = _rsf_type(dtype, keep_precision=True)
+        for idim, size in enumerate(shape):
+            outheader[f"n{idim + 1}"] = size
+        outheader["data_format"] = f"{form}_{dtype_name}"
+        outheader["esize"] = storage.itemsize
+        if chunks is not None:
+            outheader.update({f"chunk{ax + 1}": c for ax, c in enumerate(chunks)})
+        file_fp.write(_header_bytes(outheader, history, splitter=out_fp is file_fp))
+        if form == "xdr":
+            storage = storage.newbyteorder(">")
+        for first in range(0, shape[-1], step):
+            count = min(step, shape[-1] - first)
+            layer = read_rsf(file, **{f"f{ndim}": first, f"n{ndim}": count})
+            if layer is None:
+                raise ValueError(f"Cannot read RSF file: {file}")
+            if chunks is not None:
+                _write_bricks(out_fp, layer[0], chunks, storage)
+            else:
+                _write_fortran(out_fp, layer[0], storage)
+    finally:
+        if close_out:
+            out_fp.close()
+        if close_file:
             file_fp.close()
 
-        return [arr, header, header_text]
 
-    except Exception as e:
-        warnings.warn(f"Error reading RSF: {e}")
+class _RangeReader:
+    """
+    Read byte ranges at offsets relative to the current position of fp:
+    os.pread on regular files, seek and read on other seekable streams, and
+    forward-only reads (ascending offsets) on pipes.
+    """
+    def __init__(self, fp):
+        self.fp = fp
+        self.fd = None
+        self.pos = 0
+        self.start = fp.tell() if _seekable(fp) else None
+        if self.start is not None and hasattr(os, 'pread'):
+            try:
+                self.fd = fp.fileno()
+            except (AttributeError, OSError, ValueError):
+                self.fd = None
+
+    def read_at(self, offset, size):
+        buf = np.empty(size, dtype=np.uint8)
+        if self.fd is not None:
+            nread = 0
+            while nread < size:
+                data = os.pread(self.fd, size - nread, self.start + offset + nread)
+                if not data:
+                    break
+                buf[nread:nread + len(data)] = np.frombuffer(data, dtype=np.uint8)
+                nread += len(data)
+        elif self.start is not None:
+            self.fp.seek(self.start + offset)
+            nread = _readinto_full(self.fp, buf)
+        else:
+            if offset < self.pos:
+                raise ValueError("Cannot read backwards in a non-seekable stream")
+            skip = offset - self.pos
+            while skip > 0:
+                data = self.fp.read(min(skip, DATA_BLOCKSIZE))
+                if not data:
+                    break
+                skip -= len(data)
+            nread = _readinto_full(self.fp, buf) if skip == 0 else 0
+            self.pos = offset + nread
+        if nread < size:
+            raise ValueError("Unexpected end of RSF data")
+        return buf
+
+
+def _compression(header, path=None):
+    """
+    Compression method of the binary described by header: the
+    data_compression key, or the suffix of the in= file name.
+    Returns None for uncompressed data.
+    """
+    method = header.get("data_compression", None)
+    if method == "none":
         return None
+    if method is None and path is not None:
+        method = _COMPRESSION_SUFFIX.get(os.path.splitext(str(path))[1])
+    if method is not None and method not in _COMPRESSION_SUFFIX.values():
+        raise ValueError(f"Unsupported data_compression: {method}")
+    if method == "lzma" and lzma is None:
+        raise ValueError("lzma compression is not available in this Python build")
+    return method
+
+
+def _decompressed(data_file, header, path=None):
+    """
+    Wrap data_file in a _BlockReader if the binary is compressed.
+    path is the binary file name (None for in="stdin"); its block index,
+    if present, makes the reader seekable.
+    """
+    method = _compression(header, path)
+    if method is None:
+        return data_file
+    offsets = _read_block_index(path) if path is not None else None
+    return _BlockReader(data_file, method, int(header.get("compression_block", COMPRESS_BLOCKSIZE)),
+                        offsets, owner=path is not None)
+
+
+def _block_index_path(path):
+    return f"{path}.idx"
+
+
+def _read_block_index(path):
+    """
+    Load the compressed block offsets of path, or None if the index is
+    missing or does not match the file.
+    """
+    try:
+        if str(path).startswith(_URL_SCHEMES):
+            from .remote import open_url
+            with open_url(_block_index_path(path)) as fp:
+                offsets = np.frombuffer(fp.read(), dtype="<u8")
+            with open_url(path) as fp:
+                size = fp.size
+        else:
+            offsets = np.fromfile(_block_index_path(path), dtype="<u8")
+            size = os.path.getsize(path)
+    except (OSError, ValueError):
+        return None
+    if offsets.size < 1 or offsets[0] != 0 or int(offsets[-1]) != size:
+        return None
+    return offsets
+
+
+def _write_block_index(path, offsets):
+    np.asarray(offsets, dtype="<u8").tofile(_block_index_path(path))
+
+
+def _compress(method, data):
+    if method == "lzma":
+        return lzma.compress(data, format=lzma.FORMAT_XZ)
+    comp = zlib.compressobj(6, zlib.DEFLATED, 31 if method == "gzip" else 15)
+    return comp.compress(data) + comp.flush()
+
+
+def _decompressor(method):
+    if method == "lzma":
+        return lzma.LZMADecompressor(format=lzma.FORMAT_XZ)
+    return zlib.decompressobj(31 if method == "gzip" else 15)
+
+
+class _BlockWriter(io.RawIOBase):
+    """
+    Compress written bytes in independent blocks of blocksize uncompressed
+    bytes (one gzip member, zlib stream or xz stream each), recording the
+    compressed offset of every block. Concatenated blocks are still a valid
+    .gz/.xz file.
+    """
+    def __init__(self, fp, method, blocksize=COMPRESS_BLOCKSIZE):
+        self.fp = fp
+        self.method = method
+        self.blocksize = blocksize
+        self.offsets = [0]
+        self.buf = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        view = memoryview(b).cast('B')
+        nbytes = len(view)
+        pos = 0
+        if self.buf:
+            pos = min(nbytes, self.blocksize - len(self.buf))
+            self.buf += view[:pos]
+            if len(self.buf) == self.blocksize:
+                self._emit(self.buf)
+                self.buf = bytearray()
+        while nbytes - pos >= self.blocksize:
+            self._emit(view[pos:pos + self.blocksize])
+            pos += self.blocksize
+        self.buf += view[pos:]
+        return nbytes
+
+    def _emit(self, data):
+        block = _compress(self.method, data)
+        self.fp.write(block)
+        self.offsets.append(self.offsets[-1] + len(block))
+
+    def close(self):
+        if not self.closed and self.buf:
+            self._emit(self.buf)
+            self.buf = bytearray()
+        super().close()
+
+
+class _BlockReader(io.RawIOBase):
+    """
+    Read data written by _BlockWriter. With the block offsets the reader is
+    seekable and decompresses only the blocks that are read; without them
+    blocks are decoded sequentially (e.g. compressed in="stdin" data).
+    """
+    def __init__(self, fp, method, blocksize, offsets=None, owner=True):
+        self.fp = fp
+        self.method = method
+        self.blocksize = blocksize
+        self.offsets = offsets
+        self.owner = owner
+        self.pos = 0
+        self.block = b""
+        self.start = 0
+        self.base = fp.tell() if offsets is not None else 0
+        self.members = None if offsets is not None else self._members()
+        self.next_block = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return self.offsets is not None
+
+    def tell(self):
+        return self.pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if self.offsets is None:
+            raise io.UnsupportedOperation("Compressed stream without block index is not seekable")
+        if whence == io.SEEK_CUR:
+            offset += self.pos
+        elif whence == io.SEEK_END:
+            nblock = len(self.offsets) - 1
+            self._load(nblock - 1)
+            offset += self.start + len(self.block) if nblock else 0
+        self.pos = max(0, offset)
+        return self.pos
+
+    def readinto(self, b):
+        view = memoryview(b).cast('B')
+        if not self.start <= self.pos < self.start + len(self.block):
+            if self.block and self.pos == self.start + len(self.block) < self.start + self.blocksize:
+                return 0  # past the short last block
+            if not self._load(self.pos // self.blocksize):
+                return 0
+        offset = self.pos - self.start
+        nbytes = min(len(view), len(self.block) - offset)
+        view[:nbytes] = self.block[offset:offset + nbytes]
+        self.pos += nbytes
+        return nbytes
+
+    def readall(self):
+        parts = []
+        while True:
+            data = self.read(self.blocksize)
+            if not data:
+                return b"".join(parts)
+            parts.append(data)
+
+    def _load(self, iblock):
+        """
+        Decompress block iblock into self.block. Returns False past the end.
+        """
+        if self.offsets is not None:
+            if not 0 <= iblock < len(self.offsets) - 1:
+                return False
+            self.fp.seek(self.base + int(self.offsets[iblock]))
+            raw = self.fp.read(int(self.offsets[iblock + 1] - self.offsets[iblock]))
+            dec = _decompressor(self.method)
+            block = dec.decompress(raw)
+            if not dec.eof:
+                raise ValueError(f"Truncated compressed RSF block {iblock}")
+        else:
+            if iblock < self.next_block:
+                raise ValueError("Cannot read backwards in compressed stream without block index")
+            while self.next_block <= iblock:
+                block = next(self.members, None)
+                if block is None:
+                    return False
+                self.next_block += 1
+        self.block = block
+        self.start = iblock * self.blocksize
+        return True
+
+    def _members(self, chunk=1 << 16):
+        rest = b""
+        while True:
+            if not rest:
+                rest = self.fp.read(chunk)
+                if not rest:
+                    return
+            dec = _decompressor(self.method)
+            parts = []
+            while True:
+                parts.append(dec.decompress(rest))
+                if dec.eof:
+                    rest = dec.unused_data
+                    break
+                rest = self.fp.read(chunk)
+                if not rest:
+                    raise ValueError("Truncated compressed RSF data")
+            yield b"".join(parts)
+
+    def close(self):
+        if not self.closed and self.owner:
+            self.fp.close()
+        super().close()
+
+
+def _read_ascii(data_file, dtype, count, blocksize=DATA_BLOCKSIZE):
+    """
+    Parse whitespace-separated ascii samples in blocks of about blocksize
+    bytes into a preallocated array of count samples.
+    """
+    arr = np.empty(count, dtype=dtype)
+    total = 0
+    rest = b""
+    while True:
+        block = data_file.read(blocksize)
+        text = rest + block
+        if block:
+            # keep a possibly split last token for the next block
+            cut = max(text.rfind(c) for c in (b" ", b"\n", b"\t", b"\r"))
+            if cut < 0:
+                rest = text
+                continue
+            text, rest = text[:cut], text[cut:]
+        values = _parse_ascii(text, arr.dtype)
+        if total + values.size > count:
+            raise ValueError(f"Too many ascii samples, expected {count}")
+        arr[total:total + values.size] = values
+        total += values.size
+        if not block:
+            break
+    if total != count:
+        raise ValueError(f"Expected {count} ascii samples, got {total}")
+    return arr
+
+
+def _parse_ascii(text, dtype):
+    """
+    Parse a block of ascii samples; complex samples are written like 1+2i.
+    """
+    ptype = np.complex128 if dtype.kind == 'c' else np.float64
+    if not text or text.isspace():
+        return np.empty(0, dtype=ptype)
+    if dtype.kind == 'c':
+        # a plain replace would also hit inf/nan
+        text = _ASCII_IMAG.sub(b"j", text) if b"n" in text else text.replace(b"i", b"j")
+    line = text.replace(b"\n", b" ").replace(b"\r", b" ").decode("ascii", errors="ignore")
+    return np.loadtxt([line], dtype=ptype, ndmin=1)
 
 
+def _write_ascii(out_fp, arr, storage, fmt="%f", blocksize=ASCII_BLOCKSIZE):
+    """
+    Write arr as ascii text, one trace (n1 samples) per line, formatting
+    blocks of about blocksize samples with a single string operation.
+    """
+    n1 = arr.shape[0] if arr.ndim else 1
+    traces = np.asarray(arr).reshape((n1, -1), order='F')
+    if storage.kind == 'c':
+        fmt = fmt + (fmt if '+' in fmt else fmt.replace('%', '%+', 1)) + 'i'
+
+    def values(block):
+        block = np.asarray(block, dtype=storage)
+        if storage.kind == 'c':
+            block = np.stack((block.real, block.imag))
+        return tuple(block.ravel(order='F').tolist())
+
+    if n1 <= blocksize:
+        line = " ".join([fmt] * n1) + "\n"
+        step = max(1, blocksize // n1)
+        for i in range(0, traces.shape[1], step):
+            block = traces[:, i:i + step]
+            out_fp.write((line * block.shape[1] % values(block)).encode('utf-8'))
+        return
+    for i in range(traces.shape[1]):
+        for j in range(0, n1, blocksize):
+            block = traces[j:j + blocksize, i]
+            end = "\n" if j + blocksize >= n1 else " "
+            out_fp.write((" ".join([fmt] * block.shape[0]) % values(block) + end).encode('utf-8'))
+
+
+def _readinto_full(fp, arr):
+    """
+    Fill arr from fp, looping over short reads (pipes). Returns bytes read.
+    """
+    view = memoryview(arr.reshape(-1, order='A').view(np.uint8))
+    total = 0
+    while total < len(view):
+        if hasattr(fp, 'readinto'):
+            nread = fp.readinto(view[total:])
+        else:
+            data = fp.read(len(view) - total)
+            nread = len(data) if data else 0
+            view[total:total + nread] = data[:nread] if nread else b''
+        if not nread:
+            break
+        total += nread
+    return total
+
+
+def _native(arr):
+    """
+    arr in native byte order, swapped in place if needed (arr must own
+    its memory).
+    """
+    if arr.dtype.isnative:
+        return arr
+    return arr.byteswap(inplace=True).view(arr.dtype.newbyteorder("="))
+
 
-def write_rsf(arr: np.ndarray, file, header={}, history='', out=None, form="native", fmt="%f"):
+def _memmap_data(data_file, dtype, shape, order='F', mode='r'):
+    """
+    Memory-map the remaining bytes of data_file, read-only or copy-on-write
+    (mode 'c'). Return None if data_file is not a seekable regular file.
+    """
+    try:
+        if not data_file.seekable():
+            return None
+        data_file.fileno()
+        offset = data_file.tell()
+    except (AttributeError, OSError, ValueError):
+        return None
+    try:
+        return np.memmap(data_file, dtype=dtype, mode=mode, offset=offset,
+                         shape=tuple(shape), order=order)
+    except (OSError, ValueError) as e:
+        warnings.warn(f"Cannot memory-map RSF data, reading instead: {e}")
+        return None
+
+
+def write_rsf(arr: np.ndarray, file, header={}, history='', out=None, form="native", fmt="%f",
+              compression=None, chunks=None, keep_precision=False):
     """
     Write RSF file with given header and data.
 
@@ -161,29 +1411,478 @@ def write_rsf(arr: np.ndarray, file, header={}, history='', out=None, form="nati
         native: little-endian
         xdr: network (big-endian) byte order
         ascii: plain text
+    compression : str, optional
+        Compress the data in independent blocks with "gzip", "zlib" or "lzma"
+        (default is None, or inferred from a .gz/.zz/.xz out file name).
+        A block index is written next to the binary as <in>.idx, so that
+        windowed and slab reads only decompress the blocks they need.
+    chunks : sequence of int, optional
+        Store the data as bricks of this shape (chunk# header keys) instead
+        of the plain Fortran order, so that slices along any axis read about
+        the same amount of data. Axes beyond len(chunks) are not split.
+    keep_precision : bool, optional
+        Store float64, int64 and complex128 data as double, long and
+        complexdouble (default is False: as 4-byte float, int and complex,
+        which all RSF programs read, unless the data_format of header
+        already stores them that way). int16 data is always stored as short.
     """
-    close_after = isinstance(file, str)
-
     outheader = {}
     outheader.update(header if isinstance(header, dict) else {})
+    _strip_layout(outheader, history)
     if not isinstance(arr, np.ndarray):
         raise TypeError(f"Expected ndarray, got {type(arr)}")
+    if form not in ("native", "xdr", "ascii"):
+        raise ValueError(f"Unsupported form: {form}")
+    chunks = _normalize_chunks(chunks, arr.shape)
+    if chunks is not None and form == "ascii":
+        raise ValueError("Chunked layout requires native or xdr data")
+
+    compression = _output_compression(compression, out)
+
+    file_fp, out_fp, close_file, close_out = _open_output(file, out, outheader, compression)
+
+    dtype, storage = _rsf_type(arr.dtype, keep_precision, outheader)
+    outheader.update({"data_format": f"{form}_{dtype}", "esize": storage.itemsize})
+    if chunks is not None:
+        outheader.update({f"chunk{ax + 1}": c for ax, c in enumerate(chunks)})
+    file_fp.write(_header_bytes(outheader, history, splitter=out_fp is file_fp))
+
+    data_fp = _BlockWriter(out_fp, compression) if compression else out_fp
+    if chunks is not None:
+        _write_bricks(data_fp, arr, chunks, storage.newbyteorder(">") if form == "xdr" else storage)
+    else:
+        _write_data(data_fp, arr, storage, form, fmt)
+    _finish_compressed(data_fp, outheader)
+
+    if close_out:
+        out_fp.close()
+    if close_file:
+        file_fp.close()
+
+
+class RsfWriter:
+    """
+    Incremental RSF writer appending slabs along the last axis.
+    The header is written once, on the first append; each slab is streamed
+    to the data output without being accumulated.
+
+    Usage:
+      > with RsfWriter("out.rsf", header={"o3": 0., "d3": 0.05}) as writer:\n
+      >     for shot in shots:\n
+      >         writer.append(shot)\n
+
+    Parameters
+    ----------
+    file : str or file-like object
+        The output file (header) or file-like object.
+    header : dict, optional
+        The header information to write. Headers of Rsfdata slabs are used
+        as defaults.
+    history : str, optional
+        History information to write.
+    out : str or file-like object, optional
+        Data bytes output file, as in write_rsf.
+    form : str, optional
+        The data format, "native", "xdr" or "ascii" (default is "native").
+    fmt : str, optional
+        The data format for ascii (default is "%f").
+    ndim : int, optional
+        Number of output axes. Defaults to the ndim of the first slab; set it
+        to append single hyperplanes, e.g. ndim=3 for 2-D depth slices.
+    n : int, optional
+        Number of samples along the last axis, declared up front. Required when
+        the header output is not seekable (pipes); otherwise n# is patched on close.
+    compression : str, optional
+        Block compression of the data, as in write_rsf.
+    keep_precision : bool, optional
+        Keep double, long and complexdouble data, as in write_rsf.
+    """
+
+    NWIDTH = 20
+
+    def __init__(self, file, header=None, history='', out=None, form="native", fmt="%f",
+                 ndim=None, n=None, compression=None, keep_precision=False):
+        if form not in ("native", "xdr", "ascii"):
+            raise ValueError(f"Unsupported form: {form}")
+        self.header = dict(header) if isinstance(header, dict) else {}
+        self.history = history
+        self.form = form
+        self.fmt = fmt
+        self.ndim = ndim
+        self.n = n
+        self.keep_precision = keep_precision
+        self.count = 0
+        self._plane = None
+        self._storage = None
+        self._patch = None
+        self._outheader = {}
+        compression = _output_compression(compression, out)
+        self.file_fp, self.out_fp, self._close_file, self._close_out = \
+            _open_output(file, out, self._outheader, compression)
+        self._data_fp = _BlockWriter(self.out_fp, compression) if compression else self.out_fp
+        if n is None and not _seekable(self.file_fp):
+            raise ValueError("n must be declared up front when the header output is not seekable")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def append(self, slab):
+        """
+        Append a slab along the last axis.
+
+        Parameters
+        ----------
+        slab : ndarray
+            Either one hyperplane, or hyperplanes stacked along the last axis.
+        """
+        if self.file_fp is None:
+            raise ValueError("RsfWriter is closed")
+        slab = np.asanyarray(slab)
+        if self._plane is None:
+            self._start(slab)
+        if slab.shape == self._plane:
+            slab = slab.reshape(self._plane + (1,), order='F')
+        elif slab.shape[:-1] != self._plane or slab.ndim != len(self._plane) + 1:
+            raise ValueError(f"Slab shape {slab.shape} does not match hyperplane shape {self._plane}")
+        _write_data(self._data_fp, slab, self._storage, self.form, self.fmt)
+        self.count += slab.shape[-1]
+
+    def _start(self, slab):
+        ndim = self.ndim if self.ndim is not None else max(slab.ndim, 1)
+        if slab.ndim not in (ndim - 1, ndim):
+            raise ValueError(f"Expected {ndim - 1}-D or {ndim}-D slabs, got {slab.ndim}-D")
+        self._plane = tuple(slab.shape[:ndim - 1])
+        self.ndim = ndim
+        outheader = {k: v for k, v in getattr(slab, 'header', {}).items()
+                     if not (k[:1] == 'n' and k[1:].isdigit())}
+        outheader.update(self.header)
+        dtype, self._storage = _rsf_type(slab.dtype, self.keep_precision, outheader)
+        _strip_layout(outheader, self.history)
+        outheader.update(self._outheader)
+        for idim in range(9):
+            outheader.pop(f"n{idim + 1}", None)
+        for idim, size in enumerate(self._plane):
+            outheader[f"n{idim + 1}"] = size
+        key = f"n{ndim}"
+        outheader[key] = self.n if self.n is not None else 0
+        outheader["data_format"] = f"{self.form}_{dtype}"
+        outheader["esize"] = self._storage.itemsize
+
+        seekable = _seekable(self.file_fp)
+        header = _header_bytes(outheader, self.history, splitter=self.out_fp is self.file_fp,
+                               widths={key: self.NWIDTH} if seekable else None)
+        if seekable:
+            mark = f"\n{key}=".encode()
+            self._patch = self.file_fp.tell() + header.rfind(mark) + len(mark)
+        self.file_fp.write(header)
+
+    def close(self):
+        """
+        Finish writing, patching n# of the last axis if the output is seekable.
+        """
+        if self.file_fp is None:
+            return
+        try:
+            _finish_compressed(self._data_fp, self._outheader)
+            if self._plane is None:
+                warnings.warn("RsfWriter closed before any slab was appended")
+            elif self.n != self.count:
+                if self._patch is not None:
+                    self.out_fp.flush()
+                    pos = self.file_fp.tell()
+                    self.file_fp.seek(self._patch)
+                    self.file_fp.write(str(self.count).ljust(self.NWIDTH).encode('utf-8'))
+                    self.file_fp.seek(pos)
+                elif self.n is not None:
+                    warnings.warn(f"Declared n{self.ndim}={self.n}, but {self.count} written")
+        finally:
+            if self._close_out:
+                self.out_fp.close()
+            if self._close_file:
+                self.file_fp.close()
+            self.file_fp = self.out_fp = self._data_fp = None
 
+
+class RsfOutput:
+    """
+    Preallocated RSF output whose slabs along the last axis are written
+    in any order, by any number of processes on the node, with pwrite.
+    The header is written and the binary preallocated up front; a marker
+    file next to the binary (<in>.part, one byte per hyperplane) records
+    the slabs written, and is removed by finish() once all are there.
+
+    Usage:
+      > out = RsfOutput("image.rsf", n=[nz, nx, nshot], header={"d1": dz, "d2": dx})\n
+      > # in each worker process (RsfOutput objects can also be pickled)\n
+      > out = RsfOutput("image.rsf")\n
+      > out.write_slab(ishot, image)\n
+      > # once all workers are done\n
+      > out.finish()\n
+
+    Parameters
+    ----------
+    file : str
+        The RSF header file.
+    n : sequence of int, optional
+        Shape of the output. If given, the output is created (replacing any
+        existing one); otherwise an existing output is opened for writing.
+    header : dict, optional
+        Header keys of a new output (o#, d#, label# ...).
+    history : str, optional
+        History of a new output.
+    out : str, optional
+        Binary file of a new output (default is <DATAPATH>/<file>@).
+    form : str, optional
+        "native" or "xdr" (default is "native").
+    dtype : numpy dtype, optional
+        Data type of a new output (default is float32).
+    keep_precision : bool, optional
+        Keep a double, long or complexdouble dtype, as in write_rsf.
+    """
+
+    def __init__(self, file, n=None, header=None, history='', out=None, form="native",
+                 dtype=np.float32, keep_precision=False):
+        self.file = file
+        if n is not None:
+            self._create(file, n, header, history, out, form, dtype, keep_precision)
+        with open(file, 'rb') as fp:
+            header, _, data_fp = _read_header(fp)
+            offset = data_fp.tell()
+        self.shape, fmt_A, _, self.dtype = _data_layout(header)
+        if fmt_A == "ascii" or _compression(header) is not None or \
+                _chunk_shape(header, self.shape, fmt_A) is not None:
+            raise ValueError(f"RsfOutput needs plain native or xdr data: {file}")
+        if header["in"] == "stdin":
+            self.path = os.path.abspath(file)
+            self.offset = offset
+        else:
+            self.path = header["in"]
+            self.offset = 0
+        self.header = header
+        self.plane = int(np.prod(self.shape[:-1], dtype=np.int64)) * self.dtype.itemsize
+        self._fd = self._part_fd = None
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["_fd"] = state["_part_fd"] = None
+        return state
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    @staticmethod
+    def _create(file, n, header, history, out, form, dtype, keep_precision):
+        if form not in ("native", "xdr"):
+            raise ValueError(f"Unsupported form for RsfOutput: {form}")
+        shape = [int(size) for size in n]
+        if not 1 <= len(shape) <= 9 or any(size < 0 for size in shape):
+            raise ValueError(f"Invalid shape: {shape}")
+        outheader = {k: v for k, v in (header or {}).items()
+                     if not (k[:1] == 'n' and k[1:].isdigit())}
+        _strip_layout(outheader, history)
+        file_fp, out_fp, close_file, close_out = _open_output(file, out, outheader)
+        try:
+            if out_fp is file_fp or not isinstance(outheader["in"], str):
+                raise ValueError("RsfOutput needs a separate binary file")
+            dtype_name, storage = _rsf_type(dtype, keep_precision, outheader)
+            for idim, size in enumerate(shape):
+                outheader[f"n{idim + 1}"] = size
+            outheader["data_format"] = f"{form}_{dtype_name}"
+            outheader["esize"] = storage.itemsize
+            file_fp.write(_header_bytes(outheader, history, splitter=False))
+            nbytes = int(np.prod(shape, dtype=np.int64)) * storage.itemsize
+            _preallocate(out_fp.fileno(), nbytes)
+            with open(_part_path(outheader["in"]), 'wb') as fp:
+                _preallocate(fp.fileno(), shape[-1])
+        finally:
+            if close_out:
+                out_fp.close()
+            if close_file:
+                file_fp.close()
+
+    def write_slab(self, index, data, sync=False):
+        """
+        Write hyperplanes along the last axis and mark them as written.
+
+        Parameters
+        ----------
+        index : int or slice
+            Hyperplane, or contiguous range of hyperplanes, to write.
+        data : ndarray
+            One hyperplane, or hyperplanes stacked along the last axis.
+        sync : bool, optional
+            Flush the data to disk before marking it written (default is
+            False), so that the marker survives a crash only with the data.
+        """
+        nlast = self.shape[-1]
+        if isinstance(index, slice):
+            start, stop, step = index.indices(nlast)
+            if step != 1:
+                raise ValueError("Slabs must be contiguous along the last axis")
+        else:
+            start = int(index) + (nlast if int(index) < 0 else 0)
+            stop = start + 1
+            if not 0 <= start < nlast:
+                raise IndexError(f"Slab {index} out of range for n{len(self.shape)}={nlast}")
+        count = max(0, stop - start)
+        plane = tuple(self.shape[:-1])
+        data = np.asarray(data)
+        if data.shape == plane and count == 1:
+            data = data.reshape(plane + (1,), order='F')
+        elif data.shape != plane + (count,):
+            raise ValueError(f"Slab shape {data.shape} does not match {plane + (count,)}")
+
+        fd = self._open()
+        step = max(1, DATA_BLOCKSIZE // max(self.plane, 1))
+        for first in range(0, count, step):
+            block = np.asfortranarray(data[..., first:first + step], dtype=self.dtype)
+            _pwrite_all(fd, block.reshape(-1, order='F').view(np.uint8),
+                        self.offset + (start + first) * self.plane)
+        if sync:
+            os.fsync(fd)
+        self._mark(start, count)
+
+    def memmap(self):
+        """
+        Writable memory map of the whole output, for hyperslabs that are not
+        whole hyperplanes. Writes through it are not marked; write_slab or
+        finish(mark=True) marks them.
+        """
+        return np.memmap(self.path, dtype=self.dtype, mode='r+', offset=self.offset,
+                         shape=tuple(self.shape), order='F')
+
+    def _mark(self, start, count):
+        self._open()
+        if self._part_fd is not None and count:
+            os.pwrite(self._part_fd, b"\x01" * count, start)
+
+    def missing(self):
+        """
+        Indices of the hyperplanes along the last axis not written yet.
+        """
+        try:
+            with open(_part_path(self.path), 'rb') as fp:
+                marks = np.frombuffer(fp.read(), dtype=np.uint8)
+        except FileNotFoundError:
+            return []
+        marks = np.pad(marks[:self.shape[-1]], (0, max(0, self.shape[-1] - marks.size)))
+        return np.flatnonzero(marks == 0).tolist()
+
+    @property
+    def complete(self):
+        """
+        Whether all hyperplanes have been written.
+        """
+        return not self.missing()
+
+    def finish(self, mark=False):
+        """
+        Check that all hyperplanes have been written, flush the binary and
+        remove the marker file. Call once, after all writers are done.
+        With mark=True, all hyperplanes are taken as written (e.g. after
+        writes through memmap()).
+        """
+        if mark:
+            self._mark(0, self.shape[-1])
+        missing = self.missing()
+        if missing:
+            raise ValueError(f"{len(missing)} slabs not written yet, first is {missing[0]}")
+        os.fsync(self._open())
+        self.close()
+        try:
+            os.remove(_part_path(self.path))
+        except FileNotFoundError:
+            pass
+
+    def close(self):
+        """
+        Close the file descriptors of this process.
+        """
+        for fd in (self._fd, self._part_fd):
+            if fd is not None:
+                os.close(fd)
+        self._fd = self._part_fd = None
+
+    def _open(self):
+        if self._fd is None:
+            self._fd = os.open(self.path, os.O_WRONLY)
+            try:
+                self._part_fd = os.open(_part_path(self.path), os.O_WRONLY)
+            except FileNotFoundError:
+                self._part_fd = None
+        return self._fd
+
+
+def _part_path(path):
+    """
+    Marker file of an unfinished RsfOutput binary.
+    """
+    return path + ".part"
+
+
+def _preallocate(fd, nbytes):
+    """
+    Reserve nbytes for a file, falling back to a sparse file where
+    posix_fallocate is not available or not supported by the filesystem.
+    """
+    if nbytes > 0 and hasattr(os, "posix_fallocate"):
+        try:
+            os.posix_fallocate(fd, 0, nbytes)
+            return
+        except OSError:
+            pass
+    os.ftruncate(fd, nbytes)
+
+
+def _pwrite_all(fd, buf, offset):
+    view = memoryview(buf)
+    while view:
+        written = os.pwrite(fd, view, offset)
+        view = view[written:]
+        offset += written
+
+
+def _seekable(fp):
+    try:
+        return fp.seekable()
+    except (AttributeError, OSError, ValueError):
+        return False
+
+
+def _open_output(file, out, outheader, compression=None):
+    """
+    Open the header and data outputs of write_rsf, setting outheader["in"]
+    (and the compression keys, if compression is given).
+    Returns (file_fp, out_fp, close_file, close_out).
+    """
+    close_file = isinstance(file, str)
     file_fp = _check_input_source(file, 'wb')
 
     if file_fp is None:
         raise ValueError(f"Cannot open file: {file}")
-    
+
     if out is None:
         if isinstance(file, str):
             fname = os.path.basename(file)
             fname = os.path.join(_get_datapath(), fname + '@')
+            if compression:
+                fname += {v: k for k, v in _COMPRESSION_SUFFIX.items()}[compression]
             out_fp = _check_input_source(fname, 'wb')
+            if out_fp is None:
+                raise ValueError(f"Cannot open output file: {fname}")
             outheader["in"] = os.path.abspath(fname)
         else:
             out_fp = file_fp
             outheader["in"] = 'stdin'
-        
+
     elif out == 'stdout':
         out_fp = file_fp
         outheader["in"] = 'stdin'
@@ -195,17 +1894,86 @@ def write_rsf(arr: np.ndarray, file, header={}, history='', out=None, form="nati
             outheader["in"] = os.path.abspath(out)
         else:
             outheader["in"] = out
+    else:
+        raise TypeError(f"Invalid output type: {type(out)}")
+    if compression:
+        outheader["data_compression"] = compression
+        outheader["compression_block"] = COMPRESS_BLOCKSIZE
+    close_out = out_fp is not file_fp and not isinstance(out, io.IOBase)
+    return file_fp, out_fp, close_file, close_out
+
+
+def _output_compression(compression, out):
+    """
+    Validate the compression of write_rsf/RsfWriter, inferring it from the
+    suffix of an out file name if not given.
+    """
+    if compression is None and isinstance(out, str):
+        compression = _COMPRESSION_SUFFIX.get(os.path.splitext(out)[1])
+    if compression is not None:
+        _compression({"data_compression": compression})
+    return compression
 
-    dtype = arr.dtype.name
-    dtype = ''.join([c for c in dtype if c.isalpha()])
-    outheader.update({"data_format": f"{form}_{dtype}"})
+
+def _finish_compressed(data_fp, outheader):
+    """
+    Flush the last block of a _BlockWriter and write the block index
+    next to the binary.
+    """
+    if not isinstance(data_fp, _BlockWriter):
+        return
+    data_fp.close()
+    if isinstance(outheader.get("in"), str) and outheader["in"] != "stdin":
+        _write_block_index(outheader["in"], data_fp.offsets)
+
+
+def _rsf_type(dtype, keep_precision=False, header=None):
+    """
+    Map a numpy dtype to its RSF data type name and storage dtype.
+    By default new data is stored as the 4-byte float, int and complex
+    types that all RSF programs read (uchar and short data as they are).
+    With keep_precision, or when header (of data read from RSF) already
+    stores dtype that way, double, long and complexdouble are kept too;
+    wider types (longdouble, uint64) are narrowed to the closest.
+    """
+    dtype = np.dtype(dtype)
+    if not keep_precision and header:
+        fmt_B = str(header.get("data_format", "")).partition("_")[2]
+        keep_precision = fmt_B == _rsf_type(dtype, True)[0]
+    if dtype.kind == 'c':
+        if keep_precision and dtype.itemsize > 8:
+            return "complexdouble", np.dtype(np.complex128)
+        return "complex", np.dtype(np.complex64)
+    if dtype.kind == 'f':
+        if keep_precision and dtype.itemsize > 4:
+            return "double", np.dtype(np.float64)
+        return "float", np.dtype(np.float32)
+    if dtype.kind in 'ub' and dtype.itemsize == 1:
+        return "uchar", np.dtype(np.uint8)
+    if dtype.kind == 'i' and dtype.itemsize == 2:
+        return "short", np.dtype(np.int16)
+    if keep_precision and (dtype.itemsize > 4 or (dtype.kind == 'u' and dtype.itemsize == 4)):
+        return "long", np.dtype(np.int64)
+    if dtype.kind in 'iub':
+        return "int", np.dtype(np.int32)
+    raise TypeError(f"Unsupported data type: {dtype}")
+
+
+def _header_bytes(outheader, history, splitter=True, widths=None):
+    """
+    Format history, banner and header keys as RSF header bytes.
+    widths pads the values of the given keys, so they can be patched in place.
+    """
+    widths = widths or {}
     header_str = ""
     for key, value in outheader.items():
         if isinstance(value, str):
             if key not in ["in","data_format","esize","out"]: value = f'"{value}"'
-            header_str += f"{key}={value}\n"
         else:
-            header_str += f"{key}={str(value)}\n"
+            value = str(value)
+        if key in widths:
+            value = value.ljust(widths[key])
+        header_str += f"{key}={value}\n"
 
     try:
         uname = os.getlogin()
@@ -214,28 +1982,114 @@ def write_rsf(arr: np.ndarray, file, header={}, history='', out=None, form="nati
         uname = "unknown"
         hostname = "unknown"
     banner = f"RSFPY_{__version__}\t{os.getcwd()}\t{uname}@{hostname}\t{datetime.datetime.now().strftime('%a %b %d %H:%M:%S %Y')}"
-    file_fp.write(history.encode('utf-8') + b"\n\n")
-    file_fp.write(banner.encode('utf-8') + b"\n")
-    file_fp.write(header_str.encode('utf-8') + b"\n\n")
-    if out is None or out == 'stdout': file_fp.write(RSFHSPLITER)
+    out = history.encode('utf-8') + b"\n\n"
+    out += banner.encode('utf-8') + b"\n"
+    out += header_str.encode('utf-8') + b"\n\n"
+    if splitter: out += RSFHSPLITER
+    return out
 
+
+def _write_data(out_fp, arr, storage, form="native", fmt="%f"):
+    """
+    Write arr in Fortran order as storage dtype with the given form.
+    """
+    arr = np.asarray(arr)
     if form == "ascii":
-        np.savetxt(out_fp, arr, fmt=fmt)
-    else:
-        if dtype == "complex":
-            arr = arr.astype(np.complex64)
-        elif dtype == "float":
-            arr = arr.astype(np.float32)
-        elif dtype == "int":
-            arr = arr.astype(np.int32)
-        elif dtype == "uchar":
-            arr = arr.astype(np.uint8)
-        if form == "native":
-            out_fp.write(arr.tobytes(order="F"))
-        elif form == "xdr":
-            out_fp.write(arr.byteswap().tobytes(order="F"))
-        else:
-            raise ValueError(f"Unsupported form: {form}")
+        _write_ascii(out_fp, arr, storage, fmt)
+        return
+    if form == "xdr":
+        storage = storage.newbyteorder(">")
+    elif form != "native":
+        raise ValueError(f"Unsupported form: {form}")
+    _write_fortran(out_fp, arr.reshape(1) if arr.ndim == 0 else arr, storage)
 
-    if close_after:
-        file_fp.close()
+
+def _write_fortran(out_fp, arr, storage, blocksize=DATA_BLOCKSIZE):
+    """
+    Write arr in Fortran order as storage dtype.
+    Fortran-contiguous arrays of the right dtype are written from their own
+    buffer; anything else is converted (and byteswapped) in blocks of about
+    blocksize bytes, so no full-size copy is made.
+    """
+    if arr.dtype == storage and arr.flags.f_contiguous:
+        buf = memoryview(arr.reshape(-1, order='F').view(np.uint8))
+        for i in range(0, len(buf), blocksize):
+            out_fp.write(buf[i:i + blocksize])
+        return
+    plane = max(1, arr[..., 0].size * storage.itemsize)
+    step = max(1, blocksize // plane)
+    for i in range(0, arr.shape[-1], step):
+        if step == 1 and arr.ndim > 1 and plane > blocksize:
+            _write_fortran(out_fp, arr[..., i], storage, blocksize)
+            continue
+        block = np.asarray(arr[..., i:i + step], dtype=storage, order='F')
+        out_fp.write(memoryview(block.reshape(-1, order='F').view(np.uint8)))
+
+
+async def read_rsf_async(file, executor=None, **kwargs):
+    """
+    Coroutine version of read_rsf, running the blocking read on a bounded
+    thread pool so the event loop stays responsive.
+
+    Parameters
+    ----------
+    file : str or file-like object
+        The RSF file to read.
+    executor : concurrent.futures.Executor, optional
+        Executor to run on (default is a shared pool of ASYNC_WORKERS threads).
+    **kwargs
+        Passed to read_rsf (order, mmap, n#/f#/j# windows).
+
+    Returns
+    -------
+    list [ndarray, dict, str] or None
+        Same as read_rsf.
+    """
+    return await _run_async(read_rsf, file, executor=executor, **kwargs)
+
+
+async def write_rsf_async(arr: np.ndarray, file, executor=None, **kwargs):
+    """
+    Coroutine version of write_rsf, running the blocking write on a bounded
+    thread pool. arr must not be modified until the write has finished.
+
+    Parameters
+    ----------
+    arr : ndarray
+        The data array to write.
+    file : str or file-like object
+        The output file (header) or file-like object.
+    executor : concurrent.futures.Executor, optional
+        Executor to run on (default is a shared pool of ASYNC_WORKERS threads).
+    **kwargs
+        Passed to write_rsf (header, history, out, form, fmt).
+    """
+    return await _run_async(write_rsf, arr, file, executor=executor, **kwargs)
+
+
+ASYNC_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+_async_executor = None
+_async_lock = threading.Lock()
+
+
+def _get_async_executor():
+    global _async_executor
+    with _async_lock:
+        if _async_executor is None:
+            _async_executor = ThreadPoolExecutor(max_workers=ASYNC_WORKERS,
+                                                 thread_name_prefix="rsfpy-io")
+        return _async_executor
+
+
+async def _run_async(func, *args, executor=None, **kwargs):
+    """
+    Run func in executor and await it. Cancelling the awaiting task drops
+    the job if it has not started yet; a running job finishes in the
+    background and its result is discarded.
+    """
+    future = (executor or _get_async_executor()).submit(func, *args, **kwargs)
+    try:
+        return await asyncio.wrap_future(future)
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
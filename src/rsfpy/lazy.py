@@ -0,0 +1,328 @@
+"""
+  RsfPy - Python tools for Madagascar RSF data file reading/writing and scientific array handling.
+
+  Copyright (C) 2025 Jilin University
+
+  This program is free software; you can redistribute it and/or modify
+  it under the terms of the GNU General Public License as published by
+  the Free Software Foundation; either version 2 of the License, or
+  (at your option) any later version.
+
+  This program is distributed in the hope that it will be useful,
+  but WITHOUT ANY WARRANTY; without even the implied warranty of
+  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+  GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with this program; if not, write to the Free Software
+  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+"""
+
+# Deferred element-wise expressions on Rsfdata.
+#
+# Arithmetic and element-wise ufuncs on a LazyArray (Rsfdata.lazy()) only
+# record an expression graph. compute() then evaluates the whole expression
+# block by block, LAZY_BLOCKSIZE bytes of output at a time, into one output
+# array; each operation works in a block-sized scratch buffer reused for all
+# blocks, so (a - b) * np.exp(-c) + d on memory-mapped cubes needs no
+# full-size temporaries. to_rsf streams the result to an RSF file instead.
+# Blocks are slabs along the last axes, contiguous for Fortran-ordered data.
+
+import numpy as np
+
+from .io import RsfWriter, DATA_BLOCKSIZE
+
+
+__all__ = ["LAZY_BLOCKSIZE", "LazyArray", "lazy"]
+
+LAZY_BLOCKSIZE = 1 << 18
+
+
+def lazy(arr):
+    """
+    Wrap an array (Rsfdata, ndarray or memmap) as a LazyArray leaf.
+    """
+    if isinstance(arr, LazyArray):
+        return arr
+    return LazyArray(None, (np.asanyarray(arr),))
+
+
+class LazyArray:
+    """
+    Deferred element-wise expression over arrays and scalars.
+    Operands broadcast as in NumPy; nothing is computed before compute(),
+    to_rsf() or np.asarray(). Sub-expressions without a LazyArray operand,
+    like np.exp(-c) for an array c, are still evaluated by NumPy at once.
+
+    Usage:
+      > a, b, c = (Rsfdata(f, mmap=True) for f in ("a.rsf", "b.rsf", "c.rsf"))\n
+      > expr = (a.lazy() - b) * np.exp(-c.lazy())\n
+      > expr.to_rsf("out.rsf")\n
+    """
+    __array_priority__ = 20.0
+
+    def __init__(self, ufunc, args):
+        self.ufunc = ufunc
+        self.args = args
+        if ufunc is None:
+            self.shape = args[0].shape
+            self.dtype = args[0].dtype
+            return
+        self.shape = np.broadcast_shapes(*(np.shape(x) if not isinstance(x, LazyArray) else x.shape
+                                           for x in args))
+        # dtype of the ufunc on one element of each operand (scalars as is)
+        probe = [np.ones(1, dtype=x.dtype) if isinstance(x, LazyArray) else x for x in args]
+        with np.errstate(all='ignore'):
+            self.dtype = np.asarray(ufunc(*probe)).dtype
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    @property
+    def size(self):
+        return int(np.prod(self.shape, dtype=np.int64))
+
+    @property
+    def nbytes(self):
+        return self.size * self.dtype.itemsize
+
+    def __repr__(self):
+        return f"LazyArray({self._expr()}, shape={self.shape}, dtype={self.dtype})"
+
+    def __array__(self, dtype=None, copy=None):
+        arr = np.asarray(self.compute())
+        return arr if dtype is None else arr.astype(dtype, copy=False)
+
+    def __array_ufunc__(self, ufunc, method, *inputs, out=None, **kwargs):
+        if method != "__call__" or ufunc.nout != 1 or kwargs or \
+                ufunc.signature is not None:
+            return NotImplemented
+        args = tuple(_operand(x) for x in inputs)
+        if out is not None:
+            return LazyArray(ufunc, args).compute(out=out[0])
+        return LazyArray(ufunc, args)
+
+    def astype(self, dtype):
+        """
+        Cast the result to dtype (lazily).
+        """
+        return LazyArray(_Cast(np.dtype(dtype)), (self,))
+
+    def compute(self, out=None, blocksize=LAZY_BLOCKSIZE):
+        """
+        Evaluate the expression.
+
+        Parameters
+        ----------
+        out : ndarray, optional
+            Array of the result shape to write into (e.g. a memmap).
+        blocksize : int
+            Bytes of output evaluated at a time (default is LAZY_BLOCKSIZE).
+
+        Returns
+        -------
+        Rsfdata or ndarray
+            The result (out if given), with the header of the first Rsfdata
+            operand.
+        """
+        if out is None:
+            out = np.empty(self.shape, dtype=self.dtype, order='F')
+            header = self._header()
+            if header is not None:
+                from .array import Rsfdata
+                out = Rsfdata(out, header=header)
+        elif out.shape != self.shape:
+            raise ValueError(f"Output shape {out.shape} does not match {self.shape}")
+        self._fill(out, tuple(slice(0, n) for n in self.shape), blocksize)
+        return out
+
+    def to_rsf(self, file, header=None, history='', out=None, form="native",
+               blocksize=DATA_BLOCKSIZE, **kwargs):
+        """
+        Evaluate the expression into an RSF file, slab by slab along the
+        last axis, without holding the result in memory.
+
+        Parameters
+        ----------
+        file : str or file-like object
+            The output RSF file.
+        header : dict, optional
+            Header keys on top of those of the first Rsfdata operand.
+        history : str, optional
+            History information to write.
+        out, form, fmt, compression
+            As in write_rsf.
+        blocksize : int
+            Bytes of output per written slab (default is DATA_BLOCKSIZE).
+        """
+        outheader = dict(self._header() or {})
+        outheader.update(header or {})
+        shape = self.shape or (1,)
+        with RsfWriter(file, header=outheader, history=history, out=out, form=form,
+                       ndim=len(shape), n=shape[-1], **kwargs) as writer:
+            if not self.shape:
+                writer.append(np.asarray(self.compute()).reshape(1))
+                return
+            plane = int(np.prod(shape[:-1], dtype=np.int64)) * self.dtype.itemsize
+            step = max(1, blocksize // max(plane, 1))
+            buf = np.empty(shape[:-1] + (min(step, shape[-1]),), dtype=self.dtype, order='F')
+            head = tuple(slice(0, n) for n in shape[:-1])
+            for start in range(0, shape[-1], step):
+                stop = min(start + step, shape[-1])
+                slab = buf[..., :stop - start]
+                self._fill(slab, head + (slice(start, stop),), LAZY_BLOCKSIZE)
+                writer.append(slab)
+
+    def _fill(self, dest, region, blocksize):
+        """
+        Evaluate the part region (slices of the result) into dest.
+        """
+        shape = tuple(s.stop - s.start for s in region)
+        limit = max(1, blocksize // self.dtype.itemsize)
+        nodes = self._nodes()
+        leaves = {id(node): np.asarray(node.args[0]) for node in nodes if node.ufunc is None}
+        scratch = {}
+        for block in _blocks(shape, limit):
+            index = tuple(slice(r.start + b.start, r.start + b.stop) for r, b in zip(region, block))
+            bshape = tuple(b.stop - b.start for b in block)
+            values = {}
+            for node in nodes:
+                if node.ufunc is None:
+                    values[id(node)] = leaves[id(node)][_leaf_index(node.shape, self.shape, index)]
+                    continue
+                args = [values[id(x)] if isinstance(x, LazyArray) else x for x in node.args]
+                if node is self:
+                    target = dest[block + (Ellipsis,)]
+                else:
+                    buf = scratch.get(id(node))
+                    if buf is None:
+                        buf = scratch[id(node)] = np.empty(limit, dtype=node.dtype)
+                    nshape = _node_shape(node, bshape, self.shape)
+                    target = buf[:int(np.prod(nshape, dtype=np.int64))].reshape(nshape, order='F')
+                node.ufunc(*args, out=target)
+                values[id(node)] = target
+            if self.ufunc is None:
+                dest[block + (Ellipsis,)] = values[id(self)]
+
+    def _nodes(self):
+        """
+        Operation nodes and leaves in evaluation order, each once.
+        """
+        order, seen = [], set()
+
+        def visit(node):
+            if id(node) in seen:
+                return
+            seen.add(id(node))
+            if node.ufunc is not None:
+                for x in node.args:
+                    if isinstance(x, LazyArray):
+                        visit(x)
+            order.append(node)
+        visit(self)
+        return order
+
+    def _header(self):
+        from .array import Rsfdata
+        for node in self._nodes():
+            if node.ufunc is None and isinstance(node.args[0], Rsfdata):
+                return node.args[0].header
+        return None
+
+    def _expr(self):
+        if self.ufunc is None:
+            return f"array{self.shape}"
+        name = getattr(self.ufunc, "__name__", repr(self.ufunc))
+        return f"{name}({', '.join(x._expr() if isinstance(x, LazyArray) else repr(x) for x in self.args)})"
+
+
+def _node_shape(node, block_shape, shape):
+    """
+    Shape of node within a block of the result: broadcast axes stay 1.
+    """
+    offset = len(shape) - len(node.shape)
+    return tuple(1 if n == 1 and shape[offset + i] != 1 else block_shape[offset + i]
+                 for i, n in enumerate(node.shape))
+
+
+def _leaf_index(leaf_shape, shape, index):
+    """
+    Index into a leaf (aligned with the result on the trailing axes) for the
+    block index of the result.
+    """
+    offset = len(shape) - len(leaf_shape)
+    return tuple(slice(None) if n == 1 and shape[offset + i] != 1 else index[offset + i]
+                 for i, n in enumerate(leaf_shape))
+
+
+def _blocks(shape, limit):
+    """
+    Slices of blocks of at most limit elements: whole leading axes, and a
+    range along the first axis that does not fit.
+    """
+    ndim = len(shape)
+    inner, axis = 1, 0
+    while axis < ndim and inner * shape[axis] <= limit:
+        inner *= shape[axis]
+        axis += 1
+    if axis == ndim:
+        yield tuple(slice(0, n) for n in shape)
+        return
+    step = max(1, limit // inner)
+    head = tuple(slice(0, n) for n in shape[:axis])
+    for outer in np.ndindex(*shape[axis + 1:]):
+        tail = tuple(slice(i, i + 1) for i in outer)
+        for start in range(0, shape[axis], step):
+            yield head + (slice(start, min(start + step, shape[axis])),) + tail
+
+
+def _operand(x):
+    if isinstance(x, LazyArray):
+        return x
+    if isinstance(x, np.ndarray) and x.ndim > 0:
+        return lazy(x)
+    if isinstance(x, np.ndarray):
+        return x[()]
+    return x
+
+
+class _Cast:
+    """
+    Element-wise cast, usable as a node operation like a ufunc.
+    """
+    __name__ = "astype"
+
+    def __init__(self, dtype):
+        self.dtype = dtype
+
+    def __call__(self, x, out=None):
+        if out is None:
+            return np.asarray(x).astype(self.dtype)
+        out[...] = x
+        return out
+
+
+def _binary(ufunc):
+    def forward(self, other):
+        return LazyArray(ufunc, (self, _operand(other)))
+
+    def reverse(self, other):
+        return LazyArray(ufunc, (_operand(other), self))
+    return forward, reverse
+
+
+for _name, _ufunc in (("add", np.add), ("sub", np.subtract), ("mul", np.multiply),
+                      ("truediv", np.true_divide), ("floordiv", np.floor_divide),
+                      ("mod", np.remainder), ("pow", np.power), ("and", np.bitwise_and),
+                      ("or", np.bitwise_or), ("xor", np.bitwise_xor)):
+    _forward, _reverse = _binary(_ufunc)
+    setattr(LazyArray, f"__{_name}__", _forward)
+    setattr(LazyArray, f"__r{_name}__", _reverse)
+for _name, _ufunc in (("lt", np.less), ("le", np.less_equal), ("gt", np.greater),
+                      ("ge", np.greater_equal), ("eq", np.equal), ("ne", np.not_equal)):
+    setattr(LazyArray, f"__{_name}__", _binary(_ufunc)[0])
+for _name, _ufunc in (("neg", np.negative), ("pos", np.positive), ("abs", np.absolute),
+                      ("invert", np.invert)):
+    setattr(LazyArray, f"__{_name}__", lambda self, _ufunc=_ufunc: LazyArray(_ufunc, (self,)))
+LazyArray.__hash__ = None
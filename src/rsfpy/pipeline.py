@@ -0,0 +1,324 @@
+"""
+  RsfPy - Python tools for Madagascar RSF data file reading/writing and scientific array handling.
+
+  Copyright (C) 2025 Jilin University
+
+  This program is free software; you can redistribute it and/or modify
+  it under the terms of the GNU General Public License as published by
+  the Free Software Foundation; either version 2 of the License, or
+  (at your option) any later version.
+
+  This program is distributed in the hope that it will be useful,
+  but WITHOUT ANY WARRANTY; without even the implied warranty of
+  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+  GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with this program; if not, write to the Free Software
+  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+"""
+
+# Streaming pipelines of RSF programs.
+#
+# The stages of a pipeline ("sfbandpass fhi=20 | sfagc", or a list of
+# stages) run as processes connected by OS pipes. A stage goes through
+# sh -c when it needs the shell (globs, ~, NAME=value prefixes, variables,
+# redirections ...), and the whole string does when it uses control syntax
+# ("&&", ";", subshells ...) that does not split into stages. A feeder thread writes the input to
+# the first stage: an array as its header and then its binary, straight from
+# the array buffer in DATA_BLOCKSIZE chunks. The header of the last stage is
+# parsed as it arrives and its data is read directly into the output array,
+# or into a memmap of a scratch file under DATAPATH. Passing an array
+# through a program thus costs the output array, not three full copies.
+
+import os, re, sys, shlex, shutil, signal, tempfile, threading
+from subprocess import Popen, PIPE, SubprocessError
+
+import numpy as np
+
+from .io import write_rsf, _read_header, _data_layout, _decompressed, _read_ascii, \
+    _readinto_full, _native, DATA_BLOCKSIZE
+from .utils import _check_input_source, _datapath
+
+
+__all__ = ["pipeline", "stages"]
+
+# syntax outside quotes that only the shell handles: control syntax
+# (whole command string under sh -c) and expansions (that stage under sh -c)
+_SHELL_CONTROL = re.compile(r"""[;&(){}\n#!]|\|\|""")
+_SHELL_STAGE = re.compile(r"""[<>`$*?\[~\\]|^\s*[A-Za-z_][A-Za-z0-9_]*=""")
+
+
+def pipeline(cmds, source=None, memmap=False, verb=False):
+    """
+    Run RSF programs as a streaming pipeline and read their output.
+
+    Parameters
+    ----------
+    cmds : str or sequence
+        The pipeline: a command string with stages separated by "|", or a
+        sequence of stages, each a command string or an argument list.
+    source : Rsfdata, ndarray, str or file-like object, optional
+        Input of the first stage: an array (written with its header), or
+        an RSF file or stream (passed on as it is).
+    memmap : bool
+        Read the output into a memmap of an (unlinked) scratch file under
+        DATAPATH instead of memory (default is False).
+    verb : bool
+        Print the stages to stderr before running them (default is False).
+
+    Returns
+    -------
+    Rsfdata
+        The output of the last stage.
+
+    Usage:
+      > spec = pipeline("sfbandpass fhi=20 | sfspectra", source=data)\n
+      > agc = pipeline([["sfbandpass", "fhi=20"], "sfagc rect1=50"], source="in.rsf")\n
+    """
+    arr, header, text = _run(cmds, source, memmap, verb)
+    if arr is None:
+        raise ValueError("No RSF data in pipeline output")
+    from .array import Rsfdata
+    return Rsfdata(arr, header=header, history=text)
+
+
+def stages(cmds):
+    """
+    Split a pipeline into argument lists, one per stage.
+    Stages needing the shell (globs, ~, NAME=value prefixes, variables,
+    redirections ...) are run as ["sh", "-c", stage]; command strings with
+    control syntax (";", "&&", subshells ...) as ["sh", "-c", cmd].
+    """
+    if isinstance(cmds, str):
+        cmds = [cmds]
+    argvs = []
+    for cmd in cmds:
+        if not isinstance(cmd, str):
+            argvs.append([str(arg) for arg in cmd])
+            continue
+        if _SHELL_CONTROL.search(_unquoted(cmd)):
+            argvs.append(["sh", "-c", cmd])
+            continue
+        for stage in _pipe_split(cmd):
+            if not stage.strip():
+                argvs.append([])
+            elif _SHELL_STAGE.search(_unquoted(stage)):
+                argvs.append(["sh", "-c", stage])
+            else:
+                argvs.append(shlex.split(stage))
+    if not argvs or not all(argvs):
+        raise ValueError(f"Empty stage in pipeline: {cmds!r}")
+    return argvs
+
+
+def _unquoted(cmd):
+    """
+    cmd without its quoted parts.
+    """
+    return re.sub(r"'[^']*'|\"(?:[^\"\\]|\\.)*\"", "", cmd)
+
+
+def _pipe_split(cmd):
+    """
+    Raw text of the stages of cmd, split at "|" outside quotes.
+    """
+    parts, start, quote, escape = [], 0, None, False
+    for i, char in enumerate(cmd):
+        if escape:
+            escape = False
+        elif char == "\\" and quote != "'":
+            escape = True
+        elif quote:
+            if char == quote:
+                quote = None
+        elif char in "'\"":
+            quote = char
+        elif char == "|":
+            parts.append(cmd[start:i])
+            start = i + 1
+    parts.append(cmd[start:])
+    return parts
+
+
+class _Flow:
+    """
+    Running stages of a pipeline, the first fed by feed(stdin) on a thread.
+    """
+    def __init__(self, cmds, feed=None, verb=False):
+        self.argvs = stages(cmds)
+        self.procs = []
+        self.errors = []
+        self.failure = None
+        stdin = PIPE if feed is not None else None
+        try:
+            for argv in self.argvs:
+                if verb:
+                    print(shlex.join(argv), file=sys.stderr)
+                proc = Popen(argv, stdin=stdin, stdout=PIPE, stderr=PIPE)
+                if self.procs:
+                    # the next stage holds the only read end
+                    self.procs[-1].stdout.close()
+                self.procs.append(proc)
+                stdin = proc.stdout
+        except OSError as e:
+            self.kill()
+            raise SubprocessError("In Command: '%s':\n%s" % (shlex.join(argv), e))
+
+        self.threads = []
+        for proc in self.procs:
+            errors = []
+            self.errors.append(errors)
+            self._thread(self._drain, proc.stderr, errors)
+        if feed is not None:
+            self._thread(self._feed, feed)
+
+    @property
+    def stdout(self):
+        return self.procs[-1].stdout
+
+    def _thread(self, target, *args):
+        thread = threading.Thread(target=target, args=args, daemon=True)
+        thread.start()
+        self.threads.append(thread)
+
+    @staticmethod
+    def _drain(stderr, errors):
+        with stderr:
+            errors.append(stderr.read())
+
+    def _feed(self, feed):
+        stdin = self.procs[0].stdin
+        try:
+            feed(stdin)
+        except (BrokenPipeError, ConnectionResetError):
+            # the first stage stopped reading; its exit status tells why
+            pass
+        except Exception as e:
+            self.failure = e
+        finally:
+            try:
+                stdin.close()
+            except OSError:
+                pass
+
+    def wait(self):
+        """
+        Wait for all stages; raise SubprocessError for the first that failed.
+        Stages stopped by SIGPIPE only lost their reader, as in a shell.
+        """
+        for thread in self.threads:
+            thread.join()
+        for argv, proc, errors in zip(self.argvs, self.procs, self.errors):
+            if proc.wait() not in (0, -signal.SIGPIPE):
+                message = b"".join(errors).decode(errors="replace")
+                raise SubprocessError("In Command: '%s':\n%s" % (shlex.join(argv), message))
+        if self.failure is not None:
+            raise self.failure
+
+    def kill(self):
+        for proc in self.procs:
+            proc.kill()
+        for proc in self.procs:
+            proc.wait()
+
+
+def _run(cmds, source=None, memmap=False, verb=False):
+    """
+    Run a pipeline and read its output.
+    Returns (arr, header, header_text), or (None, None, output bytes) if the
+    output is not RSF data.
+    """
+    flow = _Flow(cmds, _feeder(source), verb)
+    try:
+        try:
+            result = _read_output(flow.stdout, memmap)
+        except ValueError as e:
+            # a short output is reported as the failure of its stage
+            result = e
+        while flow.stdout.read(DATA_BLOCKSIZE):
+            pass
+        flow.wait()
+    except BaseException:
+        flow.kill()
+        raise
+    finally:
+        flow.stdout.close()
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+
+def _feeder(source):
+    """
+    Function writing source to the stdin of the first stage, or None.
+    """
+    if source is None:
+        return None
+    if isinstance(source, np.ndarray):
+        header = source.header if hasattr(source, "header") else {}
+        history = getattr(source, "history", "")
+        # default 4-byte types: most RSF programs only read float/int/complex
+        return lambda stdin: write_rsf(source, stdin, header, history)
+
+    def copy(stdin):
+        fp = _check_input_source(source, 'rb')
+        if fp is None:
+            raise ValueError(f"Cannot read pipeline input: {source}")
+        try:
+            shutil.copyfileobj(fp, stdin, DATA_BLOCKSIZE)
+        finally:
+            if isinstance(source, str):
+                fp.close()
+    return copy
+
+
+def _read_output(fp, memmap=False):
+    """
+    Parse the header on fp and read its data into a new array.
+    Returns (arr, header, header_text), or (None, None, output bytes).
+    """
+    header, header_text, data_fp = _read_header(fp)
+    try:
+        shape, fmt_A, fmt_B, dtype = _data_layout(header)
+    except ValueError:
+        return None, None, header_text.encode("utf-8") + data_fp.read()
+
+    in_val = header["in"]
+    if in_val == "stdin":
+        data_file = _decompressed(data_fp, header)
+    else:
+        data_file = _check_input_source(in_val, 'rb')
+        if data_file is None:
+            raise ValueError(f"Data file not accessible: {in_val}")
+        data_file = _decompressed(data_file, header, in_val)
+    try:
+        if fmt_A == "ascii":
+            arr = _read_ascii(data_file, dtype, int(np.prod(shape, dtype=np.int64)))
+            arr = arr.reshape(shape, order='F')
+        else:
+            arr = _scratch(shape, dtype) if memmap else np.empty(shape, dtype=dtype, order='F')
+            if _readinto_full(data_file, arr) < arr.nbytes:
+                raise ValueError("Unexpected end of RSF data in pipeline output")
+            arr = _native(arr)
+    finally:
+        if in_val != "stdin":
+            data_file.close()
+    return arr, header, header_text
+
+
+def _scratch(shape, dtype):
+    """
+    Writable memmap of shape over a scratch file under DATAPATH, unlinked
+    at once so that it goes away with the array.
+    """
+    nbytes = int(np.prod(shape, dtype=np.int64)) * dtype.itemsize
+    if nbytes == 0:
+        return np.empty(shape, dtype=dtype, order='F')
+    fd, path = tempfile.mkstemp(prefix="pipeline.", suffix=".rsf@", dir=_datapath())
+    try:
+        os.ftruncate(fd, nbytes)
+        return np.memmap(path, dtype=dtype, mode='r+', shape=tuple(shape), order='F')
+    finally:
+        os.close(fd)
+        os.unlink(path)
@@ -19,6 +19,7 @@ import matplotlib.font_manager as font_manager
 from matplotlib import use as use_backend
 from matplotlib.ticker import FormatStrFormatter, MaxNLocator
 
+from rsfpy.clip import PCLIP_MODES
 from rsfpy.utils import _str_match_re
 from rsfpy.version import __BASE_AX_NAME, __author__, __email__, __github__, __version__
 from rsfpy.plot.parameters import canonical_params
@@ -50,6 +51,8 @@ def _parameter(kind, name, description):
 _COMMON_PARAMETERS = (
     ("string", "backend=default", "Matplotlib backend; default lets Matplotlib choose."),
     ("string", "format=svg", "output format when stdout has no recognizable suffix."),
+    ("bool", "mmap=n", "memory-map the input binary instead of reading it; needs in= to be a regular file."),
+    ("int", "prefetch=0", "movie frames read ahead on a background thread while rendering; useful with mmap=y."),
     ("float", "screenwidth/width=8.", "figure width in inches."),
     ("float", "screenheight/height=6.", "figure height in inches."),
     ("float", "dpi=100.", "figure resolution in dots per inch."),
@@ -64,6 +67,7 @@ _COMMON_PARAMETERS = (
     ("string", "color/cmap=gray", "Matplotlib colormap; i, j, s map to gray, jet, seismic. A comma-separated color list creates a linear map."),
     ("float", "clip=", "symmetric display clip around bias."),
     ("float", "pclip=99.", "percentile used to estimate clip when clip is absent."),
+    ("string", "pclipmode=exact", "how pclip is computed: exact, hist (streamed histogram) or sample (strided subset)."),
     ("float", "bias=0.", "data value mapped to the center of the color table."),
     ("bool", "allpos=n", "map values from 0 to clip instead of using a symmetric range."),
     ("bool", "mean=n", "use the input mean as bias when estimating display gain."),
@@ -129,6 +133,7 @@ _MODE_PARAMETERS = {
     "wiggle": (
         ("float", "zplot=1.", "vertical wiggle exaggeration."),
         ("float", "clip= pclip=99. bias=0.", "wiggle amplitude clipping and bias."),
+        ("string", "pclipmode=exact", "how pclip is computed: exact, hist or sample."),
         ("bool", "fill=y", "enable positive and negative fills."),
         ("string", "pcolor= ncolor= lcolor=k", "positive fill, negative fill, and trace colors."),
         ("float", "plotfat/linewidth=1.", "trace line width."),
@@ -238,6 +243,14 @@ def float_param(params, name, default=None):
         return default
 
 
+def pclipmode_param(params, default="exact"):
+    value = str(params.get("pclipmode", default)).lower()
+    if value not in PCLIP_MODES:
+        warning("Warning: invalid pclipmode=%s, use default %s." % (value, default))
+        return default
+    return value
+
+
 def warning(*args, **kwargs):
     """Write a Madagascar-style warning without making stderr parsing brittle."""
 
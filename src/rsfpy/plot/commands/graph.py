@@ -16,7 +16,7 @@ from .common import (
     create_figure, decorate_axes, error, float_param, save_figure, warning,
     show_documentation, wants_documentation,
 )
-from .io import read_stdin_rsf
+from .io import read_stdin_rsf, movie_frames
 
 
 def _cycle(value, count, default):
@@ -88,7 +88,7 @@ def _render(context, data):
     transp = bool_param(params, "transp", False)
     for index in range(count):
         values = np.asarray(data[:, index]).reshape(-1)
-        if data.dtype == np.complex64:
+        if data.dtype.kind == 'c':
             x, y = np.real(values), np.imag(values)
         elif transp:
             x, y = values, data.axis1
@@ -166,12 +166,12 @@ def main(argv=None):
     if sys.stdin.isatty():
         error("Error: no input data?")
     try:
-        data = read_stdin_rsf()
+        data = read_stdin_rsf(mmap=bool_param(params, "mmap", False))
     except (TypeError, ValueError) as exc:
         error("Error: %s." % exc)
     if data.dtype == np.uint8:
         error("Error: graph plot does not support uchar data.")
-    if data.dtype == np.int32:
+    if data.dtype.kind == 'i':
         warning("Got %s, converting to float32." % data.dtype)
         data = Rsfarray(data.astype(np.float32), header=data.header)
     if data.ndim < 2:
@@ -190,9 +190,9 @@ def main(argv=None):
         plt.show()
         plt.close(figure)
         return 0
-    for iframe in range(count):
-        index = iframe * step
-        frame = data.window(n3=1, f3=index, copy=False)
+    indices = [iframe * step for iframe in range(count)]
+    prefetch = int(float_param(params, "prefetch", 0))
+    for iframe, index, frame in zip(range(count), indices, movie_frames(data, indices, prefetch)):
         figure, dpi = _render(context, frame)
         if movie:
             label = data.label3 or "Frame"
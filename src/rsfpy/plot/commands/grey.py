@@ -15,10 +15,10 @@ from rsfpy.plot.movie.grey import GreyMovieUpdater
 from rsfpy.plot.display import estimate_gain, make_colormap
 from .common import (
     PlotCommandContext, add_overlays, bool_param, configure_matplotlib,
-    create_figure, decorate_axes, error, float_param, save_figure, warning,
+    create_figure, decorate_axes, error, float_param, pclipmode_param, save_figure, warning,
     show_documentation, wants_documentation,
 )
-from .io import read_stdin_rsf
+from .io import read_stdin_rsf, movie_frames
 
 
 def _frame_label(prefix, suffix, axis, index):
@@ -77,7 +77,7 @@ def _render_first_frame(axes, data, params, cmap, gain):
               xreverse=bool_param(params, "xreverse", False),
               allpos=bool_param(params, "allpos", False),
               clip=float_param(params, "clip", None),
-              pclip=float_param(params, "pclip", 99.0),
+              pclip=float_param(params, "pclip", 99.0), pclipmode=params["pclipmode"],
               bias=float_param(params, "bias", 0.0), cmap=cmap,
               gain=gain,
               max_pixels=float_param(params, "maxpixels", None),
@@ -88,7 +88,7 @@ def _render_first_frame(axes, data, params, cmap, gain):
 
 def _gain_for_frame(params, reference):
     return estimate_gain(reference, clip=float_param(params, "clip", None),
-                         pclip=float_param(params, "pclip", 99.0),
+                         pclip=float_param(params, "pclip", 99.0), pclipmode=params["pclipmode"],
                          bias=float_param(params, "bias", 0.0),
                          mean=bool_param(params, "mean", False),
                          allpos=bool_param(params, "allpos", False),
@@ -120,16 +120,17 @@ def main(argv=None):
         return 0
     context = PlotCommandContext("grey", args)
     params = context.params
+    params["pclipmode"] = pclipmode_param(params)
     if sys.stdin.isatty():
         error("Error: no input data?")
     try:
-        data = read_stdin_rsf()
+        data = read_stdin_rsf(mmap=bool_param(params, "mmap", False))
     except (TypeError, ValueError) as exc:
         error("Error: %s." % exc)
-    if data.dtype == np.int32:
+    if data.dtype.kind == 'i':
         warning("Got %s, converting to float32." % data.dtype)
         data = Rsfarray(data.astype(np.float32), header=data.header)
-    elif data.dtype == np.complex64:
+    elif data.dtype.kind == 'c':
         warning("Got %s, converting to float32 using abs." % data.dtype)
         data = Rsfarray(np.abs(data), header=data.header)
     if data.ndim < 2:
@@ -194,9 +195,9 @@ def main(argv=None):
     sys.stdout.write(first_svg)
     sys.stdout.flush()
 
-    for iframe in range(1, count):
-        index = iframe * step
-        frame = frames.window(n3=1, f3=index, copy=False)
+    indices = [iframe * step for iframe in range(1, count)]
+    prefetch = int(float_param(params, "prefetch", 0))
+    for iframe, index, frame in zip(range(1, count), indices, movie_frames(frames, indices, prefetch)):
         vmin, vmax = axes.images[0].get_clim()
         frame_gain = _gain_for_frame(params, frame) if gain_each else first_gain
         state = MovieFrame(index=index, payload=frame, clip=frame_gain.clip,
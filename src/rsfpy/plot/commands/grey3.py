@@ -16,7 +16,7 @@ from rsfpy.plot.movie.grey3 import Grey3MovieUpdater
 from rsfpy.plot.display import estimate_gain, make_colormap
 from .common import (
     PlotCommandContext, add_overlays, bool_param, configure_matplotlib, create_figure,
-    error, float_param, save_figure, warning, show_documentation,
+    error, float_param, pclipmode_param, save_figure, warning, show_documentation,
     wants_documentation,
 )
 from .io import read_stdin_rsf
@@ -105,16 +105,17 @@ def main(argv=None):
         return 0
     context = PlotCommandContext("grey3", args)
     params = context.params
+    params["pclipmode"] = pclipmode_param(params)
     if sys.stdin.isatty():
         error("Error: no input data?")
     try:
-        data = read_stdin_rsf()
+        data = read_stdin_rsf(mmap=bool_param(params, "mmap", False))
     except (TypeError, ValueError) as exc:
         error("Error: %s." % exc)
-    if data.dtype == np.int32:
+    if data.dtype.kind == 'i':
         warning("Got %s, converting to float32." % data.dtype)
         data = Rsfarray(data.astype(np.float32), header=data.header)
-    elif data.dtype == np.complex64:
+    elif data.dtype.kind == 'c':
         warning("Got %s, converting to float32 using abs." % data.dtype)
         data = Rsfarray(np.abs(data), header=data.header)
     if data.ndim < 3:
@@ -133,7 +134,7 @@ def main(argv=None):
     movie_request = int(float_param(params, "movie", 0))
     reference, gain_each = _gain_reference(data, params, movie_request, frame1, frame2, frame3)
     gain = estimate_gain(reference, clip=float_param(params, "clip", None),
-                         pclip=float_param(params, "pclip", 99.0),
+                         pclip=float_param(params, "pclip", 99.0), pclipmode=params["pclipmode"],
                          bias=float_param(params, "bias", 0.0),
                          mean=bool_param(params, "mean", False),
                          allpos=bool_param(params, "allpos", False),
@@ -221,6 +222,7 @@ def main(argv=None):
                 state.gain = estimate_gain(_movie_plane(data, movie, state.frame1, state.frame2, state.frame3),
                                            clip=float_param(params, "clip", None),
                                            pclip=float_param(params, "pclip", 99.0),
+                                           pclipmode=params["pclipmode"],
                                            bias=float_param(params, "bias", 0.0),
                                            mean=bool_param(params, "mean", False),
                                            allpos=bool_param(params, "allpos", False),
@@ -7,6 +7,7 @@ import sys
 import numpy as np
 
 from rsfpy import Rsfarray
+from rsfpy.io import Prefetcher
 from rsfpy.utils import _get_stdname
 
 
@@ -27,9 +28,13 @@ SUPPORTED_OUTPUT_SUFFIXES = {
 }
 
 SUPPORTED_RSF_DTYPES = {
+    np.dtype(np.int16),
     np.dtype(np.int32),
+    np.dtype(np.int64),
     np.dtype(np.float32),
+    np.dtype(np.float64),
     np.dtype(np.complex64),
+    np.dtype(np.complex128),
     np.dtype(np.uint8),
 }
 
@@ -48,12 +53,19 @@ def output_format(params, default_suffix=None):
     return params.get("format", suffix.lstrip("."))
 
 
-def read_stdin_rsf(stdin=None):
+def read_stdin_rsf(stdin=None, mmap=False):
     stream = stdin if stdin is not None else sys.stdin.buffer
-    data = Rsfarray(stream)
+    data = Rsfarray(stream, mmap=mmap)
     if data.size == 0:
         raise ValueError("failed read RSF data from input")
-    dtype = np.dtype(data.dtype)
+    dtype = np.dtype(data.dtype).newbyteorder("=")
     if dtype not in SUPPORTED_RSF_DTYPES:
         raise TypeError("unsupported RSF data type: %s" % dtype)
     return data
+
+
+def movie_frames(data, indices, prefetch=0):
+    """Yield the n3 panels of data at indices; with prefetch > 0, that many
+    panels are copied ahead on a background thread (useful with mmap=y)."""
+    frames = (data.window(n3=1, f3=index, copy=prefetch > 0) for index in indices)
+    return Prefetcher(frames, depth=prefetch) if prefetch > 0 else frames
@@ -10,10 +10,10 @@ from rsfpy import Rsfarray
 from rsfpy.version import __SVG_SPLITTER
 from .common import (
     PlotCommandContext, add_overlays, bool_param, configure_matplotlib,
-    create_figure, decorate_axes, error, float_param, save_figure, warning,
+    create_figure, decorate_axes, error, float_param, pclipmode_param, save_figure, warning,
     show_documentation, wants_documentation,
 )
-from .io import read_stdin_rsf
+from .io import read_stdin_rsf, movie_frames
 
 
 def _splitter(label):
@@ -36,6 +36,7 @@ def _render(context, data, xpos_data=None):
                 min2=float_param(params, "min2", None), max2=float_param(params, "max2", None),
                 zplot=float_param(params, "zplot", 1.0), bias=float_param(params, "bias", 0.0),
                 clip=float_param(params, "clip", None), pclip=float_param(params, "pclip", 99.0),
+                pclipmode=params["pclipmode"],
                 ncolor=ncolor, pcolor=pcolor, lcolor=line_color,
                 linewidth=float_param(params, "plotfat", context.frame_style.width or 1.0),
                 xpos=xpos_data, show=False)
@@ -54,18 +55,19 @@ def main(argv=None):
         return 0
     context = PlotCommandContext("wiggle", args)
     params = context.params
+    params["pclipmode"] = pclipmode_param(params)
     if sys.stdin.isatty():
         error("Error: no input data?")
     try:
-        data = read_stdin_rsf()
+        data = read_stdin_rsf(mmap=bool_param(params, "mmap", False))
     except (TypeError, ValueError) as exc:
         error("Error: %s." % exc)
     if data.dtype == np.uint8:
         error("Error: wiggle plot does not support uchar data.")
-    if data.dtype == np.int32:
+    if data.dtype.kind == 'i':
         warning("Got %s, converting to float32." % data.dtype)
         data = Rsfarray(data.astype(np.float32), header=data.header)
-    elif data.dtype == np.complex64:
+    elif data.dtype.kind == 'c':
         warning("Got %s, converting to float32 using abs." % data.dtype)
         data = Rsfarray(np.abs(data), header=data.header)
     if data.ndim < 2:
@@ -87,9 +89,9 @@ def main(argv=None):
         plt.show()
         plt.close(figure)
         return 0
-    for iframe in range(count):
-        index = iframe * step
-        frame = data.window(n3=1, f3=index, copy=False)
+    indices = [iframe * step for iframe in range(count)]
+    prefetch = int(float_param(params, "prefetch", 0))
+    for iframe, index, frame in zip(range(count), indices, movie_frames(data, indices, prefetch)):
         figure, dpi = _render(context, frame, xpos_data)
         if movie:
             label = data.label3 or "Frame"
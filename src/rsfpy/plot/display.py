@@ -7,6 +7,8 @@ import math
 import numpy as np
 from matplotlib import colors
 
+from ..clip import percentile_clip
+
 
 DEFAULT_MAX_IMAGE_PIXELS = 4_000_000
 
@@ -92,22 +94,31 @@ class MadagascarNormalize(colors.Normalize):
 
 
 def estimate_gain(data, *, clip=None, pclip=99.0, bias=0.0, mean=False,
-                  allpos=False, gpow=1.0, polarity=False):
-    """Estimate grey.c-style display gain from one reference panel or panel set."""
+                  allpos=False, gpow=1.0, polarity=False, pclipmode="exact"):
+    """Estimate grey.c-style display gain from one reference panel or panel set.
 
-    values = np.asarray(data, dtype=float).ravel()
-    values = values[np.isfinite(values)]
-    if values.size == 0:
-        return Gain(clip=np.finfo(float).eps, bias=bias or 0.0, allpos=allpos,
-                    gpow=max(float(gpow), 1.0), polarity=polarity)
+    ``pclipmode`` selects how the pclip percentile is found: ``exact``,
+    ``hist`` or ``sample`` (see :func:`rsfpy.clip.percentile_clip`).
+    """
+
+    data = np.asanyarray(data)
     if mean:
-        bias = float(np.mean(values))
-    elif bias is None:
-        bias = 0.0
-    if clip is None:
+        values = np.asarray(data, dtype=float).ravel()
+        values = values[np.isfinite(values)]
+        empty = values.size == 0
+        if not empty:
+            bias = float(np.mean(values))
+    else:
+        empty = clip is not None and data.dtype.kind in "fc" and not np.isfinite(data).any()
+        if bias is None:
+            bias = 0.0
+    if clip is None and not empty:
         pclip = min(100.0, max(np.finfo(float).eps, float(pclip)))
-        reference = values if allpos else values - bias
-        clip = float(np.percentile(np.abs(reference), pclip))
+        clip = percentile_clip(data, pclip, mode=pclipmode, bias=0.0 if allpos else bias)
+        empty = clip is None
+    if empty:
+        return Gain(clip=np.finfo(float).eps, bias=bias or 0.0, allpos=allpos,
+                    gpow=max(float(gpow), 1.0), polarity=polarity)
     clip = max(abs(float(clip)), np.finfo(float).eps)
     gpow = float(gpow)
     if gpow <= 0:
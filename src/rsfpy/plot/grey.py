@@ -3,6 +3,7 @@ import matplotlib.pyplot as plt
 from typing import Optional, Union
 import warnings
 from .display import downsample_image, estimate_gain
+from ..clip import percentile_clip
 from ..version import __BASE_AX_NAME
 
 def grey(
@@ -41,6 +42,8 @@ def grey(
         The clipping value for the data.
     pclip: Optional[float]
         The percentile clipping value for the data.
+    pclipmode: Optional[str]
+        How pclip is computed: "exact" (default), "hist" or "sample".
     bias: Optional[float]
         The bias value for the data.
     allpos: Optional[bool]
@@ -81,7 +84,8 @@ def grey(
         'clip': None,
         'bias': None,
         'allpos': False,
-        'pclip': 99
+        'pclip': 99,
+        'pclipmode': 'exact'
     }
     params = {**defaults, **plot_params}
 
@@ -138,9 +142,9 @@ def grey(
 
     if pclip is not None and (clip is None) and (vmin is None and vmax is None):
         if hasattr(data, "pclip"):
-            clip = data.pclip(pclip)
+            clip = data.pclip(pclip, mode=params['pclipmode'])
         else:
-            clip = np.percentile(np.abs(data), pclip)
+            clip = percentile_clip(data, pclip, mode=params['pclipmode'])
         if allpos:
             vmin, vmax = 0, clip
         else:
@@ -10,6 +10,7 @@ import sys
 from .grey import grey
 from .wiggle import wiggle
 from .display import downsample_image
+from ..clip import percentile_clip
 from ..utils import _version_compare
 from ..version import __BASE_AX_NAME, __AX1_HLINE_NAME, __AX2_HLINE_NAME, __AX3_HLINE_NAME, __AX1_VLINE_NAME, __AX2_VLINE_NAME, __AX3_VLINE_NAME, __FRAME1_LABEL_NAME, __FRAME2_LABEL_NAME, __FRAME3_LABEL_NAME, __AX1_NAME, __AX2_NAME, __AX3_NAME
 import matplotlib.transforms as transforms
@@ -241,7 +242,7 @@ def grey3flat(
     if bias is None:
         bias = 0
     if pclip is not None and clip is None and vmin is None and vmax is None:
-        clip_val = np.percentile(np.abs(allslice), pclip)
+        clip_val = percentile_clip(allslice, pclip, mode=plot_params.get("pclipmode", "exact"))
         if allpos:
             vmin, vmax = 0, clip_val
         else:
@@ -509,7 +510,7 @@ def grey3cube(
     if bias is None:
         bias = 0
     if pclip is not None and clip is None and vmin is None and vmax is None:
-        clip_val = np.percentile(np.abs(allslice), pclip)
+        clip_val = percentile_clip(allslice, pclip, mode=plot_params.get("pclipmode", "exact"))
         if allpos:
             vmin, vmax = 0, clip_val
         else:
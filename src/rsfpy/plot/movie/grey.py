@@ -20,7 +20,7 @@ class GreyMovieUpdater(MovieUpdater):
         png = arr2png(frame.payload,
                       clip=frame.clip, pclip=parse_float(params.get("pclip"), 99.0), bias=frame.bias,
                       allpos=frame.allpos, cmap=frame.cmap,
-                      gain=frame.gain,
+                      gain=frame.gain, pclipmode=params.get("pclipmode", "exact"),
                       max_pixels=parse_float(params.get("maxpixels")),
                       min1=parse_float(params.get("min1")), max1=parse_float(params.get("max1")),
                       min2=parse_float(params.get("min2")), max2=parse_float(params.get("max2")),
@@ -4,6 +4,7 @@ from matplotlib import cm, colors
 import xml.etree.ElementTree as ET
 from ..version import __AX1_NAME
 from .display import downsample_image, estimate_gain
+from ..clip import percentile_clip
 
 def make_chunk(chunk_type: bytes, data: bytes) -> bytes:
     """Create PNG chunk"""
@@ -13,7 +14,7 @@ def make_chunk(chunk_type: bytes, data: bytes) -> bytes:
 
 
 def arr2png(arr: np.ndarray, clip=None, pclip=None, bias=0, allpos=False, cmap: str = "viridis", dpi: int = 100,
-            gain=None,
+            gain=None, pclipmode="exact",
             max_pixels=None,
             min1=None, max1=None, min2=None, max2=None, cords1=None, cords2=None) -> str:
     """
@@ -50,7 +51,8 @@ def arr2png(arr: np.ndarray, clip=None, pclip=None, bias=0, allpos=False, cmap:
         if arr.dtype == np.uint8:
             normed = arr.astype(float) / 255.0
         else:
-            display_gain = gain or estimate_gain(arr, clip=clip, pclip=pclip, bias=bias, allpos=allpos)
+            display_gain = gain or estimate_gain(arr, clip=clip, pclip=pclip, bias=bias, allpos=allpos,
+                                                    pclipmode=pclipmode)
             norm = display_gain.norm()
             normed = norm(arr)
         rgba = cm.get_cmap(cmap)(normed, bytes=True)  # (H, W, 4)
@@ -175,15 +177,15 @@ def replace_png(prefix: str, suffix: str, pnglabel: dict, new_b64: str,
 
 
 
-def clip2val(arr, clip=None, bias=0, pclip=None, allpos=False):
+def clip2val(arr, clip=None, bias=0, pclip=None, allpos=False, pclipmode="exact"):
     if bias is None:
         bias = 0
 
     if pclip is not None and (clip is None) :
         if hasattr(arr, "pclip"):
-            clip = arr.pclip(pclip)
+            clip = arr.pclip(pclip, mode=pclipmode)
         else:
-            clip = np.percentile(np.abs(arr), pclip)
+            clip = percentile_clip(arr, pclip, mode=pclipmode)
         if allpos:
             vmin, vmax = 0, clip
         else:
@@ -7,6 +7,8 @@ import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.collections import LineCollection, PolyCollection
 
+from ..clip import percentile_clip
+
 try:
     from . import rsfpy_utils as _rsfpy_utils
 except Exception:  # pragma: no cover - optional C extension
@@ -354,6 +356,7 @@ def wiggle(
     bias : float
     allpos : bool
     pclip : percentile for clipping when clip is None
+    pclipmode : "exact" (default), "hist" or "sample" way to compute pclip
     linewidth : float
     use_c : bool, default True, use rsfpy_utils if available
     show : bool, default True
@@ -383,6 +386,7 @@ def wiggle(
         "bias": 0.0,
         "allpos": False,
         "pclip": 99,
+        "pclipmode": "exact",
         "linewidth": 0.5,
         "use_c": True,
         "show": True,
@@ -442,9 +446,9 @@ def wiggle(
     if clip is None:
         if pclip is not None:
             if hasattr(data_obj, "pclip"):
-                clip = data_obj.pclip(pclip)
+                clip = data_obj.pclip(pclip, mode=params["pclipmode"])
             else:
-                clip = np.percentile(np.abs(arr), pclip)
+                clip = percentile_clip(arr, pclip, mode=params["pclipmode"])
         else:
             clip = np.nanmax(np.abs(arr))
 
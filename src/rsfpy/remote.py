@@ -0,0 +1,527 @@
+"""
+  RsfPy - Python tools for Madagascar RSF data file reading/writing and scientific array handling.
+
+  Copyright (C) 2025 Jilin University
+
+  This program is free software; you can redistribute it and/or modify
+  it under the terms of the GNU General Public License as published by
+  the Free Software Foundation; either version 2 of the License, or
+  (at your option) any later version.
+
+  This program is distributed in the hope that it will be useful,
+  but WITHOUT ANY WARRANTY; without even the implied warranty of
+  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+  GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with this program; if not, write to the Free Software
+  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+"""
+
+# Remote RSF access over HTTP range requests.
+#
+# read_rsf, iter_rsf and read_many accept rsf://host[:port]/path URLs (plain
+# HTTP on DEFAULT_PORT) and http(s):// URLs, for header files and for in=.
+# The in= of a remote header is looked up on the same server, relative to the
+# header for relative names. Bytes are fetched in CACHE_BLOCKSIZE blocks with
+# Range requests and kept in an LRU block cache on disk under DATAPATH, so a
+# window or a movie frame of a large cube only transfers the blocks it
+# touches, once. make_server/serve is a small stdlib server for a directory
+# tree (and DATAPATH, where the binaries of its headers usually are).
+#
+# Command line:
+#   python -m rsfpy.remote serve [root=.] [port=8765] [host=127.0.0.1]
+#   python -m rsfpy.remote cat rsf://host/path/file.rsf | rsfgrey > file.svg
+
+import os, sys, hashlib, threading, posixpath, shutil, http.client
+from email.utils import formatdate
+from http import HTTPStatus
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from urllib.parse import urlsplit, urlunsplit, quote, unquote
+import io
+
+from .utils import _datapath, _URL_SCHEMES
+
+
+__all__ = ["DEFAULT_PORT", "CACHE_BLOCKSIZE", "CACHE_SIZE", "is_url", "data_url", "open_url",
+           "BlockCache", "RemoteFile", "make_server", "serve"]
+
+DEFAULT_PORT = 8765
+CACHE_BLOCKSIZE = 1 << 20
+CACHE_SIZE = 1 << 30
+# blocks fetched by one range request at most
+FETCH_BLOCKS = 64
+
+_default_cache = None
+_cache_lock = threading.Lock()
+
+
+def is_url(path):
+    """
+    Whether path is an rsf://, http:// or https:// URL.
+    """
+    return isinstance(path, str) and path.startswith(_URL_SCHEMES)
+
+
+def data_url(url, in_val):
+    """
+    URL of the binary in= of the remote header at url: on the same server,
+    relative to the header directory for relative names.
+    """
+    if is_url(in_val):
+        return in_val
+    parts = urlsplit(url)
+    path = in_val if in_val.startswith("/") else \
+        posixpath.join(posixpath.dirname(unquote(parts.path)), in_val)
+    return urlunsplit((parts.scheme, parts.netloc, quote(posixpath.normpath(path)), "", ""))
+
+
+def open_url(url, cache=None, blocksize=CACHE_BLOCKSIZE):
+    """
+    Open a remote file for reading.
+
+    Parameters
+    ----------
+    url : str
+        rsf://, http:// or https:// URL.
+    cache : BlockCache or False, optional
+        Block cache (default is a shared BlockCache under DATAPATH);
+        False disables caching on disk.
+    blocksize : int
+        Bytes per cached block and per range request unit.
+
+    Returns
+    -------
+    RemoteFile
+    """
+    if cache is None:
+        cache = default_cache()
+    return RemoteFile(url, cache=cache or None, blocksize=blocksize)
+
+
+def default_cache():
+    """
+    The BlockCache shared by open_url, created on first use.
+    """
+    global _default_cache
+    with _cache_lock:
+        if _default_cache is None:
+            _default_cache = BlockCache()
+        return _default_cache
+
+
+class BlockCache:
+    """
+    LRU cache of fixed size blocks of remote files, one file per block.
+    Blocks are keyed by URL, file version (ETag or size and mtime) and
+    block index, so a changed remote file never returns stale blocks.
+    The least recently used blocks are removed beyond max_bytes.
+
+    Parameters
+    ----------
+    root : str, optional
+        Cache directory (default is .rsfcache under DATAPATH).
+    max_bytes : int
+        Size limit of the cache (default is CACHE_SIZE).
+    """
+    def __init__(self, root=None, max_bytes=CACHE_SIZE):
+        self.root = root if root is not None else os.path.join(_datapath(), ".rsfcache")
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.size = None
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as fp:
+                data = fp.read()
+            os.utime(path)
+        except OSError:
+            return None
+        return data
+
+    def put(self, key, data):
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp, 'wb') as fp:
+                fp.write(data)
+            os.replace(tmp, path)
+        except OSError:
+            return
+        with self.lock:
+            if self.size is None:
+                self.size = sum(size for _, size, _ in self._entries())
+            else:
+                self.size += len(data)
+            if self.size > self.max_bytes:
+                self._evict()
+
+    def clear(self):
+        """
+        Remove all cached blocks.
+        """
+        with self.lock:
+            shutil.rmtree(self.root, ignore_errors=True)
+            self.size = 0
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def _entries(self):
+        entries = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime_ns, st.st_size, path))
+        return entries
+
+    def _evict(self):
+        # down to 90% of the limit, so that eviction does not run on every put
+        entries = sorted(self._entries())
+        self.size = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if self.size <= self.max_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self.size -= size
+
+
+class RemoteFile(io.RawIOBase):
+    """
+    Seekable read-only file over HTTP range requests, through a BlockCache.
+    Reads spanning several missing blocks fetch them with one request.
+    """
+    def __init__(self, url, cache=None, blocksize=CACHE_BLOCKSIZE):
+        self.url = url
+        self.cache = cache
+        self.blocksize = blocksize
+        parts = urlsplit(url)
+        self._https = parts.scheme == "https"
+        self._netloc = parts.netloc if parts.port or parts.scheme != "rsf" else \
+            f"{parts.hostname}:{DEFAULT_PORT}"
+        self._target = quote(unquote(parts.path)) or "/"
+        self._conn = None
+        self._lock = threading.Lock()
+        self.pos = 0
+        self.block = (-1, b"")
+
+        response, body = self._request("HEAD")
+        if response.status != HTTPStatus.OK:
+            raise _http_error(url, response)
+        self.size = int(response.getheader("Content-Length", 0))
+        version = response.getheader("ETag") or \
+            f"{self.size}:{response.getheader('Last-Modified', '')}"
+        self._key = hashlib.sha1(f"{url}\n{version}".encode()).hexdigest()
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.pos
+        elif whence == io.SEEK_END:
+            offset += self.size
+        if offset < 0:
+            raise ValueError("Negative seek position")
+        self.pos = offset
+        return self.pos
+
+    def readinto(self, b):
+        view = memoryview(b).cast("B")
+        count = max(0, min(len(view), self.size - self.pos))
+        done = 0
+        while done < count:
+            first = (self.pos + done) // self.blocksize
+            last = (self.pos + count - 1) // self.blocksize
+            blocks = self._blocks(first, min(last, first + FETCH_BLOCKS - 1))
+            for iblock, data in blocks:
+                start = self.pos + done - iblock * self.blocksize
+                n = min(len(data) - start, count - done)
+                view[done:done + n] = data[start:start + n]
+                done += n
+        self.pos += done
+        return done
+
+    def readall(self):
+        out = bytearray(max(0, self.size - self.pos))
+        n = self.readinto(out)
+        return bytes(out[:n])
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        super().close()
+
+    def _blocks(self, first, last):
+        """
+        Blocks first..last as [(index, bytes)], fetching the missing ones
+        in runs of consecutive blocks.
+        """
+        blocks = {}
+        if first == self.block[0]:
+            blocks[first] = self.block[1]
+        if self.cache is not None:
+            for iblock in range(first, last + 1):
+                if iblock not in blocks:
+                    data = self.cache.get(f"{self._key}.{iblock}")
+                    if data is not None:
+                        blocks[iblock] = data
+        iblock = first
+        while iblock <= last:
+            if iblock in blocks:
+                iblock += 1
+                continue
+            end = iblock
+            while end + 1 <= last and end + 1 not in blocks:
+                end += 1
+            data = self._fetch(iblock * self.blocksize,
+                               min((end + 1) * self.blocksize, self.size))
+            for i in range(iblock, end + 1):
+                block = data[(i - iblock) * self.blocksize:(i - iblock + 1) * self.blocksize]
+                blocks[i] = block
+                if self.cache is not None:
+                    self.cache.put(f"{self._key}.{i}", block)
+            iblock = end + 1
+        self.block = (last, blocks[last])
+        return [(i, blocks[i]) for i in range(first, last + 1)]
+
+    def _fetch(self, start, stop):
+        response, data = self._request("GET", {"Range": f"bytes={start}-{stop - 1}"})
+        if response.status == HTTPStatus.OK:
+            data = data[start:stop]
+        elif response.status != HTTPStatus.PARTIAL_CONTENT:
+            raise _http_error(self.url, response)
+        if len(data) != stop - start:
+            raise OSError(f"Short read from {self.url}: {len(data)} of {stop - start} bytes")
+        return data
+
+    def _request(self, method, headers=None):
+        """
+        Send a request on the kept-alive connection, reconnecting once if
+        the server closed it.
+        """
+        with self._lock:
+            for attempt in range(2):
+                if self._conn is None:
+                    cls = http.client.HTTPSConnection if self._https else http.client.HTTPConnection
+                    self._conn = cls(self._netloc, timeout=60)
+                try:
+                    self._conn.request(method, self._target, headers=headers or {})
+                    response = self._conn.getresponse()
+                    return response, response.read()
+                except (http.client.HTTPException, ConnectionError):
+                    self._conn.close()
+                    self._conn = None
+                    if attempt:
+                        raise
+
+
+def _http_error(url, response):
+    if response.status == HTTPStatus.NOT_FOUND:
+        return FileNotFoundError(f"Remote file not found: {url}")
+    return OSError(f"HTTP {response.status} {response.reason}: {url}")
+
+
+class RangeRequestHandler(SimpleHTTPRequestHandler):
+    """
+    Serve files below directory, and files below the extra data
+    directories by absolute path, with single-range GET support.
+    """
+    datadirs = ()
+    quiet = False
+
+    def translate_path(self, path):
+        path = posixpath.normpath(unquote(urlsplit(path).path))
+        local = os.path.realpath(os.path.join(self.directory, path.lstrip("/")))
+        if _inside(local, self.directory) and os.path.exists(local):
+            return local
+        absolute = os.path.realpath(path)
+        if any(_inside(absolute, datadir) for datadir in self.datadirs):
+            return absolute
+        return local if _inside(local, self.directory) else os.path.join(self.directory, "\0")
+
+    def send_head(self):
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            return super().send_head()
+        try:
+            fp = open(path, 'rb')
+        except OSError:
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return None
+        st = os.fstat(fp.fileno())
+        size = st.st_size
+        start, stop = 0, size
+        self.remaining = None
+        ranges = self.headers.get("Range")
+        if ranges is not None:
+            parsed = _parse_range(ranges, size)
+            if parsed is None:
+                fp.close()
+                self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return None
+            start, stop = parsed
+            fp.seek(start)
+            self.remaining = stop - start
+            self.send_response(HTTPStatus.PARTIAL_CONTENT)
+            self.send_header("Content-Range", f"bytes {start}-{stop - 1}/{size}")
+        else:
+            self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(stop - start))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Last-Modified", formatdate(st.st_mtime, usegmt=True))
+        self.send_header("ETag", f'"{st.st_mtime_ns:x}-{size:x}"')
+        self.end_headers()
+        return fp
+
+    def copyfile(self, source, outputfile):
+        if self.remaining is None:
+            return super().copyfile(source, outputfile)
+        remaining = self.remaining
+        while remaining > 0:
+            data = source.read(min(remaining, 1 << 20))
+            if not data:
+                break
+            outputfile.write(data)
+            remaining -= len(data)
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+
+def _inside(path, directory):
+    directory = os.path.realpath(directory)
+    return path == directory or path.startswith(directory.rstrip(os.sep) + os.sep)
+
+
+def _parse_range(value, size):
+    """
+    (start, stop) of a single "bytes=a-b", "bytes=a-" or "bytes=-n" range,
+    or None if it cannot be satisfied.
+    """
+    unit, _, spec = value.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        return None
+    first, _, last = spec.strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            stop = min(int(last) + 1, size) if last else size
+        else:
+            start = max(0, size - int(last))
+            stop = size
+    except ValueError:
+        return None
+    if start >= stop:
+        return None
+    return start, stop
+
+
+def make_server(root='.', host='127.0.0.1', port=DEFAULT_PORT, datapath=None, quiet=False):
+    """
+    Create a threaded HTTP server for the RSF files below root.
+
+    Parameters
+    ----------
+    root : str
+        Directory served (URL paths are relative to it).
+    host : str
+        Interface to listen on (default is localhost only).
+    port : int
+        Port (default is DEFAULT_PORT; 0 picks a free port).
+    datapath : str or list of str, optional
+        Directories whose files are also served by absolute path, where the
+        binaries of the headers are (default is DATAPATH).
+    quiet : bool
+        Do not log requests.
+
+    Returns
+    -------
+    ThreadingHTTPServer
+        Call serve_forever() to run it, shutdown() to stop it.
+    """
+    if datapath is None:
+        datapath = [_datapath()]
+    elif isinstance(datapath, str):
+        datapath = [datapath]
+    attrs = {"datadirs": tuple(os.path.realpath(os.path.dirname(os.path.join(d, ""))) for d in datapath),
+             "quiet": quiet}
+    handler = type("Handler", (RangeRequestHandler,), attrs)
+    root = os.path.realpath(root)
+
+    def factory(*args, **kwargs):
+        return handler(*args, directory=root, **kwargs)
+    return ThreadingHTTPServer((host, port), factory)
+
+
+def serve(root='.', host='127.0.0.1', port=DEFAULT_PORT, datapath=None):
+    """
+    Serve the RSF files below root until interrupted.
+    """
+    server = make_server(root, host, port, datapath)
+    print(f"Serving {os.path.realpath(root)} at rsf://{host}:{server.server_address[1]}/",
+          file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def _cat(url, out):
+    """
+    Write a remote RSF file to out: the header with in= pointing to the
+    remote binary, or the whole file for embedded data (in="stdin").
+    """
+    from .io import _read_header
+    with open_url(url) as fp:
+        header, header_text, data_fp = _read_header(fp)
+        if header.get("in") == "stdin":
+            fp.seek(0)
+            shutil.copyfileobj(fp, out, CACHE_BLOCKSIZE)
+        else:
+            out.write(header_text.encode("utf-8"))
+            out.write(f'\n\tin="{data_url(url, header["in"])}"\n\n'.encode("utf-8"))
+
+
+def main(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if not argv or argv[0] not in ("serve", "cat"):
+        print(__doc__.strip().splitlines()[0], file=sys.stderr)
+        print("Usage:\n  python -m rsfpy.remote serve [root=.] [port=8765] [host=127.0.0.1]\n"
+              "  python -m rsfpy.remote cat rsf://host[:port]/path/file.rsf > file.rsf", file=sys.stderr)
+        return 1
+    if argv[0] == "cat":
+        for url in argv[1:]:
+            _cat(url, sys.stdout.buffer)
+        sys.stdout.buffer.flush()
+        return 0
+    args = dict(a.split("=", 1) for a in argv[1:] if "=" in a)
+    serve(args.get("root", "."), args.get("host", "127.0.0.1"), int(args.get("port", DEFAULT_PORT)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,491 @@
+"""
+  RsfPy - Python tools for Madagascar RSF data file reading/writing and scientific array handling.
+
+  Copyright (C) 2025 Jilin University
+
+  This program is free software; you can redistribute it and/or modify
+  it under the terms of the GNU General Public License as published by
+  the Free Software Foundation; either version 2 of the License, or
+  (at your option) any later version.
+
+  This program is distributed in the hope that it will be useful,
+  but WITHOUT ANY WARRANTY; without even the implied warranty of
+  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+  GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with this program; if not, write to the Free Software
+  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+"""
+
+# SEG-Y reading and writing without sfsegyread/sfsegywrite.
+#
+# A SEG-Y file is a 3200 byte textual header (EBCDIC), a 400 byte binary
+# header, optional extended textual headers and fixed length traces of a
+# 240 byte trace header followed by ns samples. The traces are memory-mapped
+# as a structured array, so any trace range is decoded on its own, in
+# blocks of traces shared between threads; IBM floats are converted with
+# integer and ldexp ufuncs. Trace header keys use the Madagascar names
+# (tracl, tracr, fldr, ..., see TRACE_HEADER).
+
+import os, warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .io import ASYNC_WORKERS
+from .utils import _check_input_source
+from .version import __version__
+
+
+__all__ = ["TRACE_HEADER", "BINARY_HEADER", "SAMPLE_FORMATS", "SegyFile", "read_segy", "iter_segy",
+           "write_segy", "ibm2ieee", "ieee2ibm"]
+
+TEXT_SIZE = 3200
+BINARY_SIZE = 400
+TRACE_HEADER_SIZE = 240
+# bytes of traces decoded/encoded at a time; small enough for the temporaries to stay in cache
+TRACE_BLOCKSIZE = 1 << 20
+
+# (key, bytes) in order, as in Madagascar's segy.h
+_TRACE_KEYS = [
+    ("tracl", 4), ("tracr", 4), ("fldr", 4), ("tracf", 4), ("ep", 4), ("cdp", 4), ("cdpt", 4),
+    ("trid", 2), ("nvs", 2), ("nhs", 2), ("duse", 2), ("offset", 4), ("gelev", 4), ("selev", 4),
+    ("sdepth", 4), ("gdel", 4), ("sdel", 4), ("swdep", 4), ("gwdep", 4), ("scalel", 2),
+    ("scalco", 2), ("sx", 4), ("sy", 4), ("gx", 4), ("gy", 4), ("counit", 2), ("wevel", 2),
+    ("swevel", 2), ("sut", 2), ("gut", 2), ("sstat", 2), ("gstat", 2), ("tstat", 2), ("laga", 2),
+    ("lagb", 2), ("delrt", 2), ("muts", 2), ("mute", 2), ("ns", 2), ("dt", 2), ("gain", 2),
+    ("igc", 2), ("igi", 2), ("corr", 2), ("sfs", 2), ("sfe", 2), ("slen", 2), ("styp", 2),
+    ("stas", 2), ("stae", 2), ("tatyp", 2), ("afilf", 2), ("afils", 2), ("nofilf", 2),
+    ("nofils", 2), ("lcf", 2), ("hcf", 2), ("lcs", 2), ("hcs", 2), ("year", 2), ("day", 2),
+    ("hour", 2), ("minute", 2), ("sec", 2), ("timbas", 2), ("trwf", 2), ("grnors", 2),
+    ("grnofr", 2), ("grnlof", 2), ("gaps", 2), ("otrav", 2), ("cdpx", 4), ("cdpy", 4),
+    ("iline", 4), ("xline", 4), ("shnum", 4), ("shsc", 2), ("tval", 2), ("tconst4", 4),
+    ("tconst2", 2), ("tunits", 2), ("device", 2), ("tscalar", 2), ("stype", 2), ("sendir", 4),
+    ("unknown", 2), ("smeas4", 4), ("smeas2", 2), ("smeasu", 2), ("unass1", 4), ("unass2", 4),
+]
+# sample count and interval are unsigned (SEG-Y rev 2)
+_UNSIGNED = {"ns", "dt", "hns", "hdt", "nso", "dto", "rev"}
+
+TRACE_HEADER = np.dtype([(key, f">{'u' if key in _UNSIGNED else 'i'}{size}")
+                         for key, size in _TRACE_KEYS])
+
+# (key, offset in the binary header, bytes)
+_BINARY_KEYS = [
+    ("jobid", 0, 4), ("lino", 4, 4), ("reno", 8, 4), ("ntrpr", 12, 2), ("nart", 14, 2),
+    ("hdt", 16, 2), ("dto", 18, 2), ("hns", 20, 2), ("nso", 22, 2), ("format", 24, 2),
+    ("fold", 26, 2), ("tsort", 28, 2), ("vscode", 30, 2), ("hsfs", 32, 2), ("hsfe", 34, 2),
+    ("hslen", 36, 2), ("hstyp", 38, 2), ("schn", 40, 2), ("hstas", 42, 2), ("hstae", 44, 2),
+    ("htatyp", 46, 2), ("hcorr", 48, 2), ("bgrcv", 50, 2), ("rcvm", 52, 2), ("mfeet", 54, 2),
+    ("polyt", 56, 2), ("vpol", 58, 2), ("rev", 300, 2), ("trflag", 302, 2), ("next", 304, 2),
+]
+
+BINARY_HEADER = np.dtype({
+    "names": [key for key, _, _ in _BINARY_KEYS],
+    "formats": [f">{'u' if key in _UNSIGNED else 'i'}{size}" for key, _, size in _BINARY_KEYS],
+    "offsets": [offset for _, offset, _ in _BINARY_KEYS],
+    "itemsize": BINARY_SIZE,
+})
+
+# data sample format code: (stored dtype, returned dtype); 1 is IBM float
+SAMPLE_FORMATS = {
+    1: (np.dtype(">u4"), np.dtype(np.float32)),
+    2: (np.dtype(">i4"), np.dtype(np.int32)),
+    3: (np.dtype(">i2"), np.dtype(np.int16)),
+    5: (np.dtype(">f4"), np.dtype(np.float32)),
+    6: (np.dtype(">f8"), np.dtype(np.float64)),
+    8: (np.dtype("i1"), np.dtype(np.int8)),
+    9: (np.dtype(">i8"), np.dtype(np.int64)),
+    10: (np.dtype(">u4"), np.dtype(np.uint32)),
+    11: (np.dtype(">u2"), np.dtype(np.uint16)),
+    16: (np.dtype("u1"), np.dtype(np.uint8)),
+}
+
+_IBM_MAX = 0x7fffffff
+
+
+def ibm2ieee(words, out=None):
+    """
+    Convert IBM single precision floats, given as their 32 bit patterns
+    (uint32 of any byte order), to float32.
+    Values beyond the float32 range become inf or denormals/zero.
+    """
+    words = np.asarray(words).astype(np.uint32, copy=False)
+    exp = ((words >> 22) & 0x1fc).view(np.int32)
+    exp -= 280                                  # x = mant * 16**(exp - 64) / 2**24
+    mant = (words & 0xffffff).astype(np.float32)
+    with np.errstate(over='ignore', under='ignore'):
+        out = np.ldexp(mant, exp, out=out)
+    bits = out.view(np.uint32)
+    bits |= words & 0x80000000
+    return out
+
+
+def ieee2ibm(values):
+    """
+    Convert floats to the 32 bit patterns (native uint32) of IBM single
+    precision floats, rounding the mantissa half up.
+    nan and inf are stored as the largest IBM float.
+    """
+    bits = np.ascontiguousarray(values, dtype=np.float32).view(np.uint32)
+    sign = bits & 0x80000000
+    exp = (bits >> 23) & 0xff
+    mant = bits & 0x7fffff
+    mant |= (exp != 0).astype(np.uint32) << 23  # implicit bit, except for denormals
+    np.maximum(exp, 1, out=exp)                 # x = mant * 2**(exp - 150)
+    words = (exp + 133) >> 2                    # x = f * 16**(words - 64), 1/16 <= f < 1
+    shift = (words << 2) - exp - 130           # 0..3 bits dropped from the mantissa
+    mant <<= 1
+    mant >>= shift
+    mant += 1
+    mant >>= 1
+    carry = mant >> 24
+    mant >>= carry << 2
+    words += carry
+    words <<= 24
+    words |= mant
+    words |= sign
+    words = np.where(mant == 0, np.uint32(0), words)
+    return np.where(exp == 0xff, sign | _IBM_MAX, words)
+
+
+class SegyFile:
+    """
+    Memory-mapped SEG-Y file with fixed length traces.
+    Only the trace ranges asked for are decoded, so files larger than
+    memory can be read piecewise.
+
+    Usage:
+      > with SegyFile("line.sgy") as sgy:\n
+      >     data, headers = sgy.read(first=1000, count=500)\n
+      >     for slab, headers in sgy.iter(ntr=10000):\n
+      >         ...\n
+
+    Attributes
+    ----------
+    text : str
+        The textual header, as 40 lines of 80 characters.
+    binary : dict
+        The binary header keys (BINARY_HEADER names).
+    ns, ntraces : int
+        Samples per trace and number of traces.
+    dt, t0 : float
+        Sample interval and first sample time (delrt of the first trace) in seconds.
+    format : int
+        Data sample format code (see SAMPLE_FORMATS).
+    endian : str
+        ">" (standard) or "<", detected from the format code by default.
+    """
+    def __init__(self, file, endian=None, workers=None):
+        self.file = file
+        self.workers = workers or ASYNC_WORKERS
+        with open(file, 'rb') as fp:
+            head = fp.read(TEXT_SIZE + BINARY_SIZE + TRACE_HEADER_SIZE)
+        if len(head) < TEXT_SIZE + BINARY_SIZE:
+            raise ValueError(f"Not a SEG-Y file (too short): {file}")
+
+        raw = head[TEXT_SIZE:TEXT_SIZE + BINARY_SIZE]
+        if endian is None:
+            endian = ">"
+            if np.frombuffer(raw, BINARY_HEADER)["format"][0] not in SAMPLE_FORMATS and \
+                    np.frombuffer(raw, BINARY_HEADER.newbyteorder("<"))["format"][0] in SAMPLE_FORMATS:
+                endian = "<"
+        if endian not in (">", "<"):
+            raise ValueError(f"Invalid endian: {endian}")
+        self.endian = endian
+        binary = np.frombuffer(raw, BINARY_HEADER.newbyteorder(endian))[0]
+        self.binary = {key: int(binary[key]) for key in BINARY_HEADER.names}
+        self.text = _decode_text(head[:TEXT_SIZE])
+
+        self.format = self.binary["format"]
+        if self.format not in SAMPLE_FORMATS:
+            raise ValueError(f"Unsupported SEG-Y data sample format: {self.format}")
+        self.offset = TEXT_SIZE + BINARY_SIZE + TEXT_SIZE * max(0, self.binary["next"])
+
+        self.ns, dt = self.binary["hns"], self.binary["hdt"]
+        if (self.ns == 0 or dt == 0) and len(head) == TEXT_SIZE + BINARY_SIZE + TRACE_HEADER_SIZE \
+                and self.offset == TEXT_SIZE + BINARY_SIZE:
+            first = np.frombuffer(head[-TRACE_HEADER_SIZE:], TRACE_HEADER.newbyteorder(endian))[0]
+            self.ns = self.ns or int(first["ns"])
+            dt = dt or int(first["dt"])
+        self.dt = dt * 1e-6
+
+        stored, self.dtype = SAMPLE_FORMATS[self.format]
+        self.record = np.dtype([("header", TRACE_HEADER.newbyteorder(endian)),
+                                ("data", stored.newbyteorder(endian), (self.ns,))])
+        size = os.path.getsize(file) - self.offset
+        self.ntraces = max(0, size // self.record.itemsize)
+        if size != self.ntraces * self.record.itemsize:
+            warnings.warn(f"SEG-Y file has {size % self.record.itemsize} trailing bytes "
+                          f"after {self.ntraces} traces: {file}")
+        self._records = None
+        if self.ntraces > 0:
+            self._records = np.memmap(file, dtype=self.record, mode='r',
+                                      offset=self.offset, shape=(self.ntraces,))
+        self.t0 = float(self._records[0]["header"]["delrt"]) * 1e-3 if self.ntraces else 0.
+
+    def __len__(self):
+        return self.ntraces
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def close(self):
+        """
+        Release the memory map. Arrays already returned stay valid.
+        """
+        self._records = None
+
+    def headers(self, first=0, count=None):
+        """
+        Decode the trace headers of traces first..first+count-1.
+
+        Returns
+        -------
+        ndarray
+            Native byte order structured array with the TRACE_HEADER fields.
+        """
+        first, count = self._range(first, count)
+        out = np.empty(count, dtype=TRACE_HEADER.newbyteorder("="))
+        if count:
+            records = self._records[first:first + count]
+
+            def decode(start, stop):
+                out[start:stop] = records["header"][start:stop]
+            self._blocks(decode, count)
+        return out
+
+    def traces(self, first=0, count=None):
+        """
+        Decode the samples of traces first..first+count-1.
+
+        Returns
+        -------
+        ndarray
+            (ns, count) array in Fortran order; IBM floats become float32.
+        """
+        first, count = self._range(first, count)
+        out = np.empty((count, self.ns), dtype=self.dtype)
+        if count and self.ns:
+            records = self._records[first:first + count]
+
+            def decode(start, stop):
+                if self.format == 1:
+                    ibm2ieee(records["data"][start:stop], out=out[start:stop])
+                else:
+                    out[start:stop] = records["data"][start:stop]
+            self._blocks(decode, count)
+        return out.T
+
+    def read(self, first=0, count=None):
+        """
+        Read a range of traces.
+
+        Returns
+        -------
+        list [Rsfdata, ndarray]
+            The traces as (ns, count) data with the time axis keys set, and
+            their trace headers.
+        """
+        from .array import Rsfdata
+
+        first, count = self._range(first, count)
+        header = {"d1": self.dt, "o1": self.t0, "label1": "Time", "unit1": "s",
+                  "d2": 1., "o2": float(first), "label2": "Trace", "unit2": ""}
+        data = Rsfdata(self.traces(first, count), header=header)
+        return [data, self.headers(first, count)]
+
+    def iter(self, ntr=1000, first=0, count=None):
+        """
+        Iterate over a range of traces, ntr traces at a time.
+
+        Yields
+        ------
+        list [Rsfdata, ndarray]
+            As read(), for each group of traces.
+        """
+        first, count = self._range(first, count)
+        ntr = max(1, int(ntr))
+        for start in range(first, first + count, ntr):
+            yield self.read(start, min(ntr, first + count - start))
+
+    def _range(self, first, count):
+        first = int(first)
+        if first < 0:
+            first += self.ntraces
+        if count is None:
+            count = self.ntraces - first
+        if not 0 <= first <= self.ntraces or count < 0 or first + count > self.ntraces:
+            raise IndexError(f"Traces {first}..{first + count - 1} out of range (ntraces={self.ntraces})")
+        if count and self._records is None:
+            raise ValueError("SEG-Y file is closed")
+        return first, int(count)
+
+    def _blocks(self, fn, count):
+        """
+        Call fn(start, stop) over blocks of about TRACE_BLOCKSIZE bytes of
+        traces, on a pool of threads if there are several blocks.
+        """
+        step = max(1, TRACE_BLOCKSIZE // self.record.itemsize)
+        starts = range(0, count, step)
+        workers = min(self.workers, len(starts))
+        if workers <= 1:
+            for start in starts:
+                fn(start, min(start + step, count))
+            return
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rsfpy-segy") as pool:
+            for job in [pool.submit(fn, start, min(start + step, count)) for start in starts]:
+                job.result()
+
+
+def read_segy(file, first=0, count=None, endian=None, workers=None):
+    """
+    Read SEG-Y traces.
+
+    Parameters
+    ----------
+    file : str
+        The SEG-Y file.
+    first, count : int, optional
+        Range of traces to read (default is all traces).
+    endian : str, optional
+        ">" or "<" (default is detected from the binary header).
+    workers : int, optional
+        Number of decoding threads (default is ASYNC_WORKERS).
+
+    Returns
+    -------
+    list [Rsfdata, ndarray]
+        The traces as (ns, count) data, and their trace headers as a
+        structured array with the TRACE_HEADER fields.
+    """
+    with SegyFile(file, endian=endian, workers=workers) as sgy:
+        return sgy.read(first, count)
+
+
+def iter_segy(file, ntr=1000, first=0, count=None, endian=None, workers=None):
+    """
+    Iterate over the traces of a SEG-Y file, ntr traces at a time, as
+    read_segy would return them. Only one group of traces is decoded at a time.
+    """
+    with SegyFile(file, endian=endian, workers=workers) as sgy:
+        yield from sgy.iter(ntr, first, count)
+
+
+def write_segy(data, file, headers=None, text=None, binary=None, format=1, endian=">"):
+    """
+    Write traces as a SEG-Y file.
+
+    Parameters
+    ----------
+    data : ndarray or Rsfdata
+        Traces along the first axis; further axes are flattened into traces.
+        The sample interval and delay are taken from d1 and o1 (in seconds)
+        of an Rsfdata header.
+    file : str or file-like object
+        The output SEG-Y file.
+    headers : ndarray, optional
+        Structured array of trace headers (any subset of the TRACE_HEADER
+        fields, e.g. from read_segy), one per trace. Default is tracl/tracr
+        numbering and dt/delrt from the data.
+    text : str, optional
+        Textual header (default is a short description), stored as 40
+        lines of 80 EBCDIC characters.
+    binary : dict, optional
+        Binary header keys overriding the defaults.
+    format : int
+        Data sample format code (default is 1, IBM float; 5 is IEEE float).
+    endian : str
+        ">" (standard big-endian, default) or "<".
+    """
+    if format not in SAMPLE_FORMATS:
+        raise ValueError(f"Unsupported SEG-Y data sample format: {format}")
+    if endian not in (">", "<"):
+        raise ValueError(f"Invalid endian: {endian}")
+    arr = np.asarray(data)
+    rsfheader = getattr(data, "header", {})
+    if arr.ndim == 0:
+        arr = arr.reshape(1)
+    ns = arr.shape[0]
+    traces = arr.reshape(ns, -1, order='F')
+    ntraces = traces.shape[1]
+    if headers is not None and len(headers) != ntraces:
+        raise ValueError(f"Got {len(headers)} trace headers for {ntraces} traces")
+    if ns > 0xffff:
+        raise ValueError(f"SEG-Y traces hold at most 65535 samples, got {ns}")
+    dt = int(round(float(rsfheader.get("d1", 0.004)) * 1e6))
+    if not 0 < dt <= 0xffff:
+        warnings.warn(f"Sample interval d1={rsfheader.get('d1')} does not fit SEG-Y, writing dt=0")
+        dt = 0
+    delrt = int(round(float(rsfheader.get("o1", 0.)) * 1e3))
+
+    stored, _ = SAMPLE_FORMATS[format]
+    record = np.dtype([("header", TRACE_HEADER.newbyteorder(endian)),
+                       ("data", stored.newbyteorder(endian), (ns,))])
+
+    bheader = np.zeros(1, dtype=BINARY_HEADER.newbyteorder(endian))
+    values = {"ntrpr": 1, "hdt": dt, "hns": ns, "format": format, "mfeet": 1,
+              "rev": 0x0100, "trflag": 1, "next": 0}
+    values.update(binary or {})
+    for key, value in values.items():
+        if key in BINARY_HEADER.names:
+            bheader[key] = value
+    if text is None:
+        text = "\n".join([f"C 1 SEG-Y written by rsfpy {__version__}",
+                          f"C 2 {ntraces} traces, {ns} samples per trace, sample interval {dt} us"]
+                         + [f"C{i:2d}" for i in range(3, 40)] + ["C40 END TEXTUAL HEADER"])
+
+    close_file = isinstance(file, str)
+    fp = _check_input_source(file, 'wb')
+    if fp is None:
+        raise ValueError(f"Cannot open file: {file}")
+    try:
+        fp.write(_encode_text(text))
+        fp.write(bheader.tobytes())
+        step = max(1, TRACE_BLOCKSIZE // record.itemsize)
+        for start in range(0, ntraces, step):
+            stop = min(start + step, ntraces)
+            block = np.zeros(stop - start, dtype=record)
+            th = block["header"]
+            if headers is None:
+                th["tracl"] = th["tracr"] = np.arange(start + 1, stop + 1)
+                th["dt"] = dt
+                th["delrt"] = delrt
+            else:
+                for key in headers.dtype.names:
+                    if key in TRACE_HEADER.names:
+                        th[key] = headers[key][start:stop]
+            th["ns"] = ns
+            samples = traces[:, start:stop].T
+            if format == 1:
+                block["data"] = ieee2ibm(samples)
+            else:
+                block["data"] = samples
+            fp.write(block.data)
+    finally:
+        if close_file:
+            fp.close()
+
+
+def _decode_text(raw):
+    """
+    Decode a textual header, EBCDIC or (as some writers do) ASCII.
+    """
+    ebcdic = raw[:1] == b"\xc3" or sum(b >= 0x80 for b in raw) > len(raw) // 2
+    text = raw.decode("cp037" if ebcdic else "latin-1")
+    return "\n".join(text[i:i + 80].rstrip() for i in range(0, len(text), 80))
+
+
+def _encode_text(text):
+    """
+    Encode a textual header as 3200 bytes of EBCDIC, 80 characters per line.
+    """
+    lines = []
+    for line in text.splitlines():
+        lines += [line[i:i + 80] for i in range(0, max(len(line), 1), 80)]
+    lines = [line.ljust(80) for line in lines[:TEXT_SIZE // 80]]
+    return "".join(lines).ljust(TEXT_SIZE).encode("cp037", errors="replace")
@@ -0,0 +1,310 @@
+"""
+  RsfPy - Python tools for Madagascar RSF data file reading/writing and scientific array handling.
+
+  Copyright (C) 2025 Jilin University
+
+  This program is free software; you can redistribute it and/or modify
+  it under the terms of the GNU General Public License as published by
+  the Free Software Foundation; either version 2 of the License, or
+  (at your option) any later version.
+
+  This program is distributed in the hope that it will be useful,
+  but WITHOUT ANY WARRANTY; without even the implied warranty of
+  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+  GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with this program; if not, write to the Free Software
+  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+"""
+
+# Shared memory transport for RSF data between processes on one node.
+#
+# A segment holds a complete RSF file with embedded data: header keys,
+# padding up to an SHM_ALIGN boundary, the header splitter, then the binary
+# in Fortran order. Other processes attach it by name (from_shared, or an
+# RSF header with in="shm://name") and get arrays viewing the segment, so
+# nothing is pickled or copied. A process closes its handle of a segment
+# when the last array viewing it there is garbage collected. The segment
+# itself lives until release_shared(name) is called (in any process), or
+# until the process that created it exits, so that consumers can attach it
+# after the producer has dropped its own array. Pooled segments return to
+# their SharedPool on release_shared.
+
+import sys, atexit, threading
+import multiprocessing
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np
+
+from .io import RSFHSPLITER, HEADER_BLOCKSIZE, _parse_header, _data_layout, _rsf_type, _header_bytes, \
+    _strip_layout
+
+
+__all__ = ["SHM_PREFIX", "to_shared", "from_shared", "attach_shared", "release_shared", "SharedPool"]
+
+SHM_PREFIX = "shm://"
+SHM_ALIGN = 64
+
+# names of the segments created (and tracked) by this process
+_created = set()
+# segments created by to_shared and not released yet: name -> (handle, pool)
+_owned = {}
+_owned_lock = threading.Lock()
+
+
+def to_shared(arr, header=None, history='', name=None, pool=None):
+    """
+    Copy arr into a new shared memory segment.
+
+    Parameters
+    ----------
+    arr : ndarray
+        The data array to share.
+    header : dict, optional
+        The header information to store with the data.
+    history : str, optional
+        History information to store with the data.
+    name : str, optional
+        Segment name (default is a random name). Ignored with pool.
+    pool : SharedPool, optional
+        Take the segment from a pool of reusable segments.
+
+    Returns
+    -------
+    list [ndarray, dict, str]
+        The array viewing the segment, its header (in="shm://<name>")
+        and history. The segment lives until release_shared(name), or
+        until this process exits.
+    """
+    arr = np.asarray(arr)
+    # a transport between Python processes: keep double, short and long data
+    rsftype, storage = _rsf_type(arr.dtype, keep_precision=True)
+    outheader = dict(header or {})
+    _strip_layout(outheader, history)
+    for idim in range(9):
+        outheader.pop(f"n{idim + 1}", None)
+    for idim, size in enumerate(arr.shape or (1,)):
+        outheader[f"n{idim + 1}"] = size
+    outheader.update({"in": "stdin", "data_format": f"native_{rsftype}",
+                      "esize": storage.itemsize})
+    text = _header_bytes(outheader, history, splitter=False)
+    offset = -(-(len(text) + len(RSFHSPLITER)) // SHM_ALIGN) * SHM_ALIGN
+    text += b"\n" * (offset - len(text) - len(RSFHSPLITER)) + RSFHSPLITER
+
+    nbytes = offset + arr.size * storage.itemsize
+    if pool is not None:
+        shm = pool.acquire(nbytes)
+    else:
+        shm = _create_segment(nbytes, name)
+    with _owned_lock:
+        _owned[shm.name] = (shm, pool)
+    segment = _Segment(shm, owner=True)
+    raw = np.asarray(segment)
+    raw[:offset] = np.frombuffer(text, dtype=np.uint8)
+    data = raw[offset:nbytes].view(storage).reshape(arr.shape, order='F')
+    data[...] = arr
+
+    header = _parse_header(text[:-len(RSFHSPLITER)].decode('utf-8', errors='ignore'))
+    header["in"] = SHM_PREFIX + shm.name
+    return [data, header, history]
+
+
+def from_shared(name):
+    """
+    Attach the shared memory segment written by to_shared.
+
+    Parameters
+    ----------
+    name : str
+        Segment name, with or without the "shm://" prefix.
+
+    Returns
+    -------
+    list [ndarray, dict, str]
+        The array viewing the segment (writes are seen by all processes),
+        its header (in="shm://<name>") and history.
+    """
+    raw, header, history = attach_shared(name)
+    shape, _, _, dtype = _data_layout(header)
+    count = int(np.prod(shape, dtype=np.int64))
+    data = raw[:count * dtype.itemsize].view(dtype).reshape(shape, order='F')
+    return [data, header, history]
+
+
+def release_shared(name):
+    """
+    Release a segment written by to_shared: unlink it, or return it to its
+    SharedPool if it came from one in this process. Processes that have
+    attached it keep their arrays; new attaches fail.
+
+    Parameters
+    ----------
+    name : str
+        Segment name, with or without the "shm://" prefix.
+    """
+    if name.startswith(SHM_PREFIX):
+        name = name[len(SHM_PREFIX):]
+    with _owned_lock:
+        shm, pool = _owned.pop(name, (None, None))
+    if pool is not None:
+        pool.release(shm)
+    elif shm is not None:
+        _unlink_segment(shm)
+    else:
+        # created elsewhere: open it tracked, so that unlink balances it
+        _unlink_segment(shared_memory.SharedMemory(name=name))
+
+
+@atexit.register
+def _release_owned():
+    with _owned_lock:
+        names = list(_owned)
+    for name in names:
+        try:
+            release_shared(name)
+        except OSError:
+            pass
+
+
+def attach_shared(name):
+    """
+    Attach a segment and return (raw bytes after the header, header, history).
+    Used by read_rsf for in="shm://<name>".
+    """
+    if name.startswith(SHM_PREFIX):
+        name = name[len(SHM_PREFIX):]
+    segment = _Segment(_open_segment(name), owner=False)
+    raw = np.asarray(segment)
+    end = -1
+    for start in range(0, raw.size, HEADER_BLOCKSIZE):
+        block = raw[max(0, start - len(RSFHSPLITER) + 1):start + HEADER_BLOCKSIZE].tobytes()
+        pos = block.find(RSFHSPLITER)
+        if pos >= 0:
+            end = max(0, start - len(RSFHSPLITER) + 1) + pos
+            break
+    if end < 0:
+        raise ValueError(f"No RSF header in shared memory segment: {name}")
+    text = raw[:end].tobytes().decode('utf-8', errors='ignore')
+    header = _parse_header(text)
+    header["in"] = SHM_PREFIX + name
+    return raw[end + len(RSFHSPLITER):], header, text
+
+
+class SharedPool:
+    """
+    Pool of reusable shared memory segments for to_shared.
+    A segment returns to the pool on release_shared; readers in other
+    processes must be done with it by then. Segments beyond maxsize free
+    ones are unlinked.
+
+    Usage:
+      > with SharedPool() as pool:\n
+      >     for shot in shots:\n
+      >         shared = shot.to_shared(pool=pool)\n
+      >         ...\n
+      >         release_shared(shared.header["in"])\n
+    """
+    def __init__(self, maxsize=8):
+        self.maxsize = maxsize
+        self.free = []
+        self.lock = threading.Lock()
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def acquire(self, size):
+        """
+        Return a free segment of at least size bytes, creating one if needed.
+        """
+        with self.lock:
+            if self.closed:
+                raise ValueError("SharedPool is closed")
+            fits = [shm for shm in self.free if shm.size >= size]
+            if fits:
+                shm = min(fits, key=lambda shm: shm.size)
+                self.free.remove(shm)
+                return shm
+        return _create_segment(size)
+
+    def release(self, shm):
+        """
+        Give a segment back to the pool.
+        """
+        with self.lock:
+            if not self.closed and len(self.free) < self.maxsize:
+                self.free.append(shm)
+                return
+        _unlink_segment(shm)
+
+    def close(self):
+        """
+        Unlink all free segments. Segments still in use are unlinked when released.
+        """
+        with self.lock:
+            self.closed = True
+            free, self.free = self.free, []
+        for shm in free:
+            _unlink_segment(shm)
+
+
+class _Segment:
+    """
+    View of an open segment. Arrays made from it keep it alive through
+    their base; when it is collected, an attached segment is closed. The
+    handle of a segment created by to_shared is kept until release_shared.
+    """
+    def __init__(self, shm, owner):
+        self.shm = shm
+        self.owner = owner
+        self._bytes = np.frombuffer(shm.buf, dtype=np.uint8)
+        self.__array_interface__ = self._bytes.__array_interface__
+
+    def __del__(self):
+        del self.__array_interface__
+        del self._bytes
+        if not self.owner:
+            _close_segment(self.shm)
+
+
+def _create_segment(size, name=None):
+    shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+    _created.add(shm.name)
+    return shm
+
+
+def _close_segment(shm):
+    try:
+        shm.close()
+    except BufferError:
+        # arrays of this process still view it; the map goes with them
+        pass
+
+
+def _unlink_segment(shm):
+    _created.discard(shm.name)
+    _close_segment(shm)
+    shm.unlink()
+
+
+def _open_segment(name):
+    """
+    Attach an existing segment without handing it to this process's
+    resource tracker, which would unlink it when this process exits.
+    Segments created here, and processes started by multiprocessing
+    (which share their parent's tracker), keep the registration.
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    shm = shared_memory.SharedMemory(name=name)
+    if name not in _created and multiprocessing.parent_process() is None:
+        try:
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+    return shm
@@ -216,7 +216,8 @@ def main(default_plottype=None):
     if data.size == 0:
         sf_error("Failed read RSF data from input.")
     datatype = data.dtype
-    if datatype not in [np.int32, np.float32, np.complex64, np.uint8]:
+    if datatype.newbyteorder('=') not in [np.int16, np.int32, np.int64, np.float32, np.float64,
+                                          np.complex64, np.complex128, np.uint8]:
         sf_error(f"Error: unsupported data type: {datatype} ?")
 
     
@@ -454,10 +455,10 @@ def main(default_plottype=None):
             min_val, max_val = min_max_vals[0], min_max_vals[1]
         except Exception as e:
             sf_error(f"Error reading bar= when scalebar=y, {e}")
-    if datatype == np.int32:
+    if datatype.kind == 'i':
         sf_warning(f"Got {datatype}, converting to float32.")
         data = Rsfarray(data.astype(np.float32), header=data.header)
-    if datatype == np.complex64 and plottype!= 'graph':
+    if datatype.kind == 'c' and plottype!= 'graph':
         sf_warning(f"Got {datatype}, converting to float32 using abs.")
         data = Rsfarray(np.abs(data), header=data.header)
     
@@ -656,13 +657,13 @@ def main(default_plottype=None):
                 data = data.reshape((data.n1, 1))
             for itrace in range(data.n2):
                 if transp:
-                    if datatype == np.complex64:
+                    if datatype.kind == 'c':
                         y, x = np.real(data[:, itrace]), np.imag(data[:, itrace])
                     else:
                         x, y = data[:, itrace].squeeze(), data.axis1
 
                 else:
-                    if datatype == np.complex64:
+                    if datatype.kind == 'c':
                         x, y = np.real(data[:, itrace]), np.imag(data[:, itrace])
                     else:
                         y, x = data[:, itrace].squeeze(), data.axis1
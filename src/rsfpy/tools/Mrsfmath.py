@@ -63,6 +63,7 @@ __doc__ = """
     \t\033[4mstring\033[0m\t\033[1mcmd1=\033[0m third Python command to execute
     \t\033[4mstring\033[0m\t\033[1mcmd2=\033[0m fourth Python command to execute
     \t\033[4mstring\033[0m\t\033[1m...\033[0m continue as needed with cmd3, cmd4, ...
+    \t\033[4mbool\033[0m\t\033[1mlazy=n\033[0m [y/n] if y, memory-map inputs and evaluate element-wise expressions block by block
 
     \t\033[4mint\033[0m\t\033[1mn1,n2,n3,...\033[0m shape of synthetic input when stdin is absent
     \t\033[4mfloat\033[0m\t\033[1mo1,o2,o3,...\033[0m origin(s) of synthetic input
@@ -94,6 +95,13 @@ __doc__ = """
     \t\tMrsfmath.py n1=200 n2=50 d1=0.004 o1=0.0 \\
     \t\toutput="np.sin(x1)[:,None]*np.ones((n1,n2),dtype=np.float32)" > out.rsf
 
+    \t6. Fused expression on large cubes, streamed to the output:
+    \t\tMrsfmath.py < a.rsf b=b.rsf c=c.rsf lazy=y output="(input-b)*np.exp(-c)" > out.rsf
+
+    \t7. Update large input in place (no full-size temporaries):
+    \t\tMrsfmath.py < in.rsf other=other.rsf \\
+    \t\tcmd="np.multiply(input,other,out=input)" cmd0="input += 1" output="input" > out.rsf
+
 \033[1mNOTES\033[0m
     \t\033[1moutput=\033[0m should be a Python expression.
 
@@ -101,6 +109,11 @@ __doc__ = """
 
     \tThis program uses Python exec/eval internally, so it is intended for trusted input.
 
+    \tWith \033[1mlazy=y\033[0m, \033[1minput\033[0m and extra inputs are deferred expressions
+    \t(rsfpy.lazy.LazyArray): arithmetic and element-wise NumPy functions on them are
+    \tevaluated in small blocks and streamed to the output, without full-size temporaries.
+    \tUse input.compute() where a real array is needed.
+
     \tExtra input variable names must be valid Python identifiers.
 
 \033[1mMORE INFO\033[0m
@@ -119,6 +132,7 @@ from typing import Optional, Union
 import numpy as np
 
 from rsfpy import Rsfarray
+from rsfpy.lazy import LazyArray
 from rsfpy.version import __version__, __email__, __author__, __github__
 
 __progname__ = os.path.basename(sys.argv[0])
@@ -311,6 +325,7 @@ def main():
     outcmd = kargs.pop("output", None)
 
     binary_out = kargs.pop("--out", None)
+    lazy = kargs.pop("lazy", "n").lower() in ('true', 'y', 'yes')
 
     if len(cmds) == 0 and outcmd is None:
         print(cmds, outcmd, file=sys.stderr)
@@ -378,7 +393,7 @@ def main():
 
     if not no_filein:
         try:
-            input = Rsfarray(sys.stdin.buffer)
+            input = Rsfarray(sys.stdin.buffer, mmap=lazy)
         except Exception as e:
             sf_error(f"Failed to read input RSF from stdin: {e}\n")
     else:
@@ -391,7 +406,7 @@ def main():
         except Exception as e:
             sf_error(f"Failed to create synthetic input array: {e}\n")
 
-    env["input"] = input
+    env["input"] = input.lazy() if lazy else input
     _inject_axis_vars(env, input, prefix="")
 
     # -------- Read other input files --------
@@ -400,8 +415,9 @@ def main():
         if not _is_valid_identifier(key):
             sf_error(f"Invalid variable name: {key}\n")
         try:
-            env[key] = Rsfarray(val)
-            _inject_axis_vars(env, env[key], prefix=f"{key}_")
+            extra = Rsfarray(val, mmap=lazy)
+            env[key] = extra.lazy() if lazy else extra
+            _inject_axis_vars(env, extra, prefix=f"{key}_")
         except Exception as e:
             sf_error(f"Failed to load extra RSF file '{val}' as variable '{key}': {e}\n")
 
@@ -425,11 +441,15 @@ def main():
         sf_error("No output produced. "
                 "Please set output=... or assign variable `output` in cmd/cmd0/cmd1/...\n")
 
-    output = _wrap_output(output, env["input"])
+    if not isinstance(output, LazyArray):
+        output = _wrap_output(output, input)
 
     # -------- Write output --------
     try:
-        output.write(sys.stdout.buffer, out=binary_out)
+        if isinstance(output, LazyArray):
+            output.to_rsf(sys.stdout.buffer, out=binary_out)
+        else:
+            output.write(sys.stdout.buffer, out=binary_out)
     except Exception as e:
         sf_error(f"Failed to write output RSF: {e}\n")
 
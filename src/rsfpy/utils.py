@@ -20,15 +20,28 @@
 
 
 
-import io, re, warnings, os
+import io, re, warnings, os, shutil
 import sys
 from typing import Optional, Union
-from subprocess import Popen, PIPE, SubprocessError, run as Run
+from subprocess import SubprocessError, run as Run
+
+import numpy as np
+
+# remote files, read through rsfpy.remote
+_URL_SCHEMES = ("rsf://", "http://", "https://")
 
 def _check_input_source(src, mode='rb'):
     """
     Check if src is a valid readable/writable file path or IOBase object.
+    URLs are opened for reading with rsfpy.remote.
     """
+    if isinstance(src, str) and mode == 'rb' and src.startswith(_URL_SCHEMES):
+        from .remote import open_url
+        try:
+            return open_url(src)
+        except Exception as e:
+            warnings.warn(f"URL not accessible: {src}, {e}")
+            return None
     if isinstance(src, str):
         try:
             fp = open(src, mode)
@@ -170,35 +183,34 @@ def flow(cmd, source=None, verb=False):
             esize=4 type=float form=native\n
             n1=1           d1=1           o1=0\n
             1 elements 4 bytes\n
-    :param source: str | BaseIO | None
-        Input data file
-    :param cmd: str
+    The stages run connected by pipes (see rsfpy.pipeline.stages), the
+    input is fed to the first one in blocks, and errors of any stage raise
+    SubprocessError.
+    :param source: str | BaseIO | ndarray | None
+        Input data file, stream or array
+    :param cmd: str | list
+        Command string, or list of stages
     :return: BytesIO
     '''
+    from .pipeline import _Flow, _feeder
+    from .io import DATA_BLOCKSIZE
     out = io.BytesIO()
 
-    if source is None:
-        fsrc = None
-    elif type(source) == str:
-        fsrc = open(source,'rb')
-    elif isinstance(source,io.IOBase):
-        fsrc = source
-    else: raise TypeError("Wrong type of source: %s"%type(source))
-
-    if fsrc is not None:
-        fsrc.seek(0)
-        subprc = Popen(cmd, stdin=PIPE, stdout=PIPE, stderr=PIPE, shell=True)
-        [sout, serr] = subprc.communicate(fsrc.read())
-        if subprc.returncode != 0:
-            raise SubprocessError("In Command: '%s':\n%s"%(cmd,serr.decode()))
-    else :
-        subprc = Run(cmd, stdin=None, stdout=PIPE, stderr=PIPE, shell=True, check=True)
-        sout = subprc.stdout
-        serr = subprc.stderr
-        if subprc.returncode != 0:
-            raise SubprocessError("In Command: '%s':\n"%(cmd,serr.read().decode()))
-
-    out.write(sout)
+    if isinstance(source, io.IOBase):
+        source.seek(0)
+    elif source is not None and not isinstance(source, (str, np.ndarray)):
+        raise TypeError("Wrong type of source: %s"%type(source))
+
+    subprc = _Flow(cmd, _feeder(source), verb)
+    try:
+        shutil.copyfileobj(subprc.stdout, out, DATA_BLOCKSIZE)
+        subprc.wait()
+    except BaseException:
+        subprc.kill()
+        raise
+    finally:
+        subprc.stdout.close()
+
     out.seek(0)
     return out
 
@@ -0,0 +1,112 @@
+"""
+  RsfPy - Python tools for Madagascar RSF data file reading/writing and scientific array handling.
+
+  Copyright (C) 2025 Jilin University
+
+  This program is free software; you can redistribute it and/or modify
+  it under the terms of the GNU General Public License as published by
+  the Free Software Foundation; either version 2 of the License, or
+  (at your option) any later version.
+
+  This program is distributed in the hope that it will be useful,
+  but WITHOUT ANY WARRANTY; without even the implied warranty of
+  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+  GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with this program; if not, write to the Free Software
+  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+"""
+
+
+import sys, os, io, time
+
+import numpy as np
+
+path = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(path + "/../src/")
+from rsfpy.io import _read_header, RSFHSPLITER
+from rsfpy.array import Rsfdata
+
+
+def color_str(string, color='green'):
+
+    colors = {
+        'green': "\033[92m",
+        'red': "\033[91m",
+        'yellow': "\033[93m",
+        'blue': "\033[94m",
+        'magenta': "\033[95m",
+        'cyan': "\033[96m",
+        'white': "\033[97m",
+    }
+    return f"{colors.get(color, colors['green'])}{string}\033[0m"
+
+
+def long_header(nstep=2000):
+    """A header with a long processing history, followed by a few data bytes."""
+    steps = []
+    for i in range(nstep):
+        steps.append(
+            f"4.0\tsfmath\t/data/project/line{i:04d}:\tuser@host\tTue Aug 19 16:11:02 2025\n\n"
+            f"\tn1=2000 d1=0.004 o1=0 label1=\"Time\" unit1=\"s\"\n"
+            f"\tn2={i + 1} d2=0.025 o2=0 label2=\"Offset\" unit2=\"km\"\n"
+            f"\toutput=\"sin(x1)*exp(-x2) + {i}\" data_format=\"native_float\" esize=4 in=\"stdin\"\n\n"
+        )
+    return "".join(steps).encode() + RSFHSPLITER + bytes(4096)
+
+
+def view_times(number=20000, repeat=5):
+    """Best time per slice for Rsfdata and plain ndarray views of a cube."""
+    data = Rsfdata(np.zeros((100, 200, 30), dtype=np.float32),
+                   header={"d1": 0.002, "label1": "Time", "unit1": "s", "title": "cube"})
+    raw = np.asarray(data)
+    times = []
+    for arr in (data, raw):
+        best = float("inf")
+        for _ in range(repeat):
+            tic = time.perf_counter()
+            for i in range(number):
+                arr[:, i % 200]
+            best = min(best, (time.perf_counter() - tic) / number)
+        times.append(best)
+    view = data[:, 5]
+    assert view.header["n1"] == 100 and "n3" not in view.header and data.header["n2"] == 200
+    return times
+
+
+def main(file=sys.stderr):
+    args = dict(a.split("=", 1) for a in sys.argv[1:] if "=" in a)
+    repeat = int(args.get("repeat", 20))
+    minrate = float(args.get("min", 0.))
+    maxratio = float(args.get("maxview", 0.))
+
+    raw = long_header()
+    nbytes = raw.index(RSFHSPLITER)
+    best = float("inf")
+    for _ in range(repeat):
+        src = io.BytesIO(raw)
+        tic = time.perf_counter()
+        header, _, data_fp = _read_header(src)
+        best = min(best, time.perf_counter() - tic)
+    assert header["n2"] == 2000 and data_fp.tell() == nbytes + len(RSFHSPLITER)
+
+    rate = nbytes / best / 1e6
+    print(f"Header parsing:\t{nbytes} bytes, {len(header)} keys, "
+          f"best of {repeat}: {best * 1e3:.2f} ms, {rate:.1f} MB/s", file=file)
+    if rate < minrate:
+        print(color_str(f"Header parsing throughput below min={minrate} MB/s", 'red'), file=file)
+        sys.exit(1)
+
+    rsf_time, np_time = view_times()
+    ratio = rsf_time / np_time
+    print(f"View creation:\tRsfdata {rsf_time * 1e6:.2f} us, ndarray {np_time * 1e6:.2f} us "
+          f"per slice, {ratio:.1f}x", file=file)
+    if maxratio and ratio > maxratio:
+        print(color_str(f"Rsfdata views slower than maxview={maxratio}x ndarray", 'red'), file=file)
+        sys.exit(1)
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
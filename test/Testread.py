@@ -19,12 +19,17 @@
 """
 
 
-import sys, os, io
+import sys, os, io, asyncio, warnings
 import numpy as np 
 
 path = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(path + "/../src/")
-from rsfpy.array import Rsfarray
+from rsfpy.array import Rsfarray, Rsfdata
+from rsfpy.io import iter_rsf, RsfWriter, RsfOutput, read_many, rechunk, read_rsf
+from rsfpy import index, segy, remote
+from rsfpy.clip import percentile_clip, _cache as _clip_cache
+from rsfpy.pipeline import pipeline, stages
+from subprocess import SubprocessError, Popen, PIPE
 
 
 def color_str(string, color='green'):
@@ -129,6 +134,513 @@ def main(file=sys.stderr):
         else: print(color_str(f'passed', 'green'), file=file)
         count += 1
     all += 1
+
+    # Memory-mapped read
+    print(f"{all+1}:", end="\t", file=file)
+    try:
+        mdat = Rsfarray(path + "/dat.test.ignore", mmap=True)
+        assert np.array_equal(mdat, dat), "memory-mapped data mismatch"
+        assert not mdat.flags.writeable, "memory-mapped data writable"
+        mdat = Rsfarray(path + "/dat.test.ignore", mmap="c")
+        mdat[0, 0] += 1
+        assert mdat[0, 0] == dat[0, 0] + 1 and np.array_equal(Rsfarray(path + "/dat.test.ignore"), dat), \
+            "copy-on-write map mismatch"
+        file_io = io.BytesIO()
+        dat.write(file_io, form='xdr')
+        file_io.seek(0)
+        xdat = Rsfarray(file_io)
+        assert xdat.dtype == np.float32 and np.array_equal(xdat, dat), "xdr data not read as native"
+    except Exception as e:
+        if verbose: print(color_str(f"Error reading Rsfdata with mmap: {e}", 'red'), file=file)
+        else: print(color_str(f'failed', 'red'), file=file)
+    else:
+        if verbose: print(f"Rsfdata memory-mapped reading:       \t{color_str('passed', 'green')}.", file=file)
+        else: print(color_str(f'passed', 'green'), file=file)
+        count += 1
+    all += 1
+
+    # Slab iteration
+    print(f"{all+1}:", end="\t", file=file)
+    try:
+        slabs = list(iter_rsf(path + "/dat.test.ignore", chunk=64))
+        assert [s.n2 for s in slabs] == [64, 64, 64, 8], "unexpected slab sizes"
+        assert np.array_equal(np.concatenate(slabs, axis=1), dat), "slab data mismatch"
+    except Exception as e:
+        if verbose: print(color_str(f"Error iterating Rsfdata slabs: {e}", 'red'), file=file)
+        else: print(color_str(f'failed', 'red'), file=file)
+    else:
+        if verbose: print(f"Rsfdata slab iteration:              \t{color_str('passed', 'green')}.", file=file)
+        else: print(color_str(f'passed', 'green'), file=file)
+        count += 1
+    all += 1
+
+    # Incremental writing
+    print(f"{all+1}:", end="\t", file=file)
+    try:
+        file_io = io.BytesIO()
+        with RsfWriter(file_io, ndim=2) as writer:
+            for i2 in range(dat.n2):
+                writer.append(dat[:, i2])
+        file_io.seek(0)
+        wdat = Rsfarray(file_io)
+        assert wdat.shape == dat.shape and np.array_equal(wdat, dat), "appended data mismatch"
+    except Exception as e:
+        if verbose: print(color_str(f"Error writing Rsfdata slabs: {e}", 'red'), file=file)
+        else: print(color_str(f'failed', 'red'), file=file)
+    else:
+        if verbose: print(f"Rsfdata incremental writing:         \t{color_str('passed', 'green')}.", file=file)
+        else: print(color_str(f'passed', 'green'), file=file)
+        count += 1
+    all += 1
+
+    # Ascii round trip
+    print(f"{all+1}:", end="\t", file=file)
+    try:
+        cdat = Rsfarray(dat[:, :20] - 1j * dat[:, 20:40])
+        file_io = io.BytesIO()
+        cdat.write(file_io, form='ascii', fmt="%.9g")
+        file_io.seek(0)
+        adat = Rsfarray(file_io)
+        assert adat.shape == cdat.shape and np.allclose(adat, cdat), "ascii data mismatch"
+    except Exception as e:
+        if verbose: print(color_str(f"Error reading/writing ascii Rsfdata: {e}", 'red'), file=file)
+        else: print(color_str(f'failed', 'red'), file=file)
+    else:
+        if verbose: print(f"Rsfdata ascii round trip:            \t{color_str('passed', 'green')}.", file=file)
+        else: print(color_str(f'passed', 'green'), file=file)
+        count += 1
+    all += 1
+
+    # Windowed read
+    print(f"{all+1}:", end="\t", file=file)
+    try:
+        wdat = Rsfarray(path + "/dat.test.ignore", n1=50, f1=10, j1=2, n2=1, f2=-3)
+        ref = dat.window(n1=50, f1=10, j1=2, n2=1, f2=-3, squeeze=False)
+        assert np.array_equal(wdat, ref), "windowed data mismatch"
+        assert [wdat.o1, wdat.d1, wdat.o2] == [ref.o1, ref.d1, ref.o2], "windowed header mismatch"
+    except Exception as e:
+        if verbose: print(color_str(f"Error reading windowed Rsfdata: {e}", 'red'), file=file)
+        else: print(color_str(f'failed', 'red'), file=file)
+    else:
+        if verbose: print(f"Rsfdata windowed reading:            \t{color_str('passed', 'green')}.", file=file)
+        else: print(color_str(f'passed', 'green'), file=file)
+        count += 1
+    all += 1
+    # Concurrent async reading
+    print(f"{all+1}:", end="\t", file=file)
+    try:
+        async def read_traces():
+            return await asyncio.gather(*[Rsfdata.aread(path + "/dat.test.ignore", n2=1, f2=i)
+                                          for i in range(8)])
+        traces = asyncio.run(read_traces())
+        for i, trace in enumerate(traces):
+            assert np.array_equal(trace[:, 0], dat[:, i]), "async data mismatch"
+    except Exception as e:
+        if verbose: print(color_str(f"Error reading Rsfdata asynchronously: {e}", 'red'), file=file)
+        else: print(color_str(f'failed', 'red'), file=file)
+    else:
+        if verbose: print(f"Rsfdata async reading:               \t{color_str('passed', 'green')}.", file=file)
+        else: print(color_str(f'passed', 'green'), file=file)
+        count += 1
+    all += 1
+    # Multi-file stacking
+    print(f"{all+1}:", end="\t", file=file)
+    try:
+        sdat = read_many([path + "/dat.test.ignore"] * 3, axis=1, workers=2)
+        assert np.array_equal(sdat, np.stack([np.asarray(dat)] * 3, axis=1)), "stacked data mismatch"
+        assert sdat.n3 == dat.n2 and sdat.d3 == dat.d2, "stacked header mismatch"
+    except Exception as e:
+        if verbose: print(color_str(f"Error stacking Rsfdata files: {e}", 'red'), file=file)
+        else: print(color_str(f'failed', 'red'), file=file)
+    else:
+        if verbose: print(f"Rsfdata multi-file stacking:         \t{color_str('passed', 'green')}.", file=file)
+        else: print(color_str(f'passed', 'green'), file=file)
+        count += 1
+    all += 1
+    # Header-only index
+    print(f"{all+1}:", end="\t", file=file)
+    try:
+        index_path = path + "/index.test.ignore"
+        entries = index.scan(path, index=index_path, pattern="dat.test.ignore")
+        assert len(entries) == 1 and entries[0]["shape"] == list(dat.shape), "index entry mismatch"
+        assert not index.problems(entries), entries[0]["error"]
+        assert index.scan(path, index=index_path, pattern="dat.test.ignore") == entries, "rescan mismatch"
+        np.asarray(dat, dtype=np.float32).T.tofile(path + "/dat.test.rel.ignore@")
+        with open(path + "/dat.test.rel.ignore", 'w') as fp:
+            fp.write(f"n1={dat.shape[0]} n2={dat.shape[1]} data_format=native_float in=dat.test.rel.ignore@\n")
+        entry = index.scan(path, index=index_path, pattern="dat.test.rel.ignore", save=False)[0]
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            readable = read_rsf(path + "/dat.test.rel.ignore") is not None
+        assert (entry["status"] == "ok") == readable, "index and read_rsf disagree on relative in="
+    except Exception as e:
+        if verbose: print(color_str(f"Error indexing Rsfdata headers: {e}", 'red'), file=file)
+        else: print(color_str(f'failed', 'red'), file=file)
+    else:
+        if verbose: print(f"Rsfdata header index:                \t{color_str('passed', 'green')}.", file=file)
+        else: print(color_str(f'passed', 'green'), file=file)
+        count += 1
+    all += 1
+    # Compressed binary
+    print(f"{all+1}:", end="\t", file=file)
+    try:
+        dat.write(path + "/dat.test.gz.ignore", out=path + "/dat.test.ignore@.gz", form='xdr')
+        zdat = Rsfarray(path + "/dat.test.gz.ignore")
+        assert zdat.header.get("data_compression") == "gzip", "data_compression not set"
+        assert np.array_equal(zdat, dat), "compressed data mismatch"
+        wdat = Rsfarray(path + "/dat.test.gz.ignore", n2=3, f2=100)
+        assert np.array_equal(wdat, dat[:, 100:103]), "compressed windowed data mismatch"
+    except Exception as e:
+        if verbose: print(color_str(f"Error reading/writing compressed Rsfdata: {e}", 'red'), file=file)
+        else: print(color_str(f'failed', 'red'), file=file)
+    else:
+        if verbose: print(f"Rsfdata compressed binary:           \t{color_str('passed', 'green')}.", file=file)
+        else: print(color_str(f'passed', 'green'), file=file)
+        count += 1
+    all += 1
+    # Shared memory transport
+    print(f"{all+1}:", end="\t", file=file)
+    try:
+        shared = dat.to_shared(file=path + "/dat.test.shm.ignore")
+        assert shared.header["in"].startswith("shm://"), "shm:// in= not set"
+        attached = Rsfdata.from_shared(shared.header["in"])
+        assert np.array_equal(attached, dat), "shared data mismatch"
+        attached[0, 0] += 1
+        assert shared[0, 0] == attached[0, 0], "shared data not shared"
+        assert np.array_equal(Rsfarray(path + "/dat.test.shm.ignore"), attached), "shm:// header mismatch"
+        name = shared.header["in"]
+        del shared, attached
+        attached = Rsfdata.from_shared(name)
+        assert np.array_equal(attached[1:], dat[1:]), "segment gone with its creator array"
+        attached.release_shared()
+        assert np.array_equal(attached[1:], dat[1:]), "released segment unmapped"
+        try:
+            Rsfdata.from_shared(name)
+        except FileNotFoundError:
+            pass
+        else:
+            raise AssertionError("released segment still attachable")
+        del attached
+        for arr in (np.asarray(dat, dtype=np.float64) / 3, np.asarray(dat, dtype=np.int64) << 40):
+            shared = Rsfdata(arr).to_shared()
+            attached = Rsfdata.from_shared(shared.header["in"])
+            assert attached.dtype == arr.dtype and np.array_equal(attached, arr), f"shared {arr.dtype} data mismatch"
+            shared.release_shared()
+            del shared, attached
+    except Exception as e:
+        if verbose: print(color_str(f"Error sharing Rsfdata: {e}", 'red'), file=file)
+        else: print(color_str(f'failed', 'red'), file=file)
+    else:
+        if verbose: print(f"Rsfdata shared memory:               \t{color_str('passed', 'green')}.", file=file)
+        else: print(color_str(f'passed', 'green'), file=file)
+        count += 1
+    all += 1
+    # Chunked layout
+    print(f"{all+1}:", end="\t", file=file)
+    try:
+        rechunk(path + "/dat.test.ignore", path + "/dat.test.chunk.ignore",
+                chunks=[64, 48], out=path + "/dat.test.chunk.ignore@")
+        cdat = Rsfarray(path + "/dat.test.chunk.ignore")
+        assert cdat.header.get("chunk2") == 48, "chunk# not set"
+        assert np.array_equal(cdat, dat), "chunked data mismatch"
+        wdat = Rsfarray(path + "/dat.test.chunk.ignore", n1=1, f1=70)
+        assert np.array_equal(wdat, dat[70:71, :]), "chunked windowed data mismatch"
+    except Exception as e:
+        if verbose: print(color_str(f"Error reading/writing chunked Rsfdata: {e}", 'red'), file=file)
+        else: print(color_str(f'failed', 'red'), file=file)
+    else:
+        if verbose: print(f"Rsfdata chunked layout:              \t{color_str('passed', 'green')}.", file=file)
+        else: print(color_str(f'passed', 'green'), file=file)
+        count += 1
+    all += 1
+    # Double, short, long and complexdouble data
+    print(f"{all+1}:", end="\t", file=file)
+    try:
+        for arr, fmt_B in [(np.asarray(dat, dtype=np.float64) / 3, "double"),
+                           (np.asarray(dat * 100, dtype=np.int16), "short"),
+                           (np.asarray(dat, dtype=np.int64) << 40, "long"),
+                           (np.asarray(dat - 1j * dat / 3, dtype=np.complex128), "complexdouble")]:
+            for form in ("native", "xdr"):
+                file_io = io.BytesIO()
+                Rsfarray(arr).write(file_io, form=form, keep_precision=True)
+                file_io.seek(0)
+                tdat = Rsfarray(file_io)
+                assert tdat.header["data_format"] == f"{form}_{fmt_B}", f"{form}_{fmt_B} not set"
+                assert tdat.header["esize"] == arr.itemsize, f"{form}_{fmt_B} esize mismatch"
+                assert tdat.dtype.newbyteorder("=") == arr.dtype, f"{form}_{fmt_B} dtype mismatch"
+                assert np.array_equal(tdat, arr), f"{form}_{fmt_B} data mismatch"
+                file_io = io.BytesIO()
+                tdat.write(file_io)
+                file_io.seek(0)
+                tdat = Rsfarray(file_io)
+                assert tdat.header["data_format"] == f"native_{fmt_B}", f"{fmt_B} not kept on rewrite"
+                assert np.array_equal(tdat, arr), f"{fmt_B} data changed on rewrite"
+        file_io = io.BytesIO()
+        Rsfarray(np.asarray(dat, dtype=np.float64)).write(file_io)
+        file_io.seek(0)
+        assert Rsfarray(file_io).header["data_format"] == "native_float", "float64 not written as float by default"
+    except Exception as e:
+        if verbose: print(color_str(f"Error reading/writing double/short/long Rsfdata: {e}", 'red'), file=file)
+        else: print(color_str(f'failed', 'red'), file=file)
+    else:
+        if verbose: print(f"Rsfdata double/short/long types:     \t{color_str('passed', 'green')}.", file=file)
+        else: print(color_str(f'passed', 'green'), file=file)
+        count += 1
+    all += 1
+    # SEG-Y
+    print(f"{all+1}:", end="\t", file=file)
+    try:
+        assert segy.ibm2ieee(np.array([0xC276A000], dtype=">u4"))[0] == -118.625, "IBM float mismatch"
+        dat.to_segy(path + "/dat.test.sgy.ignore")
+        sdat, sheaders = segy.read_segy(path + "/dat.test.sgy.ignore")
+        assert np.allclose(sdat, dat, rtol=1e-6, atol=0), "IBM float data mismatch"
+        assert np.array_equal(sheaders["tracl"], np.arange(1, dat.shape[1] + 1)), "trace header mismatch"
+        segy.write_segy(sdat, path + "/dat.test.sgy.ignore", headers=sheaders, format=5)
+        wdat = [slab for slab, _ in segy.iter_segy(path + "/dat.test.sgy.ignore", ntr=64)]
+        assert np.array_equal(np.concatenate(wdat, axis=1), sdat), "IEEE float data mismatch"
+    except Exception as e:
+        if verbose: print(color_str(f"Error reading/writing SEG-Y: {e}", 'red'), file=file)
+        else: print(color_str(f'failed', 'red'), file=file)
+    else:
+        if verbose: print(f"Rsfdata SEG-Y:                       \t{color_str('passed', 'green')}.", file=file)
+        else: print(color_str(f'passed', 'green'), file=file)
+        count += 1
+    all += 1
+    # Preallocated output written in slabs
+    print(f"{all+1}:", end="\t", file=file)
+    try:
+        pout = RsfOutput(path + "/dat.test.out.ignore", n=dat.shape, header=dat.header,
+                         out=path + "/dat.test.out.ignore@")
+        for i in range(dat.shape[1] - 50, -1, -50):
+            RsfOutput(path + "/dat.test.out.ignore").write_slab(slice(i, i + 50), dat[:, i:i + 50])
+        pout.write_slab(10, dat[:, 10])
+        assert pout.missing() == [], "slabs not marked"
+        pout.finish()
+        assert not os.path.exists(path + "/dat.test.out.ignore@.part"), "marker not removed"
+        assert np.array_equal(Rsfarray(path + "/dat.test.out.ignore"), dat), "slab data mismatch"
+    except Exception as e:
+        if verbose: print(color_str(f"Error writing Rsfdata slabs: {e}", 'red'), file=file)
+        else: print(color_str(f'failed', 'red'), file=file)
+    else:
+        if verbose: print(f"Rsfdata preallocated slab writing:   \t{color_str('passed', 'green')}.", file=file)
+        else: print(color_str(f'passed', 'green'), file=file)
+        count += 1
+    all += 1
+    # Prefetching slab reader
+    print(f"{all+1}:", end="\t", file=file)
+    try:
+        slabs = list(iter_rsf(path + "/dat.test.ignore", chunk=30, prefetch=3, max_bytes=dat.nbytes // 4))
+        assert np.array_equal(np.concatenate(slabs, axis=1), dat), "prefetched data mismatch"
+        slabs = iter_rsf(path + "/dat.test.ignore", chunk=1, prefetch=2)
+        assert np.array_equal(next(slabs)[:, 0], dat[:, 0]), "prefetched slab mismatch"
+        slabs.close()
+        file_io = io.BytesIO()
+        dat.write(file_io)
+        with open(path + "/dat.test.pipe.ignore", 'wb') as fp:
+            fp.write(file_io.getvalue())
+        proc = Popen(["cat", path + "/dat.test.pipe.ignore"], stdout=PIPE)
+        with proc.stdout:
+            slabs = list(iter_rsf(proc.stdout, chunk=64, prefetch=2))
+        proc.wait()
+        assert np.array_equal(np.concatenate(slabs, axis=1), dat), "piped prefetched data mismatch"
+    except Exception as e:
+        if verbose: print(color_str(f"Error prefetching Rsfdata slabs: {e}", 'red'), file=file)
+        else: print(color_str(f'failed', 'red'), file=file)
+    else:
+        if verbose: print(f"Rsfdata prefetching slab reader:     \t{color_str('passed', 'green')}.", file=file)
+        else: print(color_str(f'passed', 'green'), file=file)
+        count += 1
+    all += 1
+    # Remote access over range requests
+    print(f"{all+1}:", end="\t", file=file)
+    try:
+        import threading, tempfile, shutil
+        server = remote.make_server(path, port=0, quiet=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        cache_dir = tempfile.mkdtemp()
+        remote._default_cache = remote.BlockCache(cache_dir)
+        url = f"rsf://127.0.0.1:{server.server_address[1]}/dat.test.ignore"
+        try:
+            assert np.array_equal(Rsfarray(url), dat), "remote data mismatch"
+            assert os.listdir(cache_dir), "no blocks cached"
+            assert np.array_equal(Rsfarray(url, f2=20, n2=30, j1=2), dat[::2, 20:50]), "remote window mismatch"
+        finally:
+            server.shutdown()
+            server.server_close()
+            remote._default_cache = None
+            shutil.rmtree(cache_dir, ignore_errors=True)
+    except Exception as e:
+        if verbose: print(color_str(f"Error reading remote Rsfdata: {e}", 'red'), file=file)
+        else: print(color_str(f'failed', 'red'), file=file)
+    else:
+        if verbose: print(f"Rsfdata remote range requests:       \t{color_str('passed', 'green')}.", file=file)
+        else: print(color_str(f'passed', 'green'), file=file)
+        count += 1
+    all += 1
+    # Copy-on-write headers of views
+    print(f"{all+1}:", end="\t", file=file)
+    try:
+        cube = Rsfdata(np.zeros((20, 30, 4), dtype=np.float32), header={"d2": 0.5, "title": "cube"})
+        view = cube[:, 3]
+        assert view.header["n1"] == 20 and "n3" not in view.header and view.d(1) == 0.5, "view header mismatch"
+        view.header["title"] = "view"
+        assert cube.header["title"] == "cube" and cube.header["n3"] == 4, "header leaked from view"
+        cube.header["d2"] = 2.
+        assert cube[:, 0].d(1) == 2. and view.d(1) == 0.5, "header not copied on write"
+    except Exception as e:
+        if verbose: print(color_str(f"Error sharing Rsfdata headers: {e}", 'red'), file=file)
+        else: print(color_str(f'failed', 'red'), file=file)
+    else:
+        if verbose: print(f"Rsfdata copy-on-write view headers:  \t{color_str('passed', 'green')}.", file=file)
+        else: print(color_str(f'passed', 'green'), file=file)
+        count += 1
+    all += 1
+    # Ufuncs with out= and in place
+    print(f"{all+1}:", end="\t", file=file)
+    try:
+        left = Rsfdata(np.ones((20, 30), dtype=np.float32), header={"d2": 0.5, "title": "left"})
+        right = Rsfdata(np.full((20, 30), 3, dtype=np.float32), header={"title": "right"})
+        total = left + right
+        assert isinstance(total, Rsfdata) and total.header["title"] == "left" and total.d(1) == 0.5, "ufunc header mismatch"
+        buf = left.view(np.ndarray)
+        left *= 2
+        np.multiply(left, right, out=left)
+        assert np.shares_memory(left, buf), "in-place result reallocated"
+        assert np.all(left == 6) and left.header["title"] == "left", "in-place ufunc mismatch"
+        out = Rsfdata(np.empty((20, 30), dtype=np.float32), header={"title": "out"})
+        assert np.add(left, right, out=out) is out and np.all(out == 9) and out.header["title"] == "out", "out= mismatch"
+        quot, rem = np.divmod(right, 2)
+        assert isinstance(rem, Rsfdata) and np.all(rem == 1), "multiple outputs mismatch"
+    except Exception as e:
+        if verbose: print(color_str(f"Error applying ufuncs to Rsfdata: {e}", 'red'), file=file)
+        else: print(color_str(f'failed', 'red'), file=file)
+    else:
+        if verbose: print(f"Rsfdata ufuncs with out= and in place:\t{color_str('passed', 'green')}.", file=file)
+        else: print(color_str(f'passed', 'green'), file=file)
+        count += 1
+    all += 1
+    # Lazy fused expressions
+    print(f"{all+1}:", end="\t", file=file)
+    try:
+        expr = (dat.lazy() - 1) * np.exp(-dat.lazy()) + dat[:, :1]
+        expected = (np.asarray(dat) - 1) * np.exp(-np.asarray(dat)) + np.asarray(dat)[:, :1]
+        result = expr.compute(blocksize=4096)
+        assert isinstance(result, Rsfdata) and result.shape == dat.shape, "lazy result mismatch"
+        assert np.allclose(result, expected) and result.d(1) == dat.d(1), "lazy data mismatch"
+        expr.to_rsf(path + "/dat.test.lazy.ignore", out=path + "/dat.test.lazy.ignore@", blocksize=dat.nbytes // 7)
+        assert np.allclose(Rsfdata(path + "/dat.test.lazy.ignore"), expected), "streamed lazy data mismatch"
+    except Exception as e:
+        if verbose: print(color_str(f"Error evaluating lazy Rsfdata: {e}", 'red'), file=file)
+        else: print(color_str(f'failed', 'red'), file=file)
+    else:
+        if verbose: print(f"Rsfdata lazy fused expressions:      \t{color_str('passed', 'green')}.", file=file)
+        else: print(color_str(f'passed', 'green'), file=file)
+        count += 1
+    all += 1
+    # Slab-parallel map_blocks
+    print(f"{all+1}:", end="\t", file=file)
+    try:
+        scaled = dat.map_blocks(lambda slab: slab * slab.o(1), workers=4)
+        expected = np.asarray(dat) * dat.axis(1)[None, :]
+        assert isinstance(scaled, Rsfdata) and np.allclose(scaled, expected), "map_blocks data mismatch"
+        assert scaled.o(1) == dat.o(1) and scaled.d(1) == dat.d(1), "map_blocks header mismatch"
+        dat.map_blocks(lambda slab: slab[::2] * 2, chunk=50, workers=3,
+                       out=path + "/dat.test.map.ignore", datafile=path + "/dat.test.map.ignore@")
+        assert np.allclose(Rsfdata(path + "/dat.test.map.ignore"), np.asarray(dat)[::2] * 2), "map_blocks output mismatch"
+        for processes in (False, True):
+            dat.map_blocks(np.negative, axis=0, chunk=30, workers=2, processes=processes,
+                           out=path + "/dat.test.map.ignore", datafile=path + "/dat.test.map.ignore@")
+            assert np.array_equal(Rsfdata(path + "/dat.test.map.ignore"), -np.asarray(dat)), "map_blocks axis=0 output mismatch"
+    except Exception as e:
+        if verbose: print(color_str(f"Error mapping Rsfdata blocks: {e}", 'red'), file=file)
+        else: print(color_str(f'failed', 'red'), file=file)
+    else:
+        if verbose: print(f"Rsfdata map_blocks:                  \t{color_str('passed', 'green')}.", file=file)
+        else: print(color_str(f'passed', 'green'), file=file)
+        count += 1
+    all += 1
+    # Fused and coordinate windows
+    print(f"{all+1}:", end="\t", file=file)
+    try:
+        win = dat.window(n1=50, f1=10, j1=3, f2=-20, copy=True)
+        assert np.array_equal(win, np.asarray(dat)[10:160:3, 180:]), "fused window mismatch"
+        assert not np.shares_memory(win, dat) and np.shares_memory(dat.window(n2=1, f2=5), dat), "window copy mismatch"
+        assert win.o(0) == dat.o(0) + 10 * dat.d(0) and win.d(0) == 3 * dat.d(0), "window header mismatch"
+        low, high = dat.o(0) + 20 * dat.d(0), dat.o(0) + 60 * dat.d(0)
+        cwin = dat.window(f"min1={low} max1={high} n2=1 f2=7")
+        assert np.array_equal(cwin, np.asarray(dat)[20:61, 7]) and np.isclose(cwin.o(0), low), "coordinate window mismatch"
+        rwin = Rsfdata(path + "/dat.test.ignore", min1=low, max1=high, j1=2)
+        assert np.array_equal(rwin, np.asarray(dat)[20:61:2]), "coordinate read window mismatch"
+    except Exception as e:
+        if verbose: print(color_str(f"Error windowing Rsfdata: {e}", 'red'), file=file)
+        else: print(color_str(f'failed', 'red'), file=file)
+    else:
+        if verbose: print(f"Rsfdata fused and coordinate windows:\t{color_str('passed', 'green')}.", file=file)
+        else: print(color_str(f'passed', 'green'), file=file)
+        count += 1
+    all += 1
+    # Percentile clip engine
+    print(f"{all+1}:", end="\t", file=file)
+    try:
+        cdat = dat.copy()
+        ref = np.percentile(np.abs(np.asarray(cdat)), 99)
+        assert np.isclose(percentile_clip(cdat, 99), ref), "exact pclip mismatch"
+        span = float(np.abs(cdat).max())
+        assert abs(percentile_clip(cdat, 99, mode="hist") - ref) <= span * 1e-3, "hist pclip mismatch"
+        assert abs(percentile_clip(cdat, 99, mode="sample") - ref) <= span * 1e-3, "sample pclip mismatch"
+        assert np.isclose(cdat.pclip(90), np.percentile(np.asarray(cdat), 90)), "Rsfdata pclip mismatch"
+        cdat[0, 0] = 1e9
+        assert cdat.pclip(100) == 1e9, "pclip stale after item assignment"
+        cdat.put([0], [2e9])
+        assert cdat.pclip(100) == 2e9, "pclip stale after put"
+        cdat.flat[0] = 3e9
+        assert cdat.pclip(100) == 3e9, "pclip stale after flat write"
+        np.asarray(cdat)[0, 0] = 4e9
+        assert cdat.pclip(100) == 4e9, "pclip stale after ndarray write"
+        cache = {}
+        assert cdat.pclip(100, cache=cache) == 4e9 and len(cache) == 1, "pclip cache not filled"
+        cache[next(iter(cache))] = -1.
+        assert cdat.pclip(100, cache=cache) == -1., "pclip cache not used"
+        rdat = Rsfarray(path + "/dat.test.ignore", mmap=True)
+        assert rdat.pclip(100) == dat.max(), "memory-mapped pclip mismatch"
+        assert any(len(memo) for _, memo in _clip_cache.values()), "memory-mapped pclip not memoized"
+    except Exception as e:
+        if verbose: print(color_str(f"Error computing pclip: {e}", 'red'), file=file)
+        else: print(color_str(f'failed', 'red'), file=file)
+    else:
+        if verbose: print(f"Percentile clip modes and memo:      \t{color_str('passed', 'green')}.", file=file)
+        else: print(color_str(f'passed', 'green'), file=file)
+        count += 1
+    all += 1
+    # Streaming flow pipelines
+    print(f"{all+1}:", end="\t", file=file)
+    try:
+        fout = dat.flow("cat | cat")
+        assert np.array_equal(fout, dat) and fout.header.get("o2") == dat.o(1), "flow output mismatch"
+        fout = pipeline(["cat", ["cat"]], source=path + "/dat.test.ignore", memmap=True)
+        assert np.array_equal(fout, dat), "pipeline output mismatch"
+        assert stages("sfbandpass fhi=20 | sfagc rect1='5 0'") == [["sfbandpass", "fhi=20"], ["sfagc", "rect1=5 0"]], "stage split mismatch"
+        assert stages("sfcat axis=2 a*.rsf | sfwindow n1=2") == [["sh", "-c", "sfcat axis=2 a*.rsf "], ["sfwindow", "n1=2"]], "glob stage not run by sh"
+        assert stages("FOO=1 prog x=1") == [["sh", "-c", "FOO=1 prog x=1"]], "env stage not run by sh"
+        assert stages("sfmath output='a|b' | sfagc") == [["sfmath", "output=a|b"], ["sfagc"]], "quoted pipe split"
+        fout = pipeline("cat " + path + "/dat.test.ignor? | cat")
+        assert np.array_equal(fout, dat), "glob stage output mismatch"
+        fout = dat.flow('FOO=1 sh -c \'test "$FOO" = 1 && cat\' | cat')
+        assert np.array_equal(fout, dat), "env stage output mismatch"
+        try:
+            dat.flow("cat | false")
+        except SubprocessError:
+            pass
+        else:
+            raise AssertionError("failed stage not reported")
+    except Exception as e:
+        if verbose: print(color_str(f"Error running flow pipeline: {e}", 'red'), file=file)
+        else: print(color_str(f'failed', 'red'), file=file)
+    else:
+        if verbose: print(f"Streaming flow pipelines:            \t{color_str('passed', 'green')}.", file=file)
+        else: print(color_str(f'passed', 'green'), file=file)
+        count += 1
+    all += 1
     
     # Summary
     print(f"Summary:\t{all} tests, {(color_str(f'{count} passed', 'green'))}, {color_str(f'{all - count} failed', 'red' if all - count > 0 else 'green')}." , file=file)